@@ -129,7 +129,7 @@ function Install-CoffeeShopPOS {
         
         $filesToCopy = @(
             "app.py", "config.py", "models.py", "populate_sample_data.py",
-            "pos_routes.py", "routes.py", "requirements.txt", "setup_database.py",
+            "pos_routes.py", "routes.py", "events.py", "live_metrics.py", "db_profiles.py", "db_routing.py", "rollups.py", "affinity.py", "analytics.py", "report_cache.py", "columnar.py", "forecast.py", "session_totals.py", "dashboard.py", "scheduler.py", "archive.py", "generate_data.py", "stock.py", "requirements.txt", "setup_database.py",
             "logo.ico"
         )
         
@@ -153,6 +153,11 @@ function Install-CoffeeShopPOS {
             Write-Log "Copied: templates directory"
         }
         
+        if (Test-Path "$script:SourceDir\migrations") {
+            Copy-Item "$script:SourceDir\migrations" "$script:InstallDir\" -Recurse -Force
+            Write-Log "Copied: migrations directory"
+        }
+        
         # Step 4: Create virtual environment
         $StatusLabel.Text = "Creating virtual environment..."
         $ProgressBar.Value = 50
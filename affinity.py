@@ -0,0 +1,156 @@
+"""Which products sell together, maintained as a sparse co-occurrence table.
+
+``apply_order`` runs inside the transaction that completes (or refunds) an
+order and adds one to product_affinity for every pair of distinct products in
+it, in both directions, plus each product's own count and the all-orders
+count. ``top_partners`` then answers "frequently bought together" from one
+product's rows, without reading any orders. ``rebuild`` recomputes the table
+from the hot and archived orders for backfills.
+
+For products A and B over N completed orders:
+
+- support = orders with A and B / N
+- confidence = orders with A and B / orders with A
+- lift = confidence / (orders with B / N); above 1 means B sells with A more
+  often than chance
+"""
+import logging
+import click
+from sqlalchemy import select, delete, func, literal, union
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.orm import aliased
+from models import (
+    db, Order, OrderItem, Product, ProductAffinity, orders_archive, order_items_archive
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_PARTNERS = 50  # Largest limit top_partners is asked for
+
+
+def _rows_for_order(order, sign):
+    product_ids = sorted({item.product_id for item in order.items})
+    rows = [(product_id, partner_id) for product_id in product_ids for partner_id in product_ids]
+    rows.append((ProductAffinity.ALL_ORDERS, ProductAffinity.ALL_ORDERS))
+    return [{'product_id': product_id, 'partner_id': partner_id, 'order_count': sign}
+            for product_id, partner_id in sorted(rows)]
+
+
+def _upsert(rows):
+    """Add ``rows`` to the table, creating missing pairs (INSERT ... ON CONFLICT)."""
+    table = ProductAffinity.__table__
+    dialect = db.session.get_bind(mapper=ProductAffinity).dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['product_id', 'partner_id'],
+            set_={'order_count': table.c.order_count + stmt.excluded.order_count}
+        )
+        db.session.execute(stmt)
+        return
+
+    # Portable fallback for other databases
+    for row in rows:
+        existing = db.session.query(ProductAffinity).filter_by(
+            product_id=row['product_id'], partner_id=row['partner_id']
+        ).with_for_update().first()
+        if existing:
+            existing.order_count += row['order_count']
+        else:
+            db.session.add(ProductAffinity(**row))
+
+
+def apply_order(order, sign=1):
+    """Count a completed order's product pairs (``sign=-1`` reverses it for a refund).
+
+    Runs in the caller's transaction; the caller commits.
+    """
+    _upsert(_rows_for_order(order, sign))
+
+
+def rebuild():
+    """Recompute the whole table from hot and archived completed orders.
+
+    Two set-based INSERT ... SELECT statements; commits when done. Returns the
+    number of rows written.
+    """
+    lines = union(*[
+        select(items.c.order_id, items.c.product_id)
+        .join(orders, orders.c.id == items.c.order_id)
+        .where(orders.c.status == 'completed')
+        for orders, items in ((Order.__table__, OrderItem.__table__), (orders_archive, order_items_archive))
+    ]).subquery()  # UNION: each product once per order
+    partner = lines.alias('partner')
+    pairs = select(lines.c.product_id, partner.c.product_id, func.count()).join(
+        partner, partner.c.order_id == lines.c.order_id
+    ).group_by(lines.c.product_id, partner.c.product_id)
+    all_orders = select(
+        literal(ProductAffinity.ALL_ORDERS), literal(ProductAffinity.ALL_ORDERS),
+        func.count(func.distinct(lines.c.order_id))
+    )
+
+    db.session.execute(delete(ProductAffinity))
+    written = 0
+    for rows in (pairs, all_orders):
+        result = db.session.execute(ProductAffinity.__table__.insert().from_select(
+            ['product_id', 'partner_id', 'order_count'], rows
+        ))
+        written += result.rowcount
+    db.session.commit()
+    logger.info(f"Product affinity rebuilt: {written} rows")
+    return written
+
+
+def top_partners(product_id, limit=5, min_orders=3):
+    """Products most often sold with ``product_id``, by lift.
+
+    Only active partners sold together at least ``min_orders`` times are
+    listed. Returns ``(orders with the product, all orders, partners)``, each
+    partner a dict with its id, name, orders_together, support, confidence
+    and lift.
+    """
+    counts = dict(db.session.query(ProductAffinity.product_id, ProductAffinity.order_count).filter(
+        ProductAffinity.product_id.in_([product_id, ProductAffinity.ALL_ORDERS]),
+        ProductAffinity.partner_id == ProductAffinity.product_id
+    ).all())
+    product_orders = counts.get(product_id, 0)
+    all_orders = counts.get(ProductAffinity.ALL_ORDERS, 0)
+    if product_orders <= 0:
+        return 0, all_orders, []
+
+    partner_count = aliased(ProductAffinity)
+    # Lift ranks like orders together / partner's orders, the other factors being fixed
+    rows = db.session.query(
+        ProductAffinity.partner_id, Product.name, ProductAffinity.order_count, partner_count.order_count
+    ).join(
+        partner_count, (partner_count.product_id == ProductAffinity.partner_id) &
+                       (partner_count.partner_id == ProductAffinity.partner_id)
+    ).join(Product, Product.id == ProductAffinity.partner_id).filter(
+        ProductAffinity.product_id == product_id,
+        ProductAffinity.partner_id != product_id,
+        ProductAffinity.order_count >= max(1, min_orders),
+        Product.is_active.is_(True)
+    ).order_by(
+        (ProductAffinity.order_count * 1.0 / partner_count.order_count).desc(),
+        ProductAffinity.order_count.desc()
+    ).limit(limit).all()
+
+    partners = [{
+        'product_id': partner_id,
+        'name': name,
+        'orders_together': together,
+        'support': round(together / all_orders, 4),
+        'confidence': round(together / product_orders, 4),
+        'lift': round(together * all_orders / (product_orders * partner_orders), 3)
+    } for partner_id, name, together, partner_orders in rows]
+    return product_orders, all_orders, partners
+
+
+def register_commands(app):
+    """Add the ``flask rebuild-affinity`` command."""
+    @app.cli.command('rebuild-affinity')
+    def rebuild_affinity_command():
+        """Recompute product_affinity from all completed orders."""
+        written = rebuild()
+        click.echo(f"Rebuilt product_affinity: {written} rows")
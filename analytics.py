@@ -0,0 +1,440 @@
+"""Sales report figures shared by the analytics endpoint and the PDF reports.
+
+Everything is aggregated by the database: totals and the per-product
+breakdown come back as one row per product, never as Order objects. Ranges
+that reach back past the archive horizon also read the archive tables.
+"""
+import logging
+from datetime import date, datetime, timedelta, timezone
+from io import BytesIO
+from sqlalchemy import func, select, literal, union_all
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib import colors
+from models import (
+    db, Order, OrderItem, Payment, Product, Category, User,
+    orders_archive, order_items_archive, payments_archive
+)
+import rollups
+import archive
+from report_cache import analytics_cache
+from columnar import columnar_store, DIMENSIONS as SLICE_DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+SERIES_BUCKETS = ('hour', 'day', 'week', 'month')
+SERIES_SPLITS = ('category', 'payment_method', 'cashier')
+HOUR_SERIES_MAX_DAYS = 31
+
+
+def _is_date_only(value):
+    return value is None or len(value) == 10
+
+
+def _completed_in(orders, query, start, end):
+    query = query.where(orders.c.status == 'completed')
+    if start:
+        query = query.where(orders.c.completed_at >= start)
+    if end:
+        query = query.where(orders.c.completed_at <= end)
+    return query
+
+
+def _sources(start):
+    """``(orders, order_items, payments)`` tables to read: the hot tables, plus the archive if needed."""
+    sources = [(Order.__table__, OrderItem.__table__, Payment.__table__)]
+    if archive.needs_archive(start):
+        sources.append((orders_archive, order_items_archive, payments_archive))
+    return sources
+
+
+def order_totals(start=None, end=None):
+    """``(total_sales, total_orders)`` for orders completed between two datetimes."""
+    rows = union_all(*[
+        _completed_in(orders, select(orders.c.total), start, end)
+        for orders, _, _ in _sources(start)
+    ]).subquery()
+    total_sales, total_orders = db.session.execute(
+        select(func.coalesce(func.sum(rows.c.total), 0), func.count())
+        .select_from(rows)
+    ).one()
+    return int(total_sales), total_orders
+
+
+def product_sales(start=None, end=None):
+    """``{product name: {'quantity', 'revenue'}}`` for orders completed between two datetimes.
+
+    Read from the columnar store when it holds the range.
+    """
+    held = columnar_store.aggregate(('product',), start=start, end=end)
+    if held is not None:
+        names = dict(db.session.query(Product.id, Product.name).all())
+        sales = {}
+        for (product_id,), revenue, quantity, _ in held:
+            if product_id in names and quantity:
+                figures = sales.setdefault(names[product_id], {'quantity': 0, 'revenue': 0})
+                figures['quantity'] += quantity
+                figures['revenue'] += revenue
+        return sales
+
+    rows = union_all(*[
+        _completed_in(orders, select(items.c.product_id, items.c.quantity, items.c.total_price)
+                      .select_from(items.join(orders, orders.c.id == items.c.order_id)), start, end)
+        for orders, items, _ in _sources(start)
+    ]).subquery()
+    result = db.session.execute(
+        select(Product.name, func.sum(rows.c.quantity), func.sum(rows.c.total_price))
+        .join_from(rows, Product, Product.id == rows.c.product_id)
+        .group_by(Product.name)
+    ).all()
+    return {name: {'quantity': int(quantity), 'revenue': int(revenue)} for name, quantity, revenue in result}
+
+
+def sales_summary(start_date=None, end_date=None):
+    """Total sales, order count and per-product sales for a report period.
+
+    Date-only parameters (what the dashboard sends) select whole business days,
+    end day included, and are answered from the daily sales rollup. Parameters
+    with a time of day are aggregated from the orders in that exact range.
+    Results are cached (see report_cache.py). Raises ValueError for malformed
+    dates.
+    """
+    start = datetime.fromisoformat(start_date) if start_date else None
+    end = datetime.fromisoformat(end_date) if end_date else None
+
+    if _is_date_only(start_date) and _is_date_only(end_date):
+        start_day = start.date() if start else None
+        end_day = end.date() if end else None
+
+        def compute():
+            total_sales, total_orders = rollups.day_totals(start_day, end_day)
+            return total_sales, total_orders, rollups.product_sales(start_day, end_day)
+    else:
+        start_day = rollups.business_day_for(start) if start else None
+        end_day = rollups.business_day_for(end) if end else None
+
+        def compute():
+            total_sales, total_orders = order_totals(start, end)
+            return total_sales, total_orders, product_sales(start, end)
+
+    return analytics_cache.get(('sales_summary', start_date, end_date), start_day, end_day, compute)
+
+
+def _hour_rows(start_day, end_day, split):
+    """``[(local hour, group, revenue, order_count, items_sold)]`` aggregated from the orders.
+
+    The rollup only has days, so hours are read from the orders of the
+    requested business days (indexed by status and business day).
+    """
+    selects = []
+    for orders, items, payments in _sources(rollups.business_day_start(start_day)):
+        hour = rollups.hour_key(orders.c.completed_at).label('hour')
+        if split == 'category':
+            query = select(
+                hour, Product.category_id.label('group'), orders.c.id.label('order_id'),
+                items.c.total_price.label('revenue'), items.c.quantity.label('items_sold')
+            ).select_from(orders.join(items, items.c.order_id == orders.c.id)
+                          .outerjoin(Product, Product.id == items.c.product_id))
+        else:
+            group = {'payment_method': payments.c.payment_method, 'cashier': orders.c.user_id}.get(split)
+            query = select(
+                hour, (group if group is not None else literal(None)).label('group'),
+                orders.c.id.label('order_id'), orders.c.total.label('revenue'),
+                select(func.coalesce(func.sum(items.c.quantity), 0))
+                .where(items.c.order_id == orders.c.id).scalar_subquery().label('items_sold')
+            )
+            if split == 'payment_method':
+                query = query.select_from(orders.join(payments, payments.c.order_id == orders.c.id))
+        selects.append(query.where(
+            orders.c.status == 'completed',
+            orders.c.business_day >= start_day,
+            orders.c.business_day <= end_day
+        ))
+    rows = union_all(*selects).subquery()
+    result = db.session.execute(
+        select(rows.c.hour, rows.c.group, func.sum(rows.c.revenue),
+               func.count(func.distinct(rows.c.order_id)), func.sum(rows.c.items_sold))
+        .group_by(rows.c.hour, rows.c.group)
+    ).all()
+    return [(rollups.to_shop_time(datetime.strptime(hour, '%Y-%m-%d %H')), group,
+             int(revenue), int(order_count), int(items_sold))
+            for hour, group, revenue, order_count, items_sold in result]
+
+
+def _bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())  # Weeks start on Monday
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _all_buckets(bucket, first_day, last_day):
+    """Every bucket start from ``first_day`` to ``last_day``, so empty buckets show as zero."""
+    if bucket == 'hour':
+        moment, end = rollups.business_day_start(first_day), rollups.business_day_start(last_day + timedelta(days=1))
+        buckets = []
+        while moment < end:
+            buckets.append(rollups.to_shop_time(moment))
+            moment += timedelta(hours=1)
+        return buckets
+    buckets = []
+    day = first_day
+    while day <= last_day:
+        start = _bucket_start(day, bucket)
+        if not buckets or buckets[-1] != start:
+            buckets.append(start)
+        day += timedelta(days=1)
+    return buckets
+
+
+def _series_labels(split, groups):
+    """``{group: label}`` for the groups of a split series."""
+    if split == 'category':
+        names = dict(db.session.query(Category.id, Category.name).filter(Category.id.in_(groups)).all())
+        return {group: names.get(group, 'Uncategorized') for group in groups}
+    if split == 'cashier':
+        names = dict(db.session.query(User.id, User.username).filter(User.id.in_(groups)).all())
+        return {group: names.get(group, f'User {group}') for group in groups}
+    if split == 'payment_method':
+        return {group: group.value for group in groups}
+    return {None: 'All'}
+
+
+def _parse_day(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        raise ValueError('Invalid date format (use YYYY-MM-DD)')
+
+
+def sales_series(bucket, start_date=None, end_date=None, split=None):
+    """Revenue, order count, average ticket and items sold per time bucket.
+
+    ``bucket`` is one of SERIES_BUCKETS and ``split`` None or one of
+    SERIES_SPLITS; the dates are business days, both included. Days, weeks
+    and months are summed from the daily sales rollup; hours are aggregated
+    from the orders and cover at most HOUR_SERIES_MAX_DAYS days (today when no
+    dates are given). Results are cached (see report_cache.py). Raises
+    ValueError for malformed dates or too long hourly ranges.
+    """
+    start_day, end_day = _parse_day(start_date), _parse_day(end_date)
+    if start_day and end_day and start_day > end_day:
+        raise ValueError('start_date is after end_date')
+    if bucket == 'hour':
+        end_day = end_day or rollups.business_day_for(datetime.now(timezone.utc))
+        start_day = start_day or end_day
+        if (end_day - start_day).days >= HOUR_SERIES_MAX_DAYS:
+            raise ValueError(f'Hourly series cover at most {HOUR_SERIES_MAX_DAYS} days')
+
+    def compute():
+        if bucket == 'hour':
+            rows = _hour_rows(start_day, end_day, split)
+        else:
+            rows = [(_bucket_start(day, bucket), *figures)
+                    for day, *figures in rollups.day_series(start_day, end_day, split)]
+        # {group: {bucket start: [revenue, order_count, items_sold]}}
+        sums = {}
+        for bucket_start, group, revenue, order_count, items_sold in rows:
+            figures = sums.setdefault(group, {}).setdefault(bucket_start, [0, 0, 0])
+            figures[0] += revenue
+            figures[1] += order_count
+            figures[2] += items_sold
+        if bucket == 'hour':
+            buckets = _all_buckets(bucket, start_day, end_day)
+        elif rows or (start_day and end_day):
+            starts = [row[0] for row in rows]  # Open ends stop at the first / last bucket with sales
+            buckets = _all_buckets(bucket, start_day or min(starts), end_day or max(starts))
+        else:
+            buckets = []
+        if split is None and not sums:
+            sums[None] = {}
+
+        labels = _series_labels(split, list(sums))
+        series = []
+        for group, by_bucket in sums.items():
+            points = []
+            for bucket_start in buckets:
+                revenue, order_count, items_sold = by_bucket.get(bucket_start, (0, 0, 0))
+                points.append({
+                    'bucket_start': bucket_start.isoformat(),
+                    'revenue': revenue,
+                    'order_count': order_count,
+                    'average_ticket': round(revenue / order_count, 2) if order_count else 0,
+                    'items_sold': items_sold
+                })
+            series.append({
+                'key': group.value if split == 'payment_method' else group,
+                'label': labels[group],
+                'total_revenue': sum(point['revenue'] for point in points),
+                'points': points
+            })
+        series.sort(key=lambda entry: entry['total_revenue'], reverse=True)
+        return series
+
+    return analytics_cache.get(('sales_series', bucket, start_day, end_day, split), start_day, end_day, compute)
+
+
+def _slice_sql(by, start, end, start_day, end_day, filters):
+    """SQL version of ``columnar_store.aggregate`` for ranges the store does not hold."""
+    selects = []
+    first = start or (rollups.business_day_start(start_day) if start_day else None)
+    for orders, items, payments in _sources(first):
+        dimensions = {
+            'product': items.c.product_id,
+            'size': func.coalesce(items.c.size_id, 0),
+            'cashier': orders.c.user_id,
+            'payment_method': payments.c.payment_method,
+            'day': orders.c.business_day,
+            'hour': rollups.hour_key(orders.c.completed_at),
+        }
+        query = select(
+            *[dimensions[dimension].label(dimension) for dimension in by],
+            orders.c.id.label('order_id'), items.c.total_price.label('revenue'), items.c.quantity.label('items_sold')
+        ).select_from(orders.join(items, items.c.order_id == orders.c.id)
+                      .join(payments, payments.c.order_id == orders.c.id))
+        query = _completed_in(orders, query, start, end)
+        if start_day:
+            query = query.where(orders.c.business_day >= start_day)
+        if end_day:
+            query = query.where(orders.c.business_day <= end_day)
+        columns = {'product_id': items.c.product_id, 'size_id': func.coalesce(items.c.size_id, 0),
+                   'user_id': orders.c.user_id, 'payment_method': payments.c.payment_method}
+        for name, value in filters.items():
+            query = query.where(columns[name] == value)
+        selects.append(query)
+    rows = union_all(*selects).subquery()
+    keys = [rows.c[dimension] for dimension in by]
+    result = db.session.execute(
+        select(*keys, func.sum(rows.c.revenue), func.sum(rows.c.items_sold), func.count(func.distinct(rows.c.order_id)))
+        .group_by(*keys)
+    ).all()
+
+    # UTC hours become shop-time hours of day; each order is in one hour, so counts add up
+    sums = {}
+    for row in result:
+        key = tuple(
+            rollups.to_shop_time(datetime.strptime(value, '%Y-%m-%d %H')).hour if dimension == 'hour' else value
+            for dimension, value in zip(by, row)
+        )
+        figures = sums.setdefault(key, [0, 0, 0])
+        for index, value in enumerate(row[len(by):]):
+            figures[index] += int(value)
+    return [(key, *figures) for key, figures in sums.items()]
+
+
+def sales_slice(by, start_date=None, end_date=None, filters=None):
+    """Item revenue (before tax), items sold and order count per combination of ``by``.
+
+    ``by`` is a tuple of SLICE_DIMENSIONS; ``filters`` maps 'product_id',
+    'size_id', 'user_id' and 'payment_method' (a PaymentMethod) to a required
+    value. Date-only parameters select business days, end day included;
+    others are completion times. Answered by the columnar store when it holds
+    the range, by SQL otherwise. Returns ``(rows, source)`` with rows sorted by
+    revenue. Raises ValueError for malformed dates.
+    """
+    filters = filters or {}
+    start = datetime.fromisoformat(start_date) if start_date else None
+    end = datetime.fromisoformat(end_date) if end_date else None
+    if _is_date_only(start_date) and _is_date_only(end_date):
+        days = {'start_day': start.date() if start else None, 'end_day': end.date() if end else None}
+        times = {'start': None, 'end': None}
+    else:
+        days = {'start_day': None, 'end_day': None}
+        times = {'start': start, 'end': end}
+
+    rows, source = columnar_store.aggregate(by, filters=filters, **times, **days), 'columnar'
+    if rows is None:
+        rows, source = _slice_sql(by, filters=filters, **times, **days), 'sql'
+
+    def serialize(dimension, value):
+        if dimension == 'payment_method':
+            return value.value
+        if dimension == 'day':
+            return value.isoformat()
+        return value
+
+    result = [dict(
+        {dimension: serialize(dimension, value) for dimension, value in zip(by, key)},
+        revenue=revenue, items_sold=items_sold, order_count=order_count
+    ) for key, revenue, items_sold, order_count in rows]
+    result.sort(key=lambda row: row['revenue'], reverse=True)
+    return result, source
+
+
+def sales_report_pdf(start_date, end_date, total_sales, total_orders, product_sales):
+    """Render the sales report PDF and return its bytes."""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    styles = getSampleStyleSheet()
+    story = []
+
+    # Title
+    story.append(Paragraph("Sales Report", styles['Title']))
+    story.append(Paragraph("<br/>", styles['Normal']))
+
+    # Period
+    period_text = f"Period: {start_date or 'All time'} to {end_date or 'Present'}"
+    story.append(Paragraph(period_text, styles['Normal']))
+    story.append(Paragraph("<br/>", styles['Normal']))
+
+    # Summary table
+    summary_data = [
+        ['Metric', 'Value'],
+        ['Total Sales', f'DZD {total_sales:.2f}'],
+        ['Total Orders', str(total_orders)]
+    ]
+    summary_table = Table(summary_data)
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 14),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    story.append(summary_table)
+    story.append(Paragraph("<br/>", styles['Normal']))
+
+    # Product sales table
+    if product_sales:
+        story.append(Paragraph("Product Sales", styles['Heading2']))
+        story.append(Paragraph("<br/>", styles['Normal']))
+
+        product_data = [['Product', 'Quantity Sold', 'Price Per Unit (DZD)', 'Revenue (DZD)']]
+        total_revenue = 0
+        for product, data in sorted(product_sales.items(), key=lambda x: x[1]['revenue'], reverse=True):
+            price_per_unit = data['revenue'] / data['quantity'] if data['quantity'] > 0 else 0
+            product_data.append([
+                product,
+                str(data['quantity']),
+                f"{price_per_unit:.2f}",
+                f"{data['revenue']:.2f}"
+            ])
+            total_revenue += data['revenue']
+
+        # Add total row
+        product_data.append(['TOTAL', '', '', f"{total_revenue:.2f}"])
+
+        product_table = Table(product_data)
+        product_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            # Style the total row
+            ('BACKGROUND', (0, -1), (-1, -1), colors.lightblue),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, -1), (-1, -1), 12)
+        ]))
+        story.append(product_table)
+
+    doc.build(story)
+    return buffer.getvalue()
@@ -1,6 +1,7 @@
 from flask import Flask, render_template, send_from_directory, request, redirect, url_for, jsonify
 from flask_cors import CORS
-from flask_migrate import Migrate
+from flask_migrate import Migrate, upgrade, stamp
+from sqlalchemy import inspect
 
 # --- Monkey Patch for ReportLab / hashlib compatibility ---
 # Fixes "TypeError: 'usedforsecurity' is an invalid keyword argument for openssl_md5()"
@@ -23,6 +24,15 @@ except TypeError:
 from models import db, User, Role
 from routes import init_app
 from pos_routes import init_pos_app
+from db_profiles import configure_engine_options, init_db_profiles
+from db_routing import init_read_engine
+from rollups import register_commands as register_rollup_commands
+from archive import register_commands as register_archive_commands
+from affinity import register_commands as register_affinity_commands
+from forecast import register_commands as register_forecast_commands
+from session_totals import register_commands as register_session_totals_commands
+from generate_data import register_commands as register_generate_commands
+from scheduler import init_scheduler, start_scheduler
 from werkzeug.security import generate_password_hash
 import os
 import jwt as pyjwt
@@ -30,6 +40,8 @@ from datetime import datetime, timedelta
 from functools import wraps
 from config import Config, TestConfig
 
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
 def create_app(config_class=Config):
     """Factory function to create and configure the Flask application."""
     app = Flask(__name__)
@@ -41,12 +53,22 @@ def create_app(config_class=Config):
     CORS(app, resources={r"/api/*": {"origins": allowed_origins}})
 
     # Initialize database
+    configure_engine_options(app)
     db.init_app(app)
-    migrate = Migrate(app, db)
+    init_db_profiles(app, db)
+    init_read_engine(app, db)
+    migrate = Migrate(app, db, directory=MIGRATIONS_DIR)
 
     # Register routes
     init_app(app)
     init_pos_app(app)
+    register_rollup_commands(app)
+    register_archive_commands(app)
+    register_affinity_commands(app)
+    register_forecast_commands(app)
+    register_session_totals_commands(app)
+    register_generate_commands(app)
+    init_scheduler(app)
     
     # Authentication decorator for protected routes
     def require_auth(f):
@@ -111,11 +133,22 @@ def create_app(config_class=Config):
     return app
 
 def apply_migrations(app):
-    """Apply database migrations automatically on startup."""
+    """Apply database migrations automatically on startup.
+
+    A new database is built from the models and stamped with the latest
+    revision. An existing one (including databases created with create_all
+    before migrations existed) is upgraded to the latest revision.
+    """
     with app.app_context():
         try:
-            db.create_all()  # Ensure tables are created
-            logging.info("Database tables created or verified.")
+            if not inspect(db.engine).has_table('users'):
+                db.create_all()
+                stamp()
+                logging.info("Database tables created and stamped at the latest migration.")
+            else:
+                upgrade()
+                db.create_all()  # Ensure tables are created
+                logging.info("Database migrated to the latest revision.")
         except Exception as e:
             logging.error(f"Error initializing database: {e}")
 
@@ -181,6 +214,7 @@ if __name__ == '__main__':
     if not app.config.get("TESTING", False):
         apply_migrations(app)
         init_database(app)
+        start_scheduler(app)
 
     # Default port
     port = int(os.environ.get('PORT', 8080))
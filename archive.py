@@ -0,0 +1,166 @@
+"""Move old orders out of the hot tables.
+
+Completed and cancelled orders older than ARCHIVE_AFTER_DAYS are copied, with
+their items, modifiers and payment, into the ``*_archive`` tables and deleted
+from the hot ones, ARCHIVE_BATCH_SIZE orders per transaction. The order
+holding the highest id of each hot table stays: SQLite gives new rows
+max(id) + 1, so deleting it would let a new row reuse an archived id.
+Day-based reports read the daily rollup and never need the archive;
+timestamp ranges include it only when they reach back past the newest
+archived order. ``order_payloads`` serves archived orders to the order
+endpoints, rebuilding the payload of those archived without a snapshot.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+import click
+from flask import current_app
+from sqlalchemy import select, delete, func, and_, or_
+from models import (
+    db, Order, OrderItem, OrderItemModifier, Payment, Product, ProductSize, ProductModifier,
+    orders_archive, order_items_archive, order_item_modifiers_archive, payments_archive,
+    order_fields, item_fields, payment_summary
+)
+from scheduler import register_job
+
+logger = logging.getLogger(__name__)
+
+
+def _copy(source, target, condition):
+    """INSERT INTO target SELECT * FROM source WHERE condition."""
+    columns = [column.name for column in target.columns]
+    db.session.execute(target.insert().from_select(
+        columns, select(*[source.c[name] for name in columns]).where(condition)
+    ))
+
+
+def _newest_order_ids():
+    """Ids of the orders holding the highest id of orders, items, modifiers and payments."""
+    newest_item = select(func.max(OrderItem.id)).scalar_subquery()
+    newest_modifier = select(func.max(OrderItemModifier.id)).scalar_subquery()
+    newest_payment = select(func.max(Payment.id)).scalar_subquery()
+    holders = [
+        select(func.max(Order.id)),
+        select(OrderItem.order_id).where(OrderItem.id == newest_item),
+        select(OrderItem.order_id).join(OrderItemModifier, OrderItemModifier.order_item_id == OrderItem.id)
+        .where(OrderItemModifier.id == newest_modifier),
+        select(Payment.order_id).where(Payment.id == newest_payment),
+    ]
+    return {order_id for holder in holders for order_id in db.session.execute(holder).scalars() if order_id}
+
+
+def archive_orders(before, batch_size):
+    """Archive orders finished before ``before``. Returns the number of orders moved."""
+    finished_before = and_(or_(
+        and_(Order.status == 'completed', Order.completed_at < before),
+        and_(Order.status == 'cancelled', Order.created_at < before)
+    ), Order.id.notin_(_newest_order_ids()))
+    moved = 0
+    while True:
+        order_ids = db.session.execute(
+            select(Order.id).where(finished_before).order_by(Order.id).limit(batch_size)
+        ).scalars().all()
+        if not order_ids:
+            break
+        item_ids = select(OrderItem.id).where(OrderItem.order_id.in_(order_ids))
+
+        orders, items = Order.__table__, OrderItem.__table__
+        modifiers, payments = OrderItemModifier.__table__, Payment.__table__
+        _copy(orders, orders_archive, orders.c.id.in_(order_ids))
+        _copy(items, order_items_archive, items.c.order_id.in_(order_ids))
+        _copy(modifiers, order_item_modifiers_archive, modifiers.c.order_item_id.in_(item_ids))
+        _copy(payments, payments_archive, payments.c.order_id.in_(order_ids))
+
+        db.session.execute(delete(OrderItemModifier).where(OrderItemModifier.order_item_id.in_(item_ids)))
+        db.session.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+        db.session.execute(delete(Payment).where(Payment.order_id.in_(order_ids)))
+        db.session.execute(delete(Order).where(Order.id.in_(order_ids)))
+        db.session.commit()
+        moved += len(order_ids)
+        logger.info(f"Archived {moved} orders so far")
+    return moved
+
+
+def archived_through():
+    """Completion time of the newest archived order, or None when the archive is empty."""
+    return db.session.execute(select(func.max(orders_archive.c.completed_at))).scalar()
+
+
+def needs_archive(start):
+    """Whether a range starting at ``start`` (None = unbounded) reaches archived orders."""
+    newest = archived_through()
+    if newest is None:
+        return False
+    if start is None:
+        return True
+    if start.tzinfo is not None:
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+    return start <= newest
+
+
+def order_payloads(orders):
+    """``{order id: payload}`` for ``orders_archive`` rows, in ``Order.to_compact_dict`` form.
+
+    Orders archived with a snapshot return it; the others, archived before
+    snapshots existed, are rebuilt with three queries for all of them.
+    """
+    payloads = {order.id: order.snapshot for order in orders if order.snapshot is not None}
+    missing = {order.id: order for order in orders if order.snapshot is None}
+    if not missing:
+        return payloads
+
+    items = db.session.execute(
+        select(order_items_archive, Product.name.label('product_name'), ProductSize.name.label('size_name'))
+        .outerjoin(Product, Product.id == order_items_archive.c.product_id)
+        .outerjoin(ProductSize, ProductSize.id == order_items_archive.c.size_id)
+        .where(order_items_archive.c.order_id.in_(missing))
+        .order_by(order_items_archive.c.id)
+    ).all()
+    modifiers = {}
+    for item_id, modifier_id, name, price_modifier in db.session.execute(
+        select(order_item_modifiers_archive.c.order_item_id, order_item_modifiers_archive.c.modifier_id,
+               ProductModifier.name, order_item_modifiers_archive.c.price_modifier)
+        .outerjoin(ProductModifier, ProductModifier.id == order_item_modifiers_archive.c.modifier_id)
+        .where(order_item_modifiers_archive.c.order_item_id.in_([item.id for item in items]))
+        .order_by(order_item_modifiers_archive.c.id)
+    ):
+        modifiers.setdefault(item_id, []).append((modifier_id, name, price_modifier))
+    payments = {payment.order_id: payment for payment in db.session.execute(
+        select(payments_archive).where(payments_archive.c.order_id.in_(missing))
+    )}
+
+    for order_id, order in missing.items():
+        payloads[order_id] = dict(order_fields(order), items=[], payment=payment_summary(payments.get(order_id)))
+    for item in items:
+        payloads[item.order_id]['items'].append(
+            item_fields(item, item.product_name, item.size_name, modifiers.get(item.id, []))
+        )
+    return payloads
+
+
+def order_history(conditions):
+    """``[(created_at, payload)]`` of the archived orders matching ``conditions`` on orders_archive."""
+    orders = db.session.execute(select(orders_archive).where(*conditions)).all()
+    payloads = order_payloads(orders)
+    return [(order.created_at, payloads[order.id]) for order in orders]
+
+
+def archive_old_orders():
+    """Scheduled job: archive orders past the configured horizon."""
+    before = datetime.now(timezone.utc) - timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS'])
+    moved = archive_orders(before, current_app.config['ARCHIVE_BATCH_SIZE'])
+    logger.info(f"Order archival finished: {moved} orders older than {before.date()} moved")
+
+
+register_job('archive_orders', lambda s: s.every().day.at("03:00"), archive_old_orders)
+
+
+def register_commands(app):
+    """Add the ``flask archive-orders`` command."""
+    @app.cli.command('archive-orders')
+    @click.option('--days', type=int, default=None, help='Archive orders older than this many days')
+    def archive_orders_command(days):
+        """Move old completed and cancelled orders to the archive tables."""
+        days = app.config['ARCHIVE_AFTER_DAYS'] if days is None else days
+        before = datetime.now(timezone.utc) - timedelta(days=days)
+        moved = archive_orders(before, app.config['ARCHIVE_BATCH_SIZE'])
+        click.echo(f"Archived {moved} orders older than {before.date()}")
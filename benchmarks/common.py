@@ -0,0 +1,62 @@
+"""Shared helpers for the benchmark scripts in this folder."""
+import os
+import sys
+
+# Make the application modules importable when run as `python benchmarks/<script>.py`
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from werkzeug.security import generate_password_hash
+from config import Config
+from models import db, User, Role, Category, Product, ProductSize, ProductModifier, CashRegisterSession
+
+
+def make_config(database_uri, **overrides):
+    """Build a Config subclass pointing at ``database_uri``."""
+    attrs = {'SQLALCHEMY_DATABASE_URI': database_uri}
+    attrs.update(overrides)
+    return type('BenchmarkConfig', (Config,), attrs)
+
+
+def seed_basic(products=20, cashiers=1, stock=1_000_000):
+    """Create an admin, cashiers with open sessions and a small menu.
+
+    Must run inside an application context. Returns the cashier usernames
+    (password equals username).
+    """
+    db.create_all()
+    db.session.add(User(username='admin', password_hash=generate_password_hash('admin'), role=Role.ADMIN))
+    usernames = []
+    for i in range(cashiers):
+        username = f'cashier{i}'
+        user = User(username=username, password_hash=generate_password_hash(username), role=Role.CASHIER)
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(CashRegisterSession(user_id=user.id, starting_cash=0))
+        usernames.append(username)
+    category = Category(name='Benchmark')
+    db.session.add(category)
+    db.session.flush()
+    for i in range(products):
+        product = Product(name=f'Product {i}', price=100 + i, stock=stock, category_id=category.id)
+        db.session.add(product)
+        db.session.flush()
+        db.session.add(ProductSize(product_id=product.id, name='Large', price_modifier=20))
+        db.session.add(ProductModifier(product_id=product.id, name='Extra Shot', price_modifier=15))
+    db.session.commit()
+    return usernames
+
+
+def login(client, username, password):
+    """Return Authorization headers for ``username``."""
+    response = client.post('/api/login', json={'username': username, 'password': password})
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values`` (0 when empty)."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Per-endpoint latency and query counts over seeded datasets, checked against a baseline.
+
+Each dataset size is generated into a fresh SQLite file (generate_data.py:
+menu, cashiers and days of order history), then every case is requested
+through the Flask test client. The analytics result cache is disabled, so
+report cases time their queries rather than cache hits after the warmup. For each case the script prints p50/p95
+latency and the number of SQL statements per request, and compares them with
+benchmarks/baseline.json:
+
+- more queries per request than the baseline is a regression
+- a p95 more than --tolerance (50% by default) and 5ms above the baseline is a regression
+
+The exit status is 1 when anything regressed, so the script can gate a change.
+Timings depend on the machine; refresh the baseline on the machine that runs
+the comparison with --update-baseline.
+
+Usage: python benchmarks/endpoints.py [--sizes small medium] [--repeat 20] [--update-baseline]
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from common import ROOT_DIR, make_config, seed_basic, login, percentile
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app import create_app
+from models import db, User, Role
+import generate_data
+import rollups
+
+BASELINE_PATH = os.path.join(ROOT_DIR, 'benchmarks', 'baseline.json')
+WARMUP = 3
+ABSOLUTE_SLACK_MS = 5
+
+# name: (days of history, average orders per day)
+DATASETS = {
+    'small': (14, 100),
+    'medium': (60, 400),
+    'large': (365, 1500),
+}
+
+_queries = [0]
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    _queries[0] += 1
+
+
+def _order_payload(i):
+    items = [{'product_id': 1 + (i + n) % 20, 'quantity': 1, 'size_id': None, 'modifier_ids': []} for n in range(3)]
+    return {'items': items, 'customer_name': 'Benchmark'}
+
+
+def _create_order(client, headers, i):
+    return client.post('/api/pos/pos/orders', json=_order_payload(i), headers=headers)
+
+
+def build_cases(client, admin, cashier, history_cashier, last_day, repeat):
+    """``[(name, request function taking the iteration number)]``."""
+    first_day = last_day - timedelta(days=29)
+    pending = []
+
+    def complete_order(i):
+        if not pending:
+            # Orders to complete are created outside the timed request
+            pending.extend(_create_order(client, cashier, n).get_json()['id'] for n in range(WARMUP + repeat))
+        return client.post(f'/api/pos/pos/orders/{pending.pop()}/complete',
+                           json={'payment_method': 'cash'}, headers=cashier)
+
+    days = f'start_date={first_day.isoformat()}&end_date={last_day.isoformat()}'
+    week = f'start_date={(last_day - timedelta(days=6)).isoformat()}&end_date={last_day.isoformat()}'
+    range_ = f'start_date={first_day.isoformat()}T00:00:00&end_date={last_day.isoformat()}T23:59:59'
+    return [
+        ('login', lambda i: client.post('/api/login', json={'username': 'admin', 'password': 'admin'})),
+        ('get_pos_products', lambda i: client.get('/api/pos/pos/products', headers=cashier)),
+        ('create_order', lambda i: _create_order(client, cashier, i)),
+        ('complete_order', complete_order),
+        ('get_orders', lambda i: client.get(f'/api/pos/pos/orders?status=completed&{week}',
+                                            headers=history_cashier)),
+        ('sales_analytics_days', lambda i: client.get(f'/api/pos/analytics/sales?{days}', headers=admin)),
+        ('sales_analytics_range', lambda i: client.get(f'/api/pos/analytics/sales?{range_}', headers=admin)),
+        ('sales_report_pdf', lambda i: client.get(f'/api/pos/reports/sales/pdf?{days}', headers=admin)),
+        ('sales_series_daily', lambda i: client.get(f'/api/pos/analytics/sales/series?bucket=day&{days}',
+                                                    headers=admin)),
+        ('sales_series_hourly', lambda i: client.get(f'/api/pos/analytics/sales/series?bucket=hour&{week}',
+                                                     headers=admin)),
+        ('dashboard_bootstrap', lambda i: client.get('/api/dashboard/bootstrap', headers=admin)),
+    ]
+
+
+def measure(request, repeat):
+    """Run ``request`` WARMUP + ``repeat`` times; returns the figures of the timed runs."""
+    timings, queries = [], []
+    for i in range(WARMUP + repeat):
+        _queries[0] = 0
+        started = time.perf_counter()
+        response = request(i)
+        elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        if i >= WARMUP:
+            timings.append(elapsed * 1000)
+            queries.append(_queries[0])
+    return {
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'queries': max(queries),
+    }
+
+
+def run_dataset(size, repeat):
+    days, orders_per_day = DATASETS[size]
+    workdir = tempfile.mkdtemp(prefix='pos-endpoint-bench-')
+    app = create_app(make_config(f"sqlite:///{os.path.join(workdir, 'bench.db')}", ANALYTICS_CACHE_ENABLED=False))
+    with app.app_context():
+        seed_basic(products=20, cashiers=1)
+        started = time.perf_counter()
+        orders = generate_data.generate(8, 10, 5, days, orders_per_day, seed=1)
+        history_user = db.session.query(User).filter(
+            User.role == Role.CASHIER, User.username != 'cashier0'
+        ).order_by(User.id).first().username
+        last_day = rollups.business_day_for(datetime.now(timezone.utc))
+    print(f"\n[{size}] {orders} orders over {days} days, generated in {time.perf_counter() - started:.1f}s")
+
+    client = app.test_client()
+    admin = login(client, 'admin', 'admin')
+    cashier = login(client, 'cashier0', 'cashier0')
+    history_cashier = login(client, history_user, generate_data.CASHIER_PASSWORD)
+    results = {}
+    for name, request in build_cases(client, admin, cashier, history_cashier, last_day, repeat):
+        results[name] = measure(request, repeat)
+    return results
+
+
+def compare(size, results, baseline, tolerance):
+    """Print the results next to the baseline; returns the names of regressed cases."""
+    regressions = []
+    print(f"{'case':<24}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}   baseline p95 / queries")
+    for name, figures in results.items():
+        expected = baseline.get(size, {}).get(name)
+        verdict = ''
+        if expected:
+            slower = figures['p95_ms'] > expected['p95_ms'] * (1 + tolerance) and \
+                figures['p95_ms'] - expected['p95_ms'] > ABSOLUTE_SLACK_MS
+            more_queries = figures['queries'] > expected['queries']
+            verdict = f"{expected['p95_ms']:>8.2f} / {expected['queries']}"
+            if slower or more_queries:
+                verdict += '   REGRESSION' + (' (slower)' if slower else '') + (' (queries)' if more_queries else '')
+                regressions.append(f'{size}/{name}')
+        print(f"{name:<24}{figures['p50_ms']:>10.2f}{figures['p95_ms']:>10.2f}{figures['queries']:>9}   {verdict}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', choices=list(DATASETS), default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=20, help='Timed requests per case')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed relative p95 increase')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help='Write these results as the new baseline')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)  # Request logging would dominate the timings
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    regressions = []
+    for size in args.sizes:
+        results = run_dataset(size, args.repeat)
+        regressions += compare(size, results, baseline, args.tolerance)
+        if args.update_baseline:
+            baseline[size] = results
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if regressions:
+        print(f"\nRegressions: {', '.join(regressions)}")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Simulate a rush of concurrent cashiers against a running POS server over HTTP.
+
+Each simulated cashier logs in, opens a cash register session, browses the
+product list and rings up orders until the time is up: most are paid
+immediately, some wait as pending orders and are completed a little later,
+and a few are cancelled. Think times between actions are random (exponential
+around --think seconds). At the end every cashier settles its pending orders
+and closes its session.
+
+The report shows throughput, latency percentiles and error rates per
+operation, plus oversell incidents: products whose stock went negative or
+whose stock dropped by less than the quantity the cashiers were charged for.
+
+Cashier accounts (<prefix>0, <prefix>1, ...) are created with the admin
+account if needed. Run it against a test server, not a shop database:
+
+    python app.py   # or gunicorn -c gunicorn.conf.py app:app
+    python benchmarks/load_cashiers.py --url http://127.0.0.1:8080 --cashiers 20 --duration 120 --stock 500
+
+Only needs `requests`; the application does not have to be importable.
+"""
+import argparse
+import random
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+PAYMENT_METHODS = ['cash', 'cash', 'cash', 'credit_card', 'mobile']
+
+
+class Stats:
+    """Latencies and failures per operation, shared by the cashier threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.rejected = defaultdict(int)  # Expected refusals, e.g. insufficient stock
+        self.sold = defaultdict(int)  # product_id -> units in completed orders
+        self.completed_orders = 0
+
+    def record(self, operation, elapsed, outcome):
+        with self.lock:
+            if outcome == 'ok':
+                self.latencies[operation].append(elapsed)
+            elif outcome == 'rejected':
+                self.rejected[operation] += 1
+            else:
+                self.errors[operation] += 1
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values`` (0 when empty)."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+class Cashier:
+    def __init__(self, base_url, username, password, stats, think, rng):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.stats = stats
+        self.think_time = think
+        self.rng = rng
+        self.http = requests.Session()
+        self.products = []
+        self.pending = []
+        self.session_id = None
+        self.cash_taken = 0
+
+    def call(self, operation, method, path, expected=(200, 201), **kwargs):
+        """Send one request and record it. Returns the JSON body, or None on failure."""
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, timeout=30, **kwargs)
+        except requests.RequestException:
+            self.stats.record(operation, time.perf_counter() - started, 'error')
+            return None
+        elapsed = time.perf_counter() - started
+        if response.status_code in expected:
+            self.stats.record(operation, elapsed, 'ok')
+            return response.json()
+        body = response.json() if response.headers.get('Content-Type', '').startswith('application/json') else {}
+        refused = response.status_code == 400 and 'stock' in str(body.get('error', '')).lower()
+        self.stats.record(operation, elapsed, 'rejected' if refused else 'error')
+        return None
+
+    def think(self):
+        time.sleep(self.rng.expovariate(1 / self.think_time) if self.think_time > 0 else 0)
+
+    def start_shift(self):
+        body = self.call('login', 'POST', '/api/login', json={'username': self.username, 'password': self.password})
+        if not body:
+            return False
+        self.http.headers['Authorization'] = f"Bearer {body['token']}"
+        sessions = self.call('list_sessions', 'GET', '/api/cash-register-sessions') or []
+        for session in sessions:
+            if session['status'] == 'open':  # Left over from an interrupted run
+                self.call('close_session', 'PUT', f"/api/cash-register-sessions/{session['id']}/close",
+                          json={'ending_cash': session['starting_cash']})
+        session = self.call('open_session', 'POST', '/api/cash-register-sessions', json={'starting_cash': 10000})
+        if not session:
+            return False
+        self.session_id = session['id']
+        return True
+
+    def browse(self):
+        products = self.call('browse_products', 'GET', '/api/pos/pos/products')
+        if products is not None:
+            self.products = products
+
+    def create_order(self):
+        if not self.products:
+            return None
+        items = [{
+            'product_id': product['id'],
+            'quantity': 1 if self.rng.random() < 0.8 else self.rng.randint(2, 3),
+            'size_id': self.rng.choice(product['sizes'])['id'] if product['sizes'] else None,
+            'modifier_ids': [self.rng.choice(product['modifiers'])['id']]
+            if product['modifiers'] and self.rng.random() < 0.3 else []
+        } for product in self.rng.sample(self.products, min(len(self.products), self.rng.randint(1, 4)))]
+        return self.call('create_order', 'POST', '/api/pos/pos/orders',
+                         json={'items': items, 'customer_name': 'Load test'})
+
+    def complete(self, order):
+        method = self.rng.choice(PAYMENT_METHODS)
+        body = self.call('complete_order', 'POST', f"/api/pos/pos/orders/{order['id']}/complete",
+                         json={'payment_method': method})
+        if body:
+            with self.stats.lock:
+                self.stats.completed_orders += 1
+                for item in order['items']:
+                    self.stats.sold[item['product_id']] += item['quantity']
+            if method == 'cash':
+                self.cash_taken += order['total']
+
+    def cancel(self, order):
+        self.call('cancel_order', 'POST', f"/api/pos/pos/orders/{order['id']}/cancel")
+
+    def run(self, deadline):
+        if not self.start_shift():
+            return
+        self.browse()
+        while time.time() < deadline:
+            self.think()
+            if self.rng.random() < 0.2:
+                self.browse()
+            if self.pending and self.rng.random() < 0.5:
+                self.complete(self.pending.pop(0))
+                continue
+            order = self.create_order()
+            if not order:
+                continue
+            roll = self.rng.random()
+            if roll < 0.6:
+                self.complete(order)  # Paid at the counter
+            elif roll < 0.85:
+                self.pending.append(order)  # Paid when picked up
+            else:
+                self.think()
+                self.cancel(order)
+        for order in self.pending:
+            self.complete(order)
+        self.call('close_session', 'PUT', f'/api/cash-register-sessions/{self.session_id}/close',
+                  json={'ending_cash': 10000 + self.cash_taken})
+
+
+def admin_session(base_url, username, password):
+    http = requests.Session()
+    response = http.post(f'{base_url}/api/login', json={'username': username, 'password': password}, timeout=30)
+    response.raise_for_status()
+    http.headers['Authorization'] = f"Bearer {response.json()['token']}"
+    return http
+
+
+def stock_levels(http, base_url):
+    response = http.get(f'{base_url}/api/products', timeout=30)
+    response.raise_for_status()
+    return {product['id']: product['stock'] for product in response.json()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--cashiers', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=60, help='Seconds of trading')
+    parser.add_argument('--think', type=float, default=1.0, help='Mean think time between actions (seconds)')
+    parser.add_argument('--ramp', type=float, default=5, help='Seconds over which cashiers start')
+    parser.add_argument('--stock', type=int, default=None, help='Reset every product to this stock first')
+    parser.add_argument('--admin-user', default='admin')
+    parser.add_argument('--admin-password', default='admin')
+    parser.add_argument('--prefix', default='load_cashier', help='Username prefix of the simulated cashiers')
+    parser.add_argument('--password', default='load_cashier')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    base_url = args.url.rstrip('/')
+
+    admin = admin_session(base_url, args.admin_user, args.admin_password)
+    usernames = [f'{args.prefix}{i}' for i in range(args.cashiers)]
+    for username in usernames:
+        # 400 when the account already exists from an earlier run
+        admin.post(f'{base_url}/api/users', json={'username': username, 'password': args.password, 'role': 'cashier'},
+                   timeout=30)
+    if args.stock is not None:
+        for product_id in stock_levels(admin, base_url):
+            admin.put(f'{base_url}/api/pos/admin/inventory/{product_id}/stock', json={'stock': args.stock}, timeout=30)
+    stock_before = stock_levels(admin, base_url)
+
+    stats = Stats()
+    rng = random.Random(args.seed)
+    started = time.time()
+    deadline = started + args.ramp + args.duration
+    threads = []
+    for i, username in enumerate(usernames):
+        cashier = Cashier(base_url, username, args.password, stats, args.think, random.Random(rng.random()))
+        delay = args.ramp * i / max(1, args.cashiers)
+        thread = threading.Thread(target=lambda c=cashier, d=delay: (time.sleep(d), c.run(deadline)))
+        threads.append(thread)
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+    stock_after = stock_levels(admin, base_url)
+
+    total_requests = sum(len(values) for values in stats.latencies.values())
+    total_errors = sum(stats.errors.values())
+    print(f"\n{args.cashiers} cashiers, {elapsed:.1f}s: {stats.completed_orders} orders completed "
+          f"({stats.completed_orders / elapsed * 60:.1f}/min), {total_requests / elapsed:.1f} requests/s, "
+          f"error rate {total_errors / max(1, total_requests + total_errors) * 100:.2f}%\n")
+    print(f"{'operation':<18}{'ok':>7}{'errors':>8}{'no stock':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for operation in sorted(set(stats.latencies) | set(stats.errors) | set(stats.rejected)):
+        values = stats.latencies[operation]
+        print(f"{operation:<18}{len(values):>7}{stats.errors[operation]:>8}{stats.rejected[operation]:>10}"
+              f"{percentile(values, 0.5) * 1000:>10.1f}{percentile(values, 0.95) * 1000:>10.1f}"
+              f"{percentile(values, 0.99) * 1000:>10.1f}")
+
+    # Stock can only go down through these cashiers' completed orders during the run
+    incidents = []
+    for product_id, sold in sorted(stats.sold.items()):
+        before, after = stock_before.get(product_id, 0), stock_after.get(product_id, 0)
+        if after < 0:
+            incidents.append(f"product {product_id}: stock went negative ({after})")
+        if sold > before - after:
+            incidents.append(f"product {product_id}: {sold} units sold but stock only fell by {before - after}")
+    print(f"\nOversell incidents: {len(incidents)}")
+    for incident in incidents:
+        print(f"  {incident}")
+    return 1 if incidents else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Checkout and report throughput against a local PostgreSQL with the pool profile.
+
+Runs cashier checkouts (create + complete order) and analytics reads from a
+growing number of threads through the Flask test client, and prints
+throughput, p95 latency and the connection pool figures (checked out,
+overflow, wait time, timeouts) for each step.
+
+The target database is wiped (drop_all/create_all), so point it at a
+dedicated, empty database:
+
+    createdb pos_bench
+    python benchmarks/postgres_pool.py --url postgresql+psycopg2://localhost/pos_bench --reset
+
+Pool settings come from the DB_POOL_* environment variables (see config.py).
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+
+from common import make_config, seed_basic, login, percentile
+
+from app import create_app
+from models import db
+from db_profiles import pool_status
+
+
+def run_step(app, cashiers, threads, seconds):
+    stats = {'write': [], 'read': [], 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        client = app.test_client()
+        is_reader = index % 4 == 3  # One reader for every three cashiers
+        username = 'admin' if is_reader else cashiers[index % len(cashiers)]
+        headers = login(client, username, username)
+        i = 0
+        while time.perf_counter() < deadline:
+            i += 1
+            started = time.perf_counter()
+            if is_reader:
+                ok = client.get('/api/pos/analytics/sales', headers=headers).status_code == 200
+            else:
+                items = [{'product_id': 1 + (i + n) % 20, 'quantity': 1} for n in range(3)]
+                response = client.post('/api/pos/pos/orders', json={'items': items}, headers=headers)
+                ok = response.status_code == 201
+                if ok:
+                    response = client.post(f"/api/pos/pos/orders/{response.get_json()['id']}/complete",
+                                           json={'payment_method': 'cash'}, headers=headers)
+                    ok = response.status_code == 200
+            elapsed = time.perf_counter() - started
+            with lock:
+                if not ok:
+                    stats['errors'] += 1
+                else:
+                    stats['read' if is_reader else 'write'].append(elapsed)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    with app.app_context():
+        pool = pool_status(db.engine)
+    print(f"threads {threads:3d} | checkouts/s {len(stats['write']) / seconds:7.1f} p95 {percentile(stats['write'], 0.95) * 1000:7.1f}ms | "
+          f"reports/s {len(stats['read']) / seconds:6.1f} p95 {percentile(stats['read'], 0.95) * 1000:7.1f}ms | errors {stats['errors']:3d} | "
+          f"pool size {pool.get('size')} overflow {pool.get('overflow')} wait avg {pool.get('wait_avg_ms')}ms "
+          f"max {pool.get('wait_max_ms')}ms timeouts {pool.get('timeouts')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', required=True, help='postgresql:// URL of a dedicated benchmark database')
+    parser.add_argument('--reset', action='store_true', help='confirm the database may be wiped')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--threads', default='4,8,16,32', help='comma-separated thread counts')
+    args = parser.parse_args()
+    if not args.url.startswith('postgresql'):
+        sys.exit('This benchmark targets PostgreSQL; use sqlite_profile.py for SQLite.')
+    if not args.reset:
+        sys.exit('Refusing to wipe the target database without --reset.')
+    logging.disable(logging.CRITICAL)
+
+    app = create_app(make_config(args.url))
+    with app.app_context():
+        db.drop_all()
+        cashiers = seed_basic(products=20, cashiers=8)
+
+    for threads in (int(value) for value in args.threads.split(',')):
+        run_step(app, cashiers, threads, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
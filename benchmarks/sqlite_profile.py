@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Concurrent read/write throughput on SQLite with and without the tuning profile.
+
+Writer threads create and complete orders (checkout) while reader threads
+request the sales analytics report, all through the Flask test client against
+a fresh database file. Each run prints operations per second, p95 latency and
+failed requests (typically 'database is locked').
+
+Usage: python benchmarks/sqlite_profile.py [--seconds 10] [--writers 4] [--readers 4]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from common import make_config, seed_basic, login, percentile
+
+from app import create_app
+from config import Config
+
+
+def run(profile_name, pragmas, seconds, writers, readers):
+    workdir = tempfile.mkdtemp(prefix='pos-sqlite-bench-')
+    database_uri = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    app = create_app(make_config(database_uri, SQLITE_PRAGMAS=pragmas))
+    with app.app_context():
+        cashiers = seed_basic(products=20, cashiers=writers)
+
+    stats = {'write': [], 'read': [], 'write_errors': 0, 'read_errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def writer(index):
+        client = app.test_client()
+        headers = login(client, cashiers[index], cashiers[index])
+        i = 0
+        while time.perf_counter() < deadline:
+            i += 1
+            items = [{'product_id': 1 + (i + n) % 20, 'quantity': 1, 'size_id': None, 'modifier_ids': []} for n in range(3)]
+            started = time.perf_counter()
+            response = client.post('/api/pos/pos/orders', json={'items': items}, headers=headers)
+            ok = response.status_code == 201
+            if ok:
+                order_id = response.get_json()['id']
+                response = client.post(f'/api/pos/pos/orders/{order_id}/complete',
+                                       json={'payment_method': 'cash'}, headers=headers)
+                ok = response.status_code == 200
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    stats['write'].append(elapsed)
+                else:
+                    stats['write_errors'] += 1
+
+    def reader():
+        client = app.test_client()
+        headers = login(client, 'admin', 'admin')
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = client.get('/api/pos/analytics/sales', headers=headers)
+            elapsed = time.perf_counter() - started
+            with lock:
+                if response.status_code == 200:
+                    stats['read'].append(elapsed)
+                else:
+                    stats['read_errors'] += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"{profile_name:<10} "
+          f"checkouts/s {len(stats['write']) / seconds:8.1f}  p95 {percentile(stats['write'], 0.95) * 1000:7.1f}ms  errors {stats['write_errors']:4d} | "
+          f"reports/s {len(stats['read']) / seconds:8.1f}  p95 {percentile(stats['read'], 0.95) * 1000:7.1f}ms  errors {stats['read_errors']:4d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)  # Request logging would dominate the timings
+
+    run('default', {}, args.seconds, args.writers, args.readers)
+    run('tuned', Config.SQLITE_PRAGMAS, args.seconds, args.writers, args.readers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Stress stock updates from many threads and processes and check nothing is lost.
+
+Cashiers hammer the same few products with order checkouts (create + complete)
+and direct sales while an admin restocks them, then the script checks, for
+every product:
+
+    final stock == initial stock + restocked - units in completed orders and sales
+
+and that no stock went negative. A second check submits the completion, then
+the refund, of one order from several threads at once and expects exactly
+one to succeed: one payment, one stock decrement and one give-back. Each run
+uses a fresh database and is
+repeated with cashier threads in one process and with cashier processes (each
+with its own app and connection pool), for SQLite in WAL mode, SQLite with a
+rollback journal and, with --pg-url, a dedicated PostgreSQL database (wiped).
+Achieved orders per second are reported along with any violations; the exit
+status is 1 when an invariant fails.
+
+Usage: python benchmarks/stock_consistency.py [--seconds 10] [--workers 8] [--stock 300]
+                                             [--pg-url postgresql+psycopg2://localhost/pos_stress]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+from common import make_config, seed_basic, login
+
+from sqlalchemy import func
+from app import create_app
+from config import Config
+from models import db, Product, Order, OrderItem, SaleItem, Sale, Payment
+
+HOT_PRODUCTS = 3
+RESTOCK = 5
+DOUBLE_SUBMIT_ROUNDS = 20
+
+
+def cashier_loop(app, username, seconds, seed):
+    """Check out orders and sales on the hot products. Returns this cashier's counters."""
+    rng = random.Random(seed)
+    client = app.test_client()
+    headers = login(client, username, username)
+    counters = {'orders': 0, 'sales': 0, 'refused': 0, 'errors': 0}
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        items = [{'product_id': product_id, 'quantity': rng.randint(1, 3)}
+                 for product_id in rng.sample(range(1, HOT_PRODUCTS + 1), rng.randint(1, HOT_PRODUCTS))]
+        if rng.random() < 0.2:
+            response = client.post('/api/sales', json={'items': items, 'payment_method': 'cash'}, headers=headers)
+            kind = 'sales'
+        else:
+            response = client.post('/api/pos/pos/orders', json={'items': items}, headers=headers)
+            if response.status_code == 201:
+                response = client.post(f"/api/pos/pos/orders/{response.get_json()['id']}/complete",
+                                       json={'payment_method': 'cash'}, headers=headers)
+            kind = 'orders'
+        if response.status_code in (200, 201):
+            counters[kind] += 1
+        elif response.status_code == 400 and 'stock' in response.get_json().get('error', '').lower():
+            counters['refused'] += 1
+        else:
+            counters['errors'] += 1
+    return counters
+
+
+def admin_loop(app, seconds, seed):
+    """Restock a random hot product every few milliseconds. Returns ``{product_id: units added}``."""
+    rng = random.Random(seed)
+    client = app.test_client()
+    headers = login(client, 'admin', 'admin')
+    added = {}
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        product_id = rng.randint(1, HOT_PRODUCTS)
+        response = client.put(f'/api/pos/admin/inventory/{product_id}/stock', json={'adjust': RESTOCK},
+                              headers=headers)
+        if response.status_code == 200:
+            added[product_id] = added.get(product_id, 0) + RESTOCK
+        time.sleep(0.01)
+    return added
+
+
+def _process_worker(database_uri, overrides, role, username, seconds, seed, results):
+    logging.disable(logging.CRITICAL)
+    app = create_app(make_config(database_uri, **overrides))
+    if role == 'admin':
+        results.put(('admin', admin_loop(app, seconds, seed)))
+    else:
+        results.put(('cashier', cashier_loop(app, username, seconds, seed)))
+
+
+def check(app, initial, added):
+    """Compare final stock with what was sold and restocked. Returns a list of violations."""
+    with app.app_context():
+        ordered = dict(db.session.query(OrderItem.product_id, func.sum(OrderItem.quantity))
+                       .join(Order, Order.id == OrderItem.order_id)
+                       .filter(Order.status == 'completed').group_by(OrderItem.product_id).all())
+        sold = dict(db.session.query(SaleItem.product_id, func.sum(SaleItem.quantity))
+                    .join(Sale, Sale.id == SaleItem.sale_id)
+                    .filter(Sale.is_active.is_(True)).group_by(SaleItem.product_id).all())
+        final = dict(db.session.query(Product.id, Product.stock).all())
+    violations = []
+    for product_id in range(1, HOT_PRODUCTS + 1):
+        expected = initial + added.get(product_id, 0) - ordered.get(product_id, 0) - sold.get(product_id, 0)
+        if final[product_id] != expected:
+            violations.append(f"product {product_id}: stock {final[product_id]}, expected {expected}")
+        if final[product_id] < 0:
+            violations.append(f"product {product_id}: negative stock {final[product_id]}")
+    return violations
+
+
+def run(label, database_uri, overrides, mode, workers, seconds, stock):
+    app = create_app(make_config(database_uri, **overrides))
+    with app.app_context():
+        db.drop_all()
+        cashiers = seed_basic(products=HOT_PRODUCTS, cashiers=workers, stock=stock)
+        db.session.remove()
+        db.engine.dispose()  # Processes must not inherit open connections
+
+    totals = {'orders': 0, 'sales': 0, 'refused': 0, 'errors': 0}
+    added = {}
+    if mode == 'threads':
+        outcomes = []
+        threads = [threading.Thread(target=lambda u=u, i=i: outcomes.append(
+            ('cashier', cashier_loop(app, u, seconds, i)))) for i, u in enumerate(cashiers)]
+        threads.append(threading.Thread(target=lambda: outcomes.append(('admin', admin_loop(app, seconds, -1)))))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        processes = [context.Process(target=_process_worker,
+                                     args=(database_uri, overrides, 'cashier', u, seconds, i, results))
+                     for i, u in enumerate(cashiers)]
+        processes.append(context.Process(target=_process_worker,
+                                         args=(database_uri, overrides, 'admin', None, seconds, -1, results)))
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    for role, outcome in outcomes:
+        if role == 'admin':
+            added = outcome
+        else:
+            for name, value in outcome.items():
+                totals[name] += value
+    violations = check(app, stock, added)
+    print(f"{label:<16} {mode:<9} orders/s {(totals['orders'] + totals['sales']) / seconds:7.1f} | "
+          f"orders {totals['orders']:5d} sales {totals['sales']:4d} out of stock {totals['refused']:5d} "
+          f"errors {totals['errors']:4d} restocked {sum(added.values()):4d} | "
+          f"{'OK' if not violations else 'FAILED'}")
+    for violation in violations:
+        print(f"    {violation}")
+    return not violations
+
+
+def _at_once(app, workers, request):
+    """Call ``request(client)`` from ``workers`` threads released together. Returns the status codes."""
+    barrier = threading.Barrier(workers)
+    codes = []
+
+    def worker():
+        client = app.test_client()
+        barrier.wait()
+        codes.append(request(client).status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return codes
+
+
+def double_submit(label, database_uri, overrides, workers, stock):
+    """Complete, then refund, the same order from ``workers`` threads at once."""
+    app = create_app(make_config(database_uri, **overrides))
+    with app.app_context():
+        db.drop_all()
+        seed_basic(products=1, cashiers=1, stock=stock)
+    client = app.test_client()
+    cashier, admin = login(client, 'cashier0', 'cashier0'), login(client, 'admin', 'admin')
+
+    violations = []
+    for _ in range(DOUBLE_SUBMIT_ROUNDS):
+        order_id = client.post('/api/pos/pos/orders', json={'items': [{'product_id': 1, 'quantity': 2}]},
+                               headers=cashier).get_json()['id']
+        completed = _at_once(app, workers, lambda c: c.post(f'/api/pos/pos/orders/{order_id}/complete',
+                                                            json={'payment_method': 'cash'}, headers=cashier))
+        with app.app_context():
+            payments = db.session.query(Payment).filter_by(order_id=order_id).count()
+            after_complete = db.session.get(Product, 1).stock
+        refunded = _at_once(app, workers, lambda c: c.post(f'/api/pos/pos/orders/{order_id}/refund',
+                                                           headers=admin))
+        with app.app_context():
+            after_refund = db.session.get(Product, 1).stock
+        if completed.count(200) != 1 or payments != 1 or after_complete != stock - 2:
+            violations.append(f"order {order_id}: {completed.count(200)} completions succeeded, "
+                              f"{payments} payments, stock {after_complete} (expected {stock - 2})")
+        if refunded.count(200) != 1 or after_refund != stock:
+            violations.append(f"order {order_id}: {refunded.count(200)} refunds succeeded, "
+                              f"stock {after_refund} (expected {stock})")
+    print(f"{label:<16} {'double':<9} {DOUBLE_SUBMIT_ROUNDS} orders completed and refunded by {workers} threads "
+          f"at once | {'OK' if not violations else 'FAILED'}")
+    for violation in violations:
+        print(f"    {violation}")
+    return not violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=8, help='Cashier threads or processes')
+    parser.add_argument('--stock', type=int, default=300, help='Initial stock of each hot product')
+    parser.add_argument('--pg-url', default=None, help='postgresql:// URL of a dedicated database (wiped)')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)  # Request logging would dominate the timings
+
+    workdir = tempfile.mkdtemp(prefix='pos-stock-stress-')
+    # (label, database URL, config overrides)
+    backends = [
+        ('sqlite-wal', f"sqlite:///{os.path.join(workdir, 'wal.db')}", {}),
+        ('sqlite-rollback', f"sqlite:///{os.path.join(workdir, 'rollback.db')}",
+         {'SQLITE_PRAGMAS': dict(Config.SQLITE_PRAGMAS, journal_mode='DELETE', synchronous='FULL')}),
+    ]
+    if args.pg_url:
+        backends.append(('postgresql', args.pg_url, {}))
+
+    ok = True
+    for label, database_uri, overrides in backends:
+        for mode in ('threads', 'processes'):
+            ok = run(label, database_uri, overrides, mode, args.workers, args.seconds, args.stock) and ok
+        ok = double_submit(label, database_uri, overrides, args.workers, args.stock) and ok
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
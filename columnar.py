@@ -0,0 +1,305 @@
+"""Completed order items held in memory as NumPy column arrays for ad-hoc slicing.
+
+The store loads the items of the last COLUMNAR_WINDOW_DAYS business days once
+(hot and archive tables), then keeps up without reloading:
+
+- ``record_completed`` / ``record_refunded`` apply this process's own order
+  completions and refunds right after they commit.
+- Before a query, at most every COLUMNAR_SYNC_SECONDS, it picks up the
+  completions and refunds committed by other server processes.
+
+Filters and group-bys are vectorized (masks, ``np.unique`` and
+``np.bincount``). The arrays stay under COLUMNAR_MEMORY_MB: when they would
+not, the oldest business days are dropped. ``aggregate`` returns None for a
+range the store does not hold (before its first day, or an open start), and
+the caller answers it with SQL instead.
+"""
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from flask import current_app
+from sqlalchemy import select
+from models import (
+    db, Order, OrderItem, Payment, PaymentMethod,
+    orders_archive, order_items_archive, payments_archive
+)
+import numpy as np
+import rollups
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_METHODS = list(PaymentMethod)
+DIMENSIONS = ('product', 'size', 'cashier', 'payment_method', 'day', 'hour')
+# name: dtype; 'active' is cleared when an order is refunded
+COLUMNS = {
+    'ts': 'int64',  # completed_at, UTC epoch seconds
+    'day': 'int32',  # business day ordinal
+    'hour': 'int8',  # hour of day, shop time
+    'order_id': 'int64',
+    'product_id': 'int32',
+    'size_id': 'int32',  # 0 = no size
+    'quantity': 'int32',
+    'revenue': 'int64',
+    'user_id': 'int32',
+    'payment_method': 'int8',  # index in PAYMENT_METHODS
+    'active': 'bool',
+}
+ROW_BYTES = 8 + 4 + 1 + 8 + 4 + 4 + 4 + 8 + 4 + 1 + 1
+SYNC_OVERLAP = timedelta(seconds=30)  # Commits can land a little after their completed_at
+
+
+def _epoch(moment):
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+class ColumnStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._database = None  # URI the arrays were loaded from
+        self._columns = None
+        self._size = 0
+        self._first_day = None  # Earliest business day held in full
+        self._synced_at = None  # Wall clock (UTC) the last load or sync read up to
+        self._synced_monotonic = 0
+
+    def enabled(self):
+        return current_app.config['COLUMNAR_ANALYTICS_ENABLED']
+
+    def _max_rows(self):
+        return current_app.config['COLUMNAR_MEMORY_MB'] * 1024 * 1024 // ROW_BYTES
+
+    # ----- loading -----
+
+    def _rows(self, where):
+        """Item rows of completed orders matching ``where(orders)``, as a dict of arrays."""
+        chunks = []
+        for orders, items, payments in (
+            (Order.__table__, OrderItem.__table__, Payment.__table__),
+            (orders_archive, order_items_archive, payments_archive),
+        ):
+            chunks += db.session.execute(
+                select(orders.c.completed_at, orders.c.business_day, orders.c.id, items.c.product_id,
+                       items.c.size_id, items.c.quantity, items.c.total_price, orders.c.user_id,
+                       payments.c.payment_method)
+                .select_from(orders.join(items, items.c.order_id == orders.c.id)
+                             .join(payments, payments.c.order_id == orders.c.id))
+                .where(orders.c.status == 'completed', *where(orders))
+            ).all()
+        return self._to_columns(chunks)
+
+    def _to_columns(self, rows):
+        """Dict of arrays from ``(completed_at, business_day, order_id, product_id, size_id,
+        quantity, revenue, user_id, payment_method)`` tuples."""
+        payment_codes = {method: code for code, method in enumerate(PAYMENT_METHODS)}
+        count = len(rows)
+        ts = np.fromiter((_epoch(row[0]) for row in rows), dtype='int64', count=count)
+        return {
+            'ts': ts,
+            'day': np.fromiter((row[1].toordinal() for row in rows), dtype='int32', count=count),
+            'hour': self._local_hours(ts),
+            'order_id': np.fromiter((row[2] for row in rows), dtype='int64', count=count),
+            'product_id': np.fromiter((row[3] for row in rows), dtype='int32', count=count),
+            'size_id': np.fromiter((row[4] or 0 for row in rows), dtype='int32', count=count),
+            'quantity': np.fromiter((row[5] for row in rows), dtype='int32', count=count),
+            'revenue': np.fromiter((row[6] for row in rows), dtype='int64', count=count),
+            'user_id': np.fromiter((row[7] for row in rows), dtype='int32', count=count),
+            'payment_method': np.fromiter((payment_codes[row[8]] for row in rows), dtype='int8', count=count),
+            'active': np.ones(count, dtype='bool'),
+        }
+
+    @staticmethod
+    def _local_hours(ts):
+        """Shop-time hour of day of epoch seconds, converting each distinct UTC hour once."""
+        zone = ZoneInfo(current_app.config['SHOP_TIMEZONE'])
+        utc_hours, inverse = np.unique(ts // 3600, return_inverse=True)
+        local = np.array([datetime.fromtimestamp(int(hour) * 3600, zone).hour for hour in utc_hours],
+                         dtype='int8')
+        return local[inverse]
+
+    def _load(self):
+        """Load the window from the database. Must be called with the lock held."""
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        first_day = rollups.business_day_for(now) - timedelta(days=current_app.config['COLUMNAR_WINDOW_DAYS'] - 1)
+        columns = self._rows(lambda orders: [orders.c.business_day >= first_day])
+        self._columns = columns
+        self._size = len(columns['ts'])
+        self._first_day = first_day.toordinal()
+        self._database = current_app.config['SQLALCHEMY_DATABASE_URI']
+        self._synced_at = now
+        self._synced_monotonic = time.monotonic()
+        self._trim()
+        logger.info(f"Columnar analytics loaded {self._size} item rows from {date.fromordinal(self._first_day)} "
+                    f"in {time.perf_counter() - started:.2f}s")
+
+    def _trim(self):
+        """Drop the oldest business days until the arrays fit the memory budget."""
+        max_rows = self._max_rows()
+        if self._size <= max_rows:
+            return
+        days = self._columns['day'][:self._size]
+        counts = np.bincount(days - days.min())
+        # Keep the newest days whose rows fit
+        kept_from_end = np.cumsum(counts[::-1])
+        keep_days = int(np.searchsorted(kept_from_end, max_rows, side='right'))
+        self._first_day = max(self._first_day, int(days.max()) - keep_days + 1)
+        keep = days >= self._first_day
+        self._columns = {name: values[:self._size][keep] for name, values in self._columns.items()}
+        self._size = int(keep.sum())
+        logger.info(f"Columnar analytics trimmed to {self._size} rows from {date.fromordinal(self._first_day)}")
+
+    def _append(self, columns):
+        """Add rows of orders not held yet. Must be called with the lock held."""
+        if not len(columns['ts']):
+            return
+        held = self._columns['order_id'][:self._size]
+        recent = self._columns['ts'][:self._size] >= columns['ts'].min() - SYNC_OVERLAP.total_seconds()
+        new = ~np.isin(columns['order_id'], held[recent]) & (columns['day'] >= self._first_day)
+        added = int(new.sum())
+        if not added:
+            return
+        capacity = len(self._columns['ts'])
+        if self._size + added > capacity:
+            capacity = max(2 * capacity, self._size + added)  # Amortized growth
+            for name, dtype in COLUMNS.items():
+                grown = np.zeros(capacity, dtype=dtype)
+                grown[:self._size] = self._columns[name][:self._size]
+                self._columns[name] = grown
+        for name in COLUMNS:
+            self._columns[name][self._size:self._size + added] = columns[name][new]
+        self._size += added
+        self._trim()
+
+    def _deactivate(self, order_ids):
+        rows = np.isin(self._columns['order_id'][:self._size], order_ids)
+        self._columns['active'][:self._size][rows] = False
+
+    def _ensure_current(self):
+        """Load on first use (or for another database) and sync with other processes.
+
+        Must be called with the lock held and inside an application context.
+        """
+        if self._database != current_app.config['SQLALCHEMY_DATABASE_URI']:
+            self._load()
+            return
+        if time.monotonic() - self._synced_monotonic < current_app.config['COLUMNAR_SYNC_SECONDS']:
+            return
+        now = datetime.now(timezone.utc)
+        since = (self._synced_at - SYNC_OVERLAP).replace(tzinfo=None)
+        self._append(self._rows(lambda orders: [orders.c.completed_at >= since]))
+        # Refunded orders are cancelled and keep their completed_at; refunds are rare
+        refunded = db.session.execute(
+            select(Order.id).where(Order.status == 'cancelled', Order.completed_at >= rollups.business_day_start(
+                date.fromordinal(self._first_day)))
+        ).scalars().all()
+        if refunded:
+            self._deactivate(refunded)
+        self._synced_at = now
+        self._synced_monotonic = time.monotonic()
+
+    # ----- incremental updates -----
+
+    def record_completed(self, order, payment_method):
+        """Add a just-completed order's items."""
+        if not self.enabled():
+            return
+        with self._lock:
+            if self._database != current_app.config['SQLALCHEMY_DATABASE_URI']:
+                return  # Not loaded; the first query will load it
+            self._append(self._to_columns([
+                (order.completed_at, order.business_day, order.id, item.product_id, item.size_id,
+                 item.quantity, item.total_price, order.user_id, payment_method)
+                for item in order.items
+            ]))
+
+    def record_refunded(self, order_id):
+        """Take a just-refunded order out of the figures."""
+        if not self.enabled():
+            return
+        with self._lock:
+            if self._database == current_app.config['SQLALCHEMY_DATABASE_URI']:
+                self._deactivate([order_id])
+
+    # ----- queries -----
+
+    def aggregate(self, by, start=None, end=None, start_day=None, end_day=None, filters=None):
+        """Revenue, items sold and order count per combination of the ``by`` dimensions.
+
+        The range is either datetimes (``start``..``end``, completion time) or
+        business days (``start_day``..``end_day``, both included). ``filters``
+        maps 'product_id', 'size_id', 'user_id' and 'payment_method' (a
+        PaymentMethod) to a required value. Returns ``[(key tuple, revenue,
+        items_sold, order_count)]``, or None when the range reaches before the
+        held window.
+        """
+        if not self.enabled():
+            return None
+        with self._lock:
+            self._ensure_current()
+            first_day = self._first_day
+            size = self._size
+            columns = {name: values[:size] for name, values in self._columns.items()}
+        if start is not None:
+            if _epoch(start) < _epoch(rollups.business_day_start(date.fromordinal(first_day))):
+                return None
+        elif start_day is None or start_day.toordinal() < first_day:
+            return None
+
+        mask = columns['active'].copy()
+        if start is not None:
+            mask &= columns['ts'] >= _epoch(start)
+        if end is not None:
+            mask &= columns['ts'] <= _epoch(end)
+        if start_day is not None:
+            mask &= columns['day'] >= start_day.toordinal()
+        if end_day is not None:
+            mask &= columns['day'] <= end_day.toordinal()
+        for name, value in (filters or {}).items():
+            if name == 'payment_method':
+                value = PAYMENT_METHODS.index(value)
+            mask &= columns[name] == value
+
+        selected = {name: values[mask] for name, values in columns.items()}
+        dimension_columns = {
+            'product': 'product_id', 'size': 'size_id', 'cashier': 'user_id',
+            'payment_method': 'payment_method', 'day': 'day', 'hour': 'hour',
+        }
+        # Factorize each dimension, then combine them into one group number per row
+        uniques, group = [], np.zeros(len(selected['ts']), dtype='int64')
+        for dimension in by:
+            values, inverse = np.unique(selected[dimension_columns[dimension]], return_inverse=True)
+            uniques.append(values)
+            group = group * len(values) + inverse
+        groups, group = np.unique(group, return_inverse=True)
+        revenue = np.bincount(group, weights=selected['revenue'], minlength=len(groups))
+        items_sold = np.bincount(group, weights=selected['quantity'], minlength=len(groups))
+        # An order counts once per group however many of its items fall in it
+        pairs = np.unique(group * (int(selected['order_id'].max(initial=0)) + 1) + selected['order_id'])
+        order_count = np.bincount(pairs // (int(selected['order_id'].max(initial=0)) + 1), minlength=len(groups))
+
+        result = []
+        for index, combined in enumerate(groups.tolist()):
+            key = []
+            for values in reversed(uniques):
+                combined, position = divmod(combined, len(values))
+                key.append(values[position].item())
+            result.append((tuple(self._decode(by, key[::-1])), int(round(revenue[index])),
+                           int(round(items_sold[index])), int(order_count[index])))
+        return result
+
+    @staticmethod
+    def _decode(by, key):
+        for dimension, value in zip(by, key):
+            if dimension == 'payment_method':
+                yield PAYMENT_METHODS[value]
+            elif dimension == 'day':
+                yield date.fromordinal(value)
+            else:
+                yield value
+
+
+columnar_store = ColumnStore()
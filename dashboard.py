@@ -0,0 +1,93 @@
+"""Everything the admin dashboard shows on load, in one cached payload.
+
+``bootstrap`` gathers today's stats, the low-stock products, the latest
+orders and the shop settings with a handful of aggregate and limited queries,
+and keeps the result in the analytics result cache for
+DASHBOARD_CACHE_SECONDS. Completing or refunding an order drops it with the
+rest of today's entries; endpoints that change products, stock or settings
+call ``invalidate``.
+"""
+import logging
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import func, case, select
+from models import db, Product, Order, Payment, Settings
+from report_cache import analytics_cache
+import rollups
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = ('dashboard_bootstrap',)
+LOW_STOCK_LIMIT = 20  # Products listed; the count covers all of them
+RECENT_ORDERS = 10
+
+
+def stats(today):
+    """Today's sales and orders from the rollup, active product counts in one query."""
+    today_sales, today_orders = rollups.day_totals(today, today)
+    total_products, low_stock_count = db.session.query(
+        func.count(Product.id),
+        func.coalesce(func.sum(case((Product.stock <= Product.low_stock_threshold, 1), else_=0)), 0)
+    ).filter(Product.is_active.is_(True)).one()
+    return {
+        'today_sales': today_sales,
+        'today_orders': today_orders,
+        'total_products': total_products,
+        'low_stock_count': low_stock_count
+    }
+
+
+def _low_stock():
+    rows = db.session.query(
+        Product.id, Product.name, Product.stock, Product.low_stock_threshold
+    ).filter(
+        Product.is_active.is_(True),
+        Product.stock <= Product.low_stock_threshold
+    ).order_by(Product.stock, Product.id).limit(LOW_STOCK_LIMIT).all()
+    return [{'id': product_id, 'name': name, 'stock': stock, 'low_stock_threshold': threshold}
+            for product_id, name, stock, threshold in rows]
+
+
+def _recent_orders():
+    # The RECENT_ORDERS-th newest creation time, read from the created_at index
+    # alone, turns the main query into a bounded range search of that index
+    cutoff = select(Order.created_at).order_by(Order.created_at.desc()).offset(RECENT_ORDERS - 1).limit(1)
+    rows = db.session.query(
+        Order.id, Order.user_id, Order.order_type, Order.status, Order.total, Order.created_at,
+        Order.completed_at, Payment.payment_method
+    ).outerjoin(Payment, Payment.order_id == Order.id).filter(
+        Order.created_at >= func.coalesce(cutoff.scalar_subquery(), datetime.min)
+    ).order_by(Order.created_at.desc()).limit(RECENT_ORDERS).all()
+    return [{
+        'id': order_id,
+        'user_id': user_id,
+        'order_type': order_type.value,
+        'status': status,
+        'total': total,
+        'created_at': created_at.isoformat(),
+        'completed_at': completed_at.isoformat() if completed_at else None,
+        'payment_method': payment_method.value if payment_method else None
+    } for order_id, user_id, order_type, status, total, created_at, completed_at, payment_method in rows]
+
+
+def _compute(today):
+    payload = stats(today)
+    return {
+        'stats': payload,
+        'low_stock': {'count': payload['low_stock_count'], 'products': _low_stock()},
+        'recent_orders': _recent_orders(),
+        'settings': dict(db.session.query(Settings.key, Settings.value).all()),
+        'generated_at': datetime.now(timezone.utc).isoformat()
+    }
+
+
+def bootstrap():
+    """The dashboard payload, cached for DASHBOARD_CACHE_SECONDS."""
+    today = rollups.business_day_for(datetime.now(timezone.utc))
+    return analytics_cache.get(CACHE_KEY, today, today, lambda: _compute(today),
+                               live_seconds=current_app.config['DASHBOARD_CACHE_SECONDS'])
+
+
+def invalidate():
+    """Drop the cached payload after a change to products, stock or settings."""
+    analytics_cache.discard(CACHE_KEY)
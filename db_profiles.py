@@ -0,0 +1,110 @@
+"""Per-connection database tuning and connection pool instrumentation."""
+import logging
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with self._metrics_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._metrics_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+
+def configure_engine_options(app):
+    """Fill SQLALCHEMY_ENGINE_OPTIONS with the pool profile for server databases.
+
+    Must run before ``db.init_app``. SQLite keeps Flask-SQLAlchemy's defaults.
+    """
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        return
+
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': app.config['DB_POOL_SIZE'],
+        'max_overflow': app.config['DB_MAX_OVERFLOW'],
+        'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+        'pool_recycle': app.config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': app.config['DB_POOL_PRE_PING'],
+    }
+    if url.get_backend_name() == 'postgresql' and app.config['DB_STATEMENT_TIMEOUT_MS']:
+        # Server-side cap per statement so a runaway report cannot hold a connection
+        options['connect_args'] = {'options': f"-c statement_timeout={app.config['DB_STATEMENT_TIMEOUT_MS']}"}
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def apply_sqlite_profile(engine, pragmas):
+    """Run ``PRAGMA name=value`` for each entry on every new SQLite connection.
+
+    WAL lets report reads proceed while checkout writes are committing;
+    busy_timeout makes writers wait for the lock instead of failing at once.
+    """
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    logger.info(f"SQLite profile applied: {pragmas}")
+
+
+def init_db_profiles(app, db):
+    """Apply the configured profile to the application's engine."""
+    with app.app_context():
+        apply_sqlite_profile(db.engine, app.config.get('SQLITE_PRAGMAS'))
+
+
+def pool_status(engine):
+    """Connection pool figures for monitoring."""
+    pool = engine.pool
+    status = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._metrics_lock:
+            status.update({
+                'checkouts': pool.checkouts,
+                'wait_avg_ms': round(pool.wait_total / pool.checkouts * 1000, 3) if pool.checkouts else 0,
+                'wait_max_ms': round(pool.wait_max * 1000, 3),
+                'timeouts': pool.timeouts
+            })
+    return status
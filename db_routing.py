@@ -0,0 +1,82 @@
+"""Send report and analytics reads to a separate read-only engine.
+
+Endpoints decorated with ``reads_from_replica`` run their queries on the read
+engine, so long report scans use their own connections and never queue behind
+(or hold locks against) checkout writes on the primary. The read engine is
+``SQLALCHEMY_READ_DATABASE_URI`` when set (e.g. a PostgreSQL replica), or a
+``mode=ro`` connection to the primary SQLite file. Without either (in-memory
+SQLite), everything stays on the primary.
+"""
+import logging
+from pathlib import Path
+from urllib.parse import quote
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+from db_profiles import apply_sqlite_profile
+
+logger = logging.getLogger(__name__)
+
+READ_ENGINE_KEY = 'pos_read_engine'
+
+
+class RoutingSession(Session):
+    """Session that uses the read engine inside ``reads_from_replica`` endpoints.
+
+    Flushes always go to the primary, so an accidental write in a routed
+    endpoint still lands in the right database.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('use_read_engine'):
+            read_engine = current_app.extensions.get(READ_ENGINE_KEY)
+            if read_engine is not None:
+                return read_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def reads_from_replica(f):
+    """Route the endpoint's queries to the read-only engine."""
+    def wrapper(*args, **kwargs):
+        g.use_read_engine = True
+        try:
+            return f(*args, **kwargs)
+        finally:
+            g.use_read_engine = False
+    wrapper.__name__ = f.__name__
+    return wrapper
+
+
+def _sqlite_read_only_uri(engine):
+    """``mode=ro`` URI for the primary SQLite file, or None for in-memory databases."""
+    database = engine.url.database
+    if not database or database == ':memory:' or engine.url.query.get('uri'):
+        return None
+    return f"sqlite:///file:{quote(Path(database).as_posix(), safe='/:')}?mode=ro&uri=true"
+
+
+def init_read_engine(app, db):
+    """Create the read engine for ``reads_from_replica`` endpoints."""
+    with app.app_context():
+        primary = db.engine
+
+    read_uri = app.config.get('SQLALCHEMY_READ_DATABASE_URI')
+    if not read_uri and primary.dialect.name == 'sqlite':
+        read_uri = _sqlite_read_only_uri(primary)
+    if not read_uri:
+        logger.info("No read engine configured, reports use the primary database")
+        return
+
+    if read_uri.startswith('sqlite'):
+        engine = create_engine(read_uri)
+        # journal_mode is a write on the database file; the primary sets it
+        pragmas = {name: value for name, value in (app.config.get('SQLITE_PRAGMAS') or {}).items()
+                   if name != 'journal_mode'}
+        pragmas['query_only'] = 1
+        apply_sqlite_profile(engine, pragmas)
+    else:
+        options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        engine = create_engine(read_uri, **options)
+
+    app.extensions[READ_ENGINE_KEY] = engine
+    logger.info(f"Read engine configured: {engine.url.render_as_string(hide_password=True)}")
@@ -0,0 +1,133 @@
+"""In-process publish/subscribe used by the Server-Sent Events endpoints.
+
+Each stream connection gets its own bounded queue. A subscriber that falls
+behind is dropped instead of letting its queue grow; its EventSource reconnects
+with ``Last-Event-ID`` and catches up from the broker's history buffer.
+
+The broker lives in the process that handles the write, so streams only see
+events published by the same process. That holds for ``python app.py``, and
+gunicorn.conf.py runs a single worker while EVENT_STREAMS_ENABLED is on;
+multi-worker deployments turn it off and the stream endpoints return 404.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """A single stream connection."""
+
+    def __init__(self, queue_size):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+
+class EventBroker:
+    """Fan-out of published events to every open subscription."""
+
+    def __init__(self, history_size=500, queue_size=100):
+        # The epoch makes ids from a previous process distinguishable, so a
+        # client reconnecting after a restart gets the whole new history
+        self._epoch = str(int(time.time()))
+        self._sequence = 0
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+        self._queue_size = queue_size
+        self._lock = threading.Lock()
+
+    def publish(self, event_type, data):
+        """Record an event and push it to every subscriber without blocking."""
+        with self._lock:
+            self._sequence += 1
+            event = {
+                'id': f"{self._epoch}:{self._sequence}",
+                'sequence': self._sequence,
+                'event': event_type,
+                'data': json.dumps(data)
+            }
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                # Slow consumer: close its stream, it resumes from the history
+                subscription.overflowed = True
+                self.unsubscribe(subscription)
+                logger.warning("Dropped a slow event stream subscriber")
+        return event['id']
+
+    def subscribe(self, last_event_id=None):
+        """Open a subscription, replaying history after ``last_event_id``."""
+        subscription = Subscription(self._queue_size)
+        with self._lock:
+            for event in self._history_after(last_event_id):
+                try:
+                    subscription.queue.put_nowait(event)
+                except queue.Full:
+                    # Too far behind: send what fits, the client resumes again after it
+                    subscription.overflowed = True
+                    break
+            if not subscription.overflowed:
+                self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _history_after(self, last_event_id):
+        if not last_event_id:
+            return []
+        epoch, _, sequence = last_event_id.partition(':')
+        if epoch != self._epoch:
+            return list(self._history)
+        try:
+            sequence = int(sequence)
+        except ValueError:
+            return []
+        return [event for event in self._history if event['sequence'] > sequence]
+
+    def stream(self, subscription, heartbeat_seconds=15, initial=None):
+        """Yield ``text/event-stream`` chunks until the client goes away.
+
+        ``initial`` is an optional ``(event_type, data)`` sent first, without an id.
+        """
+        try:
+            yield "retry: 3000\n\n"
+            if initial:
+                yield f"event: {initial[0]}\ndata: {json.dumps(initial[1])}\n\n"
+            while True:
+                if subscription.overflowed:
+                    # Deliver what is queued, then close so the client reconnects
+                    try:
+                        event = subscription.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                else:
+                    try:
+                        event = subscription.queue.get(timeout=heartbeat_seconds)
+                    except queue.Empty:
+                        # Comment line keeps proxies from closing the idle connection
+                        yield ": keep-alive\n\n"
+                        continue
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {event['data']}\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+
+order_events = EventBroker(
+    history_size=Config.EVENT_HISTORY_SIZE,
+    queue_size=Config.EVENT_QUEUE_SIZE
+)
@@ -0,0 +1,149 @@
+"""Per-product demand forecasts and reorder suggestions.
+
+The demand forecast job reads the units sold per product, business day and
+hour of day over the last FORECAST_HISTORY_DAYS days and smooths the series
+with exponential smoothing, each step updating all products and hours at once
+as NumPy arrays. For each active product it stores in demand_forecasts:
+
+- the expected units per hour of day and per day, and the smoothed absolute
+  error of the daily figure
+- a reorder point: demand over FORECAST_LEAD_DAYS plus safety stock
+  (FORECAST_SERVICE_Z standard deviations over the lead time)
+- a suggested order, up to FORECAST_COVER_DAYS more days of demand plus safety
+  stock, only when stock is at or below the reorder point
+- when the current stock runs out, following the hourly profile from now
+
+The job runs every hour so projected stock-outs follow stock changes.
+"""
+import logging
+import math
+from datetime import datetime, timedelta, timezone
+import click
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, delete, func
+from models import db, Order, OrderItem, Product, DemandForecast, orders_archive, order_items_archive
+from scheduler import register_job
+import rollups
+
+logger = logging.getLogger(__name__)
+
+MAD_TO_SIGMA = 1.25  # Standard deviation of normal errors per mean absolute error
+
+
+def _smooth(history, alpha):
+    """Smoothed level and mean absolute error of every row of ``history`` (rows x periods)."""
+    level = history[:, :7].mean(axis=1)  # Start from the first week's average
+    error = np.zeros(len(history))
+    for period in range(history.shape[1]):
+        deviation = history[:, period] - level
+        error += alpha * (np.abs(deviation) - error)
+        level += alpha * deviation
+    return level, error
+
+
+def _history(product_ids, first_day, last_day):
+    """Units sold as an array (products x 24 shop-time hours x days)."""
+    index = {product_id: position for position, product_id in enumerate(product_ids)}
+    history = np.zeros((len(product_ids), 24, (last_day - first_day).days + 1))
+    hours = {}
+    for orders, items in ((Order.__table__, OrderItem.__table__), (orders_archive, order_items_archive)):
+        hour = rollups.hour_key(orders.c.completed_at)
+        rows = db.session.execute(
+            select(items.c.product_id, orders.c.business_day, hour, func.sum(items.c.quantity))
+            .select_from(orders.join(items, items.c.order_id == orders.c.id))
+            .where(orders.c.status == 'completed',
+                   orders.c.business_day >= first_day,
+                   orders.c.business_day <= last_day)
+            .group_by(items.c.product_id, orders.c.business_day, hour)
+        ).all()
+        for product_id, day, utc_hour, quantity in rows:
+            if product_id not in index:
+                continue
+            if utc_hour not in hours:
+                hours[utc_hour] = rollups.to_shop_time(datetime.strptime(utc_hour, '%Y-%m-%d %H')).hour
+            history[index[product_id], hours[utc_hour], (day - first_day).days] += quantity
+    return history
+
+
+def _stockout_at(stock, hourly, now, horizon_days):
+    """Naive UTC time at which ``stock`` runs out at ``hourly`` units per shop-time hour."""
+    if stock <= 0:
+        return now
+    per_day = sum(hourly)
+    if per_day <= 0 or stock > per_day * (horizon_days + 1):
+        return None
+    moment, remaining = now, float(stock)
+    end = now + timedelta(days=horizon_days)
+    if remaining > 2 * per_day:
+        days = int(remaining // per_day) - 1  # Skip whole days, then walk the last ones hour by hour
+        moment += timedelta(days=days)
+        remaining -= days * per_day
+    while moment <= end:
+        rate = hourly[rollups.to_shop_time(moment).hour]
+        next_hour = moment.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        used = rate * (next_hour - moment).total_seconds() / 3600
+        if used >= remaining:
+            stockout = moment + timedelta(hours=remaining / rate)
+            return stockout if stockout <= end else None
+        remaining -= used
+        moment = next_hour
+    return None
+
+
+def refresh_forecasts():
+    """Recompute demand_forecasts for every active product. Returns the number of products."""
+    config = current_app.config
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    last_day = rollups.business_day_for(now) - timedelta(days=1)  # Today is not over yet
+    first_day = last_day - timedelta(days=config['FORECAST_HISTORY_DAYS'] - 1)
+    products = db.session.query(Product.id, Product.stock).filter(
+        Product.is_active.is_(True)
+    ).order_by(Product.id).all()
+    if not products:
+        return 0
+
+    history = _history([product_id for product_id, _ in products], first_day, last_day)
+    count, hours, days = history.shape
+    alpha = config['FORECAST_ALPHA']
+    hourly, _ = _smooth(history.reshape(count * hours, days), alpha)
+    hourly = hourly.reshape(count, hours)
+    daily, error = _smooth(history.sum(axis=1), alpha)
+    sigma = MAD_TO_SIGMA * error
+
+    lead_days, cover_days, z = config['FORECAST_LEAD_DAYS'], config['FORECAST_COVER_DAYS'], config['FORECAST_SERVICE_Z']
+    reorder_points = np.ceil(daily * lead_days + z * sigma * math.sqrt(lead_days)).astype(int)
+    order_up_to = np.ceil(daily * (lead_days + cover_days) + z * sigma * math.sqrt(lead_days + cover_days)).astype(int)
+
+    forecasts = []
+    for position, (product_id, stock) in enumerate(products):
+        profile = hourly[position].tolist()
+        reorder_point = int(reorder_points[position])
+        forecasts.append({
+            'product_id': product_id,
+            'daily_demand': float(daily[position]),
+            'daily_deviation': float(sigma[position]),
+            'hourly_demand': profile,
+            'stock': stock,
+            'reorder_point': reorder_point,
+            'suggested_reorder': max(0, int(order_up_to[position]) - stock) if stock <= reorder_point else 0,
+            'stockout_at': _stockout_at(stock, profile, now, config['FORECAST_HORIZON_DAYS']),
+            'computed_at': now
+        })
+    db.session.execute(delete(DemandForecast))
+    db.session.execute(DemandForecast.__table__.insert(), forecasts)
+    db.session.commit()
+    logger.info(f"Demand forecast refreshed for {len(forecasts)} products from {first_day} to {last_day}")
+    return len(forecasts)
+
+
+register_job('demand_forecast', lambda s: s.every().hour.at(":20"), refresh_forecasts)
+
+
+def register_commands(app):
+    """Add the ``flask forecast-demand`` command."""
+    @app.cli.command('forecast-demand')
+    def forecast_demand_command():
+        """Recompute demand forecasts and reorder suggestions now."""
+        count = refresh_forecasts()
+        click.echo(f"Forecast {count} products")
@@ -0,0 +1,243 @@
+"""Synthetic shop data for load testing and report benchmarks.
+
+``flask generate-data`` adds a generated menu (categories, products, sizes and
+modifiers), a team of cashiers with one closed register session per working
+day, and a history of orders spread over the shop's opening hours with
+morning, lunch and afternoon peaks and busier weekends.
+
+Rows are written with executemany INSERTs, one day of orders per transaction,
+with ids assigned up front so nothing is read back. The daily sales rollup is
+rebuilt for the generated days, and product affinity and register session
+totals for all orders, at the end.
+Generated orders have no snapshot and are served from their rows like orders
+completed before snapshots existed.
+"""
+import logging
+import random
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+import click
+from flask import current_app
+from sqlalchemy import func, select, text
+from werkzeug.security import generate_password_hash
+from models import (
+    db, User, Role, Category, Product, ProductSize, ProductModifier, CashRegisterSession,
+    Order, OrderItem, OrderItemModifier, Payment, PaymentMethod, OrderType
+)
+import rollups
+import affinity
+import session_totals
+
+logger = logging.getLogger(__name__)
+
+CASHIER_PASSWORD = 'cashier123'
+
+# Relative order volume per hour of the shop's local day (opening hours 07:00-21:00)
+HOURLY_WEIGHTS = [0] * 7 + [6, 10, 8, 5, 6, 10, 9, 5, 5, 7, 6, 4, 3, 2] + [0] * 3
+WEEKDAY_FACTORS = [0.9, 0.9, 0.95, 1.0, 1.15, 1.35, 1.25]  # Monday..Sunday
+PAYMENT_WEIGHTS = {PaymentMethod.CASH: 60, PaymentMethod.CREDIT_CARD: 30, PaymentMethod.MOBILE: 10}
+CANCEL_RATE = 0.03
+
+MENU_WORDS = ['Espresso', 'Latte', 'Mocha', 'Tea', 'Juice', 'Smoothie', 'Croissant', 'Muffin',
+              'Sandwich', 'Wrap', 'Cookie', 'Cake', 'Bagel', 'Salad', 'Soda', 'Water']
+SIZES = [('Small', 0), ('Medium', 20), ('Large', 40)]
+MODIFIERS = [('Extra Shot', 15), ('Oat Milk', 20), ('Syrup', 10), ('Decaf', 0)]
+
+
+def _next_id(model):
+    return (db.session.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _insert(model, rows):
+    if rows:
+        db.session.execute(model.__table__.insert(), rows)
+
+
+def _sync_sequences(models):
+    """Move PostgreSQL id sequences past the explicitly assigned ids."""
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    for model in models:
+        table = model.__tablename__
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+        ))
+
+
+def generate_menu(rng, categories, products_per_category):
+    """Insert the menu. Returns ``[(product_id, price, [(size_id, extra)], [(modifier_id, extra)])]``."""
+    category_id, product_id = _next_id(Category), _next_id(Product)
+    size_id, modifier_id = _next_id(ProductSize), _next_id(ProductModifier)
+    category_rows, product_rows, size_rows, modifier_rows, menu = [], [], [], [], []
+
+    for _ in range(categories):
+        category_rows.append({'id': category_id, 'name': f'Category {category_id}',
+                              'description': 'Generated category'})
+        for _ in range(products_per_category):
+            price = rng.randrange(40, 400, 10)
+            product_rows.append({
+                'id': product_id, 'name': f'{rng.choice(MENU_WORDS)} {product_id}', 'price': price,
+                'stock': 1_000_000, 'category_id': category_id, 'description': 'Generated product'
+            })
+            sizes, modifiers = [], []
+            if rng.random() < 0.6:
+                for name, extra in SIZES:
+                    size_rows.append({'id': size_id, 'product_id': product_id, 'name': name, 'price_modifier': extra})
+                    sizes.append((size_id, extra))
+                    size_id += 1
+            for name, extra in rng.sample(MODIFIERS, rng.randint(0, len(MODIFIERS))):
+                modifier_rows.append({'id': modifier_id, 'product_id': product_id, 'name': name,
+                                      'price_modifier': extra})
+                modifiers.append((modifier_id, extra))
+                modifier_id += 1
+            menu.append((product_id, price, sizes, modifiers))
+            product_id += 1
+        category_id += 1
+
+    _insert(Category, category_rows)
+    _insert(Product, product_rows)
+    _insert(ProductSize, size_rows)
+    _insert(ProductModifier, modifier_rows)
+    db.session.commit()
+    return menu
+
+
+def generate_cashiers(count):
+    """Insert ``count`` cashiers sharing CASHIER_PASSWORD. Returns their ids."""
+    user_id = _next_id(User)
+    password_hash = generate_password_hash(CASHIER_PASSWORD)
+    rows = [{'id': user_id + n, 'username': f'cashier{user_id + n}', 'password_hash': password_hash,
+             'role': Role.CASHIER} for n in range(count)]
+    _insert(User, rows)
+    db.session.commit()
+    return [row['id'] for row in rows]
+
+
+class _Ids:
+    """Next free id per table, advanced as rows are generated."""
+
+    def __init__(self, *models):
+        self.next = {model: _next_id(model) for model in models}
+
+    def take(self, model):
+        value = self.next[model]
+        self.next[model] += 1
+        return value
+
+
+def _local_moment(rng, day, zone):
+    """A random UTC timestamp on ``day`` following HOURLY_WEIGHTS in the shop's timezone."""
+    hour = rng.choices(range(24), weights=HOURLY_WEIGHTS)[0]
+    local = datetime.combine(day, time(hour, rng.randrange(60), rng.randrange(60)), tzinfo=zone)
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def generate_day(rng, day, orders, menu, popularity, cashiers, ids, zone):
+    """Insert one day of orders (and its register sessions) and commit."""
+    sessions, order_rows, item_rows, modifier_rows, payment_rows = [], [], [], [], []
+    opened = datetime.combine(day, time(7), tzinfo=zone).astimezone(timezone.utc).replace(tzinfo=None)
+    session_ids = {}
+    for user_id in cashiers:
+        session_ids[user_id] = ids.take(CashRegisterSession)
+        sessions.append({'id': session_ids[user_id], 'user_id': user_id, 'starting_cash': 10000,
+                         'ending_cash': 10000, 'status': 'closed', 'start_time': opened,
+                         'end_time': opened + timedelta(hours=14)})
+    cash_taken = dict.fromkeys(cashiers, 0)
+
+    for _ in range(orders):
+        order_id = ids.take(Order)
+        user_id = rng.choice(cashiers)
+        created_at = _local_moment(rng, day, zone)
+        subtotal = 0
+        for product_id, price, sizes, modifiers in rng.choices(menu, weights=popularity, k=rng.randint(1, 4)):
+            quantity = 1 if rng.random() < 0.8 else rng.randint(2, 4)
+            item_id = ids.take(OrderItem)
+            size_id, unit_price = None, price
+            if sizes:
+                size_id, extra = rng.choice(sizes)
+                unit_price += extra
+            item_total = unit_price * quantity
+            if modifiers and rng.random() < 0.3:
+                modifier_id, extra = rng.choice(modifiers)
+                modifier_rows.append({'id': ids.take(OrderItemModifier), 'order_item_id': item_id,
+                                      'modifier_id': modifier_id, 'price_modifier': extra})
+                item_total += extra * quantity
+            item_rows.append({'id': item_id, 'order_id': order_id, 'product_id': product_id, 'size_id': size_id,
+                              'quantity': quantity, 'unit_price': unit_price, 'total_price': item_total})
+            subtotal += item_total
+
+        order = {'id': order_id, 'user_id': user_id, 'session_id': session_ids[user_id],
+                 'order_type': rng.choice(list(OrderType)), 'status': 'cancelled', 'subtotal': subtotal,
+                 'tax_amount': 0, 'total': subtotal, 'created_at': created_at, 'completed_at': None,
+                 'business_day': None}
+        if rng.random() >= CANCEL_RATE:
+            completed_at = created_at + timedelta(seconds=rng.randint(30, 600))
+            method = rng.choices(list(PAYMENT_WEIGHTS), weights=list(PAYMENT_WEIGHTS.values()))[0]
+            order.update(status='completed', completed_at=completed_at,
+                         business_day=rollups.business_day_for(completed_at))
+            payment_rows.append({'id': ids.take(Payment), 'order_id': order_id, 'amount': subtotal,
+                                 'payment_method': method, 'status': 'completed', 'created_at': completed_at})
+            if method == PaymentMethod.CASH:
+                cash_taken[user_id] += subtotal
+        order_rows.append(order)
+
+    for session in sessions:
+        session['ending_cash'] += cash_taken[session['user_id']]
+    _insert(CashRegisterSession, sessions)
+    _insert(Order, order_rows)
+    _insert(OrderItem, item_rows)
+    _insert(OrderItemModifier, modifier_rows)
+    _insert(Payment, payment_rows)
+    db.session.commit()
+
+
+def generate(categories, products_per_category, cashiers, days, orders_per_day, end_day=None, seed=None):
+    """Generate a menu, cashiers and ``days`` days of orders ending on ``end_day``.
+
+    Must run inside an application context. Returns the number of orders written.
+    """
+    rng = random.Random(seed)
+    zone = ZoneInfo(current_app.config['SHOP_TIMEZONE'])
+    end_day = end_day or rollups.business_day_for(datetime.now(timezone.utc)) - timedelta(days=1)
+    start_day = end_day - timedelta(days=days - 1)
+
+    menu = generate_menu(rng, categories, products_per_category)
+    popularity = [1 / rank for rank in range(1, len(menu) + 1)]  # A few best sellers, a long tail
+    rng.shuffle(popularity)
+    cashier_ids = generate_cashiers(cashiers)
+    ids = _Ids(CashRegisterSession, Order, OrderItem, OrderItemModifier, Payment)
+
+    written = 0
+    for offset in range(days):
+        day = start_day + timedelta(days=offset)
+        volume = orders_per_day * WEEKDAY_FACTORS[day.weekday()] * rng.uniform(0.85, 1.15)
+        generate_day(rng, day, int(volume), menu, popularity, cashier_ids, ids, zone)
+        written += int(volume)
+        logger.info(f"Generated {int(volume)} orders for {day}")
+
+    _sync_sequences([Category, Product, ProductSize, ProductModifier, User,
+                     CashRegisterSession, Order, OrderItem, OrderItemModifier, Payment])
+    db.session.commit()
+    # Local opening hours can spill into the neighbouring business days
+    rollups.rebuild(start_day - timedelta(days=1), end_day + timedelta(days=1))
+    affinity.rebuild()
+    session_totals.rebuild()
+    return written
+
+
+def register_commands(app):
+    """Add the ``flask generate-data`` command."""
+    @app.cli.command('generate-data')
+    @click.option('--categories', type=int, default=8, help='Categories to create')
+    @click.option('--products', type=int, default=10, help='Products per category')
+    @click.option('--cashiers', type=int, default=5, help=f'Cashiers to create (password {CASHIER_PASSWORD})')
+    @click.option('--days', type=int, default=365, help='Days of order history')
+    @click.option('--orders-per-day', type=int, default=1000, help='Average orders per day')
+    @click.option('--end', 'end', default=None, help='Last day of history (YYYY-MM-DD, default yesterday)')
+    @click.option('--seed', type=int, default=None, help='Random seed for a reproducible data set')
+    def generate_data_command(categories, products, cashiers, days, orders_per_day, end, seed):
+        """Fill the database with a synthetic menu, cashiers and order history."""
+        end_day = date.fromisoformat(end) if end else None
+        started = datetime.now()
+        written = generate(categories, products, cashiers, days, orders_per_day, end_day, seed)
+        click.echo(f"Generated {written} orders over {days} days in {datetime.now() - started}")
@@ -0,0 +1,66 @@
+"""
+Gunicorn settings for running the POS with a server database (PostgreSQL).
+
+    flask --app app db upgrade        # apply migrations once before starting
+    gunicorn -c gunicorn.conf.py app:app
+
+Every worker process has its own connection pool of up to
+DB_POOL_SIZE + DB_MAX_OVERFLOW connections (see config.py), so the number of
+workers is capped to keep the total under the database's max_connections.
+
+The kitchen display and live dashboard streams are fed by in-process brokers
+(events.py, live_metrics.py): a stream only sees the orders handled by its own
+worker. While EVENT_STREAMS_ENABLED is true (the default) gunicorn therefore
+runs a single worker; set EVENT_STREAMS_ENABLED=false to scale out to several
+workers without the streams.
+"""
+import multiprocessing
+import os
+
+# Every worker imports config.py; without a shared key each one would generate
+# its own and reject tokens issued by the others
+if not os.environ.get('SECRET_KEY'):
+    raise SystemExit('SECRET_KEY must be set when running under gunicorn')
+
+pool_size = int(os.environ.get('DB_POOL_SIZE', 5))
+max_overflow = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+connections_per_worker = pool_size + max_overflow
+
+# Leave headroom under max_connections for migrations, psql and monitoring
+db_max_connections = int(os.environ.get('DB_MAX_CONNECTIONS', 100))
+db_reserved_connections = int(os.environ.get('DB_RESERVED_CONNECTIONS', 10))
+max_workers_for_db = max(1, (db_max_connections - db_reserved_connections) // connections_per_worker)
+
+bind = os.environ.get('GUNICORN_BIND', f"127.0.0.1:{os.environ.get('PORT', 8080)}")
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, max_workers_for_db)))
+
+# Event streams are per process; more workers would split the events between them
+event_streams_enabled = os.environ.get('EVENT_STREAMS_ENABLED', 'true').lower() == 'true'
+if event_streams_enabled and workers > 1:
+    print(f"EVENT_STREAMS_ENABLED is set: running 1 worker instead of {workers}", flush=True)
+    workers = 1
+
+# Threaded workers: one thread per pooled connection so requests rarely wait on
+# the pool, plus spare threads for the long-lived event streams (kitchen
+# display, live dashboard), which hold a thread but no connection.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', connections_per_worker + 8))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_worker_init(worker):
+    # Each worker runs a scheduler thread; the database lease lets only one
+    # of them execute the background jobs
+    from scheduler import start_scheduler
+    start_scheduler(worker.wsgi)
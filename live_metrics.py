@@ -0,0 +1,116 @@
+"""Today's dashboard figures kept in memory and pushed to admin dashboards.
+
+The figures are seeded from the database once (and again when the day
+changes), then updated incrementally by the endpoints that complete orders or
+change stock, so any number of open dashboards costs no extra queries.
+
+The seed remembers which orders it counted, and completions and refunds are
+applied under the same lock by order id, so an order committed while the
+seed query runs is counted exactly once whichever side sees it first.
+
+Like the event brokers (events.py), the figures only see the orders handled
+by this process, which is why gunicorn runs a single worker while
+EVENT_STREAMS_ENABLED is on.
+"""
+import logging
+import threading
+from datetime import datetime, timezone
+from models import db, Product, Order
+from events import EventBroker
+import rollups
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardMetrics:
+    """Today's sales total, order count and low-stock count."""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._lock = threading.Lock()
+        self._day = None
+        self._today_sales = 0
+        self._today_orders = 0
+        self._counted_ids = set()  # Today's completed orders included in the figures
+        self._low_stock_ids = set()
+
+    def _ensure_current(self):
+        """Seed from the database on first use and when the day rolls over.
+
+        Must be called with the lock held and inside an application context.
+        """
+        now = datetime.now(timezone.utc)
+        today = rollups.business_day_for(now)
+        if self._day == today:
+            return
+        # Ids and totals in one statement, so they describe the same committed orders
+        counted = db.session.query(Order.id, Order.total).filter(
+            Order.status == 'completed', Order.business_day == today
+        ).all()
+        low_stock_ids = db.session.query(Product.id).filter(
+            Product.is_active.is_(True),
+            Product.stock <= Product.low_stock_threshold
+        ).all()
+        self._day = today
+        self._counted_ids = {order_id for order_id, _ in counted}
+        self._today_sales = sum(total for _, total in counted)
+        self._today_orders = len(counted)
+        self._low_stock_ids = {product_id for (product_id,) in low_stock_ids}
+        logger.info(f"Dashboard metrics seeded for {today}")
+
+    def _snapshot(self):
+        return {
+            'today_sales': self._today_sales,
+            'today_orders': self._today_orders,
+            'low_stock_count': len(self._low_stock_ids)
+        }
+
+    def snapshot(self):
+        """Current figures (requires an application context on first call)."""
+        with self._lock:
+            self._ensure_current()
+            return self._snapshot()
+
+    def record_order_completed(self, order_id, total, business_day):
+        """Account for a just-completed order and push the new figures."""
+        with self._lock:
+            self._ensure_current()
+            if business_day == self._day and order_id not in self._counted_ids:
+                self._counted_ids.add(order_id)
+                self._today_sales += total
+                self._today_orders += 1
+            snapshot = self._snapshot()
+        self.broker.publish('metrics', snapshot)
+
+    def record_order_refunded(self, order_id, total, business_day):
+        """Take a refunded order out of today's figures if they count it."""
+        with self._lock:
+            self._ensure_current()
+            if business_day == self._day and order_id in self._counted_ids:
+                self._counted_ids.discard(order_id)
+                self._today_sales -= total
+                self._today_orders -= 1
+            snapshot = self._snapshot()
+        self.broker.publish('metrics', snapshot)
+
+    def record_stock(self, levels):
+        """Update low-stock membership from ``(product_id, stock, threshold)`` tuples.
+
+        ``stock`` is None for a deleted or archived product. Pushes only when the count changes.
+        """
+        with self._lock:
+            self._ensure_current()
+            before = len(self._low_stock_ids)
+            for product_id, stock, threshold in levels:
+                if stock is not None and stock <= threshold:
+                    self._low_stock_ids.add(product_id)
+                else:
+                    self._low_stock_ids.discard(product_id)
+            changed = len(self._low_stock_ids) != before
+            snapshot = self._snapshot()
+        if changed:
+            self.broker.publish('metrics', snapshot)
+
+
+dashboard_events = EventBroker(history_size=1, queue_size=10)
+dashboard_metrics = DashboardMetrics(dashboard_events)
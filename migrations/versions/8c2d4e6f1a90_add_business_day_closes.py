@@ -0,0 +1,54 @@
+"""Add business day close records and strip DAILY_RESET tags from orders
+
+Revision ID: 8c2d4e6f1a90
+Revises: 5b1f0c3d9a72
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c2d4e6f1a90'
+down_revision = '5b1f0c3d9a72'
+branch_labels = None
+depends_on = None
+
+
+# The old midnight job wrote "DAILY_RESET_YYYY-MM-DD" (22 characters) into
+# special_instructions, or appended "|DAILY_RESET_YYYY-MM-DD" (23 characters)
+STRIP_TAG = """
+UPDATE orders SET special_instructions = ''
+WHERE special_instructions LIKE 'DAILY\\_RESET\\_%' ESCAPE '\\' AND LENGTH(special_instructions) = 22
+"""
+STRIP_SUFFIX = """
+UPDATE orders
+SET special_instructions = SUBSTR(special_instructions, 1, LENGTH(special_instructions) - 23)
+WHERE special_instructions LIKE '%|DAILY\\_RESET\\_%' ESCAPE '\\'
+  AND SUBSTR(special_instructions, LENGTH(special_instructions) - 22, 13) = '|DAILY_RESET_'
+"""
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'business_day_closes' not in sa.inspect(bind).get_table_names():
+        op.create_table(
+            'business_day_closes',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('business_day', sa.Date(), nullable=False),
+            sa.Column('total_sales', sa.Integer(), nullable=False),
+            sa.Column('order_count', sa.Integer(), nullable=False),
+            sa.Column('closed_at', sa.DateTime(), nullable=False),
+            sa.Column('closed_by', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['closed_by'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('business_day')
+        )
+
+    op.execute(STRIP_TAG)
+    op.execute(STRIP_SUFFIX)
+
+
+def downgrade():
+    op.drop_table('business_day_closes')
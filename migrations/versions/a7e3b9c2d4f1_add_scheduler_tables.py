@@ -0,0 +1,47 @@
+"""Add the scheduler lease and job status tables
+
+Revision ID: a7e3b9c2d4f1
+Revises: 8c2d4e6f1a90
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e3b9c2d4f1'
+down_revision = '8c2d4e6f1a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'scheduler_leases' not in tables:
+        op.create_table(
+            'scheduler_leases',
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('holder', sa.String(length=100), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+    if 'scheduled_job_status' not in tables:
+        op.create_table(
+            'scheduled_job_status',
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('last_started_at', sa.DateTime(), nullable=True),
+            sa.Column('last_success_at', sa.DateTime(), nullable=True),
+            sa.Column('last_duration_ms', sa.Integer(), nullable=True),
+            sa.Column('last_lag_ms', sa.Integer(), nullable=True),
+            sa.Column('last_error', sa.Text(), nullable=True),
+            sa.Column('last_holder', sa.String(length=100), nullable=True),
+            sa.Column('run_count', sa.Integer(), nullable=False),
+            sa.Column('failure_count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+
+
+def downgrade():
+    op.drop_table('scheduled_job_status')
+    op.drop_table('scheduler_leases')
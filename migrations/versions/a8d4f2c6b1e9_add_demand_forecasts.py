@@ -0,0 +1,43 @@
+"""Add the demand forecast table
+
+Revision ID: a8d4f2c6b1e9
+Revises: f3c7a1d9e2b6
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d4f2c6b1e9'
+down_revision = 'f3c7a1d9e2b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'demand_forecasts' in sa.inspect(bind).get_table_names():
+        return
+
+    # Filled by the demand forecast job on its next run
+    op.create_table(
+        'demand_forecasts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('daily_demand', sa.Float(), nullable=False),
+        sa.Column('daily_deviation', sa.Float(), nullable=False),
+        sa.Column('hourly_demand', sa.JSON(), nullable=False),
+        sa.Column('stock', sa.Integer(), nullable=False),
+        sa.Column('reorder_point', sa.Integer(), nullable=False),
+        sa.Column('suggested_reorder', sa.Integer(), nullable=False),
+        sa.Column('stockout_at', sa.DateTime(), nullable=True),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('product_id')
+    )
+
+
+def downgrade():
+    op.drop_table('demand_forecasts')
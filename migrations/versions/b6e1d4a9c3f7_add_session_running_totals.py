@@ -0,0 +1,71 @@
+"""Add running totals to cash register sessions
+
+Revision ID: b6e1d4a9c3f7
+Revises: a8d4f2c6b1e9
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e1d4a9c3f7'
+down_revision = 'a8d4f2c6b1e9'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('cash_sales', 'card_sales', 'mobile_sales', 'order_count', 'refund_count', 'refund_total', 'cash_refunds')
+ORDER_SOURCES = (('orders', 'payments'), ('orders_archive', 'payments_archive'))
+
+
+def _order_sum(value, condition):
+    """SUM of ``value`` over a session's hot and archived order payments matching ``condition``."""
+    return ' + '.join(
+        f"COALESCE((SELECT SUM({value}) FROM {payments} p JOIN {orders} o ON o.id = p.order_id "
+        f"WHERE o.session_id = cash_register_sessions.id AND {condition}), 0)"
+        for orders, payments in ORDER_SOURCES
+    )
+
+
+def _sale_sum(value, condition):
+    return (f"COALESCE((SELECT SUM({value}) FROM sales s "
+            f"WHERE s.session_id = cash_register_sessions.id AND s.is_active AND {condition}), 0)")
+
+
+def _backfill(bind):
+    taken = "p.status IN ('completed', 'refunded')"  # A refunded order was a sale first
+    refunded = "p.status = 'refunded'"
+    totals = {
+        'cash_sales': (_order_sum('p.amount', f"{taken} AND p.payment_method = 'CASH'"),
+                       _sale_sum('s.total', "s.payment_method = 'CASH'")),
+        'card_sales': (_order_sum('p.amount', f"{taken} AND p.payment_method = 'CREDIT_CARD'"),
+                       _sale_sum('s.total', "s.payment_method = 'CREDIT_CARD'")),
+        'mobile_sales': (_order_sum('p.amount', f"{taken} AND p.payment_method = 'MOBILE'"),
+                         _sale_sum('s.total', "s.payment_method = 'MOBILE'")),
+        'order_count': (_order_sum('1', taken), _sale_sum('1', '1 = 1')),
+        'refund_count': (_order_sum('1', refunded),),
+        'refund_total': (_order_sum('p.amount', refunded),),
+        'cash_refunds': (_order_sum('p.amount', f"{refunded} AND p.payment_method = 'CASH'"),),
+    }
+    assignments = ', '.join(f"{column} = {' + '.join(parts)}" for column, parts in totals.items())
+    bind.execute(sa.text(f"UPDATE cash_register_sessions SET {assignments}"))
+
+
+def upgrade():
+    bind = op.get_bind()
+    existing = {column['name'] for column in sa.inspect(bind).get_columns('cash_register_sessions')}
+    missing = [column for column in COLUMNS if column not in existing]
+    if not missing:
+        return
+
+    with op.batch_alter_table('cash_register_sessions') as batch_op:
+        for column in missing:
+            batch_op.add_column(sa.Column(column, sa.Integer(), server_default='0', nullable=False))
+    _backfill(bind)
+
+
+def downgrade():
+    with op.batch_alter_table('cash_register_sessions') as batch_op:
+        for column in COLUMNS:
+            batch_op.drop_column(column)
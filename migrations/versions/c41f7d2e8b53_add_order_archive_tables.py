@@ -0,0 +1,92 @@
+"""Add archive tables for orders, order items, modifiers and payments
+
+Revision ID: c41f7d2e8b53
+Revises: a7e3b9c2d4f1
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f7d2e8b53'
+down_revision = 'a7e3b9c2d4f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+
+    if 'orders_archive' not in tables:
+        op.create_table(
+            'orders_archive',
+            sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('session_id', sa.Integer(), nullable=False),
+            sa.Column('customer_name', sa.String(length=100), nullable=True),
+            sa.Column('customer_phone', sa.String(length=20), nullable=True),
+            sa.Column('order_type', sa.Enum('DINE_IN', 'TAKEAWAY', name='ordertype', create_type=False),
+                      nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('subtotal', sa.Integer(), nullable=False),
+            sa.Column('tax_amount', sa.Integer(), nullable=False),
+            sa.Column('total', sa.Integer(), nullable=False),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('special_instructions', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('completed_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_orders_archive_completed_at', 'orders_archive', ['completed_at'], unique=False)
+
+    if 'order_items_archive' not in tables:
+        op.create_table(
+            'order_items_archive',
+            sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('order_id', sa.Integer(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('size_id', sa.Integer(), nullable=True),
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.Column('unit_price', sa.Integer(), nullable=False),
+            sa.Column('total_price', sa.Integer(), nullable=False),
+            sa.Column('special_instructions', sa.Text(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_order_items_archive_order_id', 'order_items_archive', ['order_id'], unique=False)
+        op.create_index('ix_order_items_archive_product_id', 'order_items_archive', ['product_id'], unique=False)
+
+    if 'order_item_modifiers_archive' not in tables:
+        op.create_table(
+            'order_item_modifiers_archive',
+            sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('order_item_id', sa.Integer(), nullable=False),
+            sa.Column('modifier_id', sa.Integer(), nullable=False),
+            sa.Column('price_modifier', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_order_item_modifiers_archive_order_item_id', 'order_item_modifiers_archive',
+                        ['order_item_id'], unique=False)
+
+    if 'payments_archive' not in tables:
+        op.create_table(
+            'payments_archive',
+            sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('order_id', sa.Integer(), nullable=False),
+            sa.Column('amount', sa.Integer(), nullable=False),
+            sa.Column('payment_method', sa.Enum('CASH', 'CREDIT_CARD', 'MOBILE', name='paymentmethod',
+                                                create_type=False), nullable=False),
+            sa.Column('transaction_id', sa.String(length=100), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_payments_archive_order_id', 'payments_archive', ['order_id'], unique=False)
+
+
+def downgrade():
+    op.drop_table('payments_archive')
+    op.drop_table('order_item_modifiers_archive')
+    op.drop_table('order_items_archive')
+    op.drop_table('orders_archive')
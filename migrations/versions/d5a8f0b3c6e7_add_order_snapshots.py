@@ -0,0 +1,34 @@
+"""Add the order snapshot column to orders and orders_archive
+
+Revision ID: d5a8f0b3c6e7
+Revises: c41f7d2e8b53
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a8f0b3c6e7'
+down_revision = 'c41f7d2e8b53'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('orders', 'orders_archive')
+
+
+def upgrade():
+    # Existing orders keep a NULL snapshot and are still served from their rows
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        if 'snapshot' not in {column['name'] for column in inspector.get_columns(table)}:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.add_column(sa.Column('snapshot', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('snapshot')
@@ -0,0 +1,43 @@
+"""Add indexes for the order, sale and session hot paths
+
+Revision ID: e34a673aafa2
+Revises: 
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e34a673aafa2'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_orders_status_completed_at', 'orders', ['status', 'completed_at']),
+    ('ix_orders_user_id_status_created_at', 'orders', ['user_id', 'status', 'created_at']),
+    ('ix_orders_created_at', 'orders', ['created_at']),
+    ('ix_order_items_order_id', 'order_items', ['order_id']),
+    ('ix_order_items_product_id', 'order_items', ['product_id']),
+    ('ix_order_item_modifiers_order_item_id', 'order_item_modifiers', ['order_item_id']),
+    ('ix_payments_order_id', 'payments', ['order_id']),
+    ('ix_sales_date', 'sales', ['date']),
+    ('ix_sales_user_id_date', 'sales', ['user_id', 'date']),
+    ('ix_sale_items_sale_id', 'sale_items', ['sale_id']),
+    ('ix_sale_items_product_id', 'sale_items', ['product_id']),
+    ('ix_cash_register_sessions_user_id_status', 'cash_register_sessions', ['user_id', 'status']),
+]
+
+
+def upgrade():
+    # This is the first revision: databases created before it were built with
+    # db.create_all(), so the tables exist and only the indexes are missing.
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,120 @@
+"""Add indexed business_day columns to orders, orders_archive and sales
+
+Revision ID: e9b2c5d8f4a1
+Revises: d5a8f0b3c6e7
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from datetime import timedelta, timezone
+from zoneinfo import ZoneInfo
+from alembic import op
+from flask import current_app
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9b2c5d8f4a1'
+down_revision = 'd5a8f0b3c6e7'
+branch_labels = None
+depends_on = None
+
+
+# (table, timestamp the day is derived from, index name, index columns)
+TABLES = (
+    ('orders', 'completed_at', 'ix_orders_status_business_day', ['status', 'business_day']),
+    ('orders_archive', 'completed_at', 'ix_orders_archive_business_day', ['business_day']),
+    ('sales', 'date', 'ix_sales_business_day', ['business_day']),
+)
+BATCH_SIZE = 1000
+
+# daily_sales_rollup was keyed on the UTC date of completed_at (5b1f0c3d9a72);
+# rebuilt on the backfilled business days, from hot and archived orders, with
+# the same grouping as rollups.rebuild()
+ORDER_SOURCES = (('orders', 'order_items', 'payments'),
+                 ('orders_archive', 'order_items_archive', 'payments_archive'))
+
+REBUILD_ITEMS = """
+INSERT INTO daily_sales_rollup
+    (business_day, product_id, size_id, payment_method, user_id, quantity, revenue, order_count)
+SELECT business_day, product_id, size_id, payment_method, user_id,
+       SUM(quantity), SUM(total_price), COUNT(DISTINCT order_id)
+FROM ({lines}) lines
+GROUP BY business_day, product_id, size_id, payment_method, user_id
+"""
+ITEM_LINES = """
+SELECT o.business_day, oi.product_id, COALESCE(oi.size_id, 0) AS size_id, p.payment_method, o.user_id,
+       o.id AS order_id, oi.quantity, oi.total_price
+FROM {orders} o
+JOIN {order_items} oi ON oi.order_id = o.id
+JOIN {payments} p ON p.order_id = o.id
+WHERE o.status = 'completed' AND o.business_day IS NOT NULL
+"""
+
+REBUILD_TOTALS = """
+INSERT INTO daily_sales_rollup
+    (business_day, product_id, size_id, payment_method, user_id, quantity, revenue, order_count)
+SELECT business_day, 0, 0, payment_method, user_id, SUM(quantity), SUM(total), COUNT(*)
+FROM ({lines}) totals
+GROUP BY business_day, payment_method, user_id
+"""
+TOTAL_LINES = """
+SELECT o.business_day, p.payment_method, o.user_id, o.total,
+       (SELECT COALESCE(SUM(oi.quantity), 0) FROM {order_items} oi WHERE oi.order_id = o.id) AS quantity
+FROM {orders} o
+JOIN {payments} p ON p.order_id = o.id
+WHERE o.status = 'completed' AND o.business_day IS NOT NULL
+"""
+
+
+def _backfill(bind, table, source, zone, rollover_hour):
+    """Derive business_day from ``source`` for existing rows, as rollups.business_day_for does."""
+    rows_table = sa.table(table, sa.column('id', sa.Integer()), sa.column(source, sa.DateTime()),
+                          sa.column('business_day', sa.Date()))
+    rows = bind.execute(sa.select(rows_table.c.id, rows_table.c[source]).where(
+        rows_table.c[source].isnot(None), rows_table.c.business_day.is_(None)
+    )).all()
+    update = rows_table.update().where(rows_table.c.id == sa.bindparam('row_id')).values(
+        business_day=sa.bindparam('day')
+    )
+    for start in range(0, len(rows), BATCH_SIZE):
+        params = []
+        for row_id, moment in rows[start:start + BATCH_SIZE]:
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+            params.append({'row_id': row_id, 'day': (moment.astimezone(zone) - timedelta(hours=rollover_hour)).date()})
+        bind.execute(update, params)
+
+
+def _rebuild_rollup():
+    for statement, lines in ((REBUILD_ITEMS, ITEM_LINES), (REBUILD_TOTALS, TOTAL_LINES)):
+        union = ' UNION ALL '.join(
+            lines.format(orders=orders, order_items=order_items, payments=payments)
+            for orders, order_items, payments in ORDER_SOURCES
+        )
+        op.execute(statement.format(lines=union))
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    zone = ZoneInfo(current_app.config.get('SHOP_TIMEZONE', 'UTC'))
+    rollover_hour = current_app.config.get('BUSINESS_DAY_ROLLOVER_HOUR', 0)
+
+    for table, source, index, columns in TABLES:
+        if 'business_day' not in {column['name'] for column in inspector.get_columns(table)}:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.add_column(sa.Column('business_day', sa.Date(), nullable=True))
+        if index not in {existing['name'] for existing in inspector.get_indexes(table)}:
+            op.create_index(index, table, columns, unique=False)
+        # Orders that are not completed keep a NULL business_day
+        _backfill(bind, table, source, zone, rollover_hour)
+
+    op.execute('DELETE FROM daily_sales_rollup')
+    _rebuild_rollup()
+
+
+def downgrade():
+    for table, _, index, _ in TABLES:
+        op.drop_index(index, table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('business_day')
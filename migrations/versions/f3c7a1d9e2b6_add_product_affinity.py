@@ -0,0 +1,59 @@
+"""Add the product affinity table and backfill it from completed orders
+
+Revision ID: f3c7a1d9e2b6
+Revises: e9b2c5d8f4a1
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c7a1d9e2b6'
+down_revision = 'e9b2c5d8f4a1'
+branch_labels = None
+depends_on = None
+
+
+# Same counts as affinity.rebuild(), written out so the migration does not
+# depend on the application models. UNION keeps each product once per order.
+LINES = """
+SELECT oi.order_id, oi.product_id FROM order_items oi
+JOIN orders o ON o.id = oi.order_id WHERE o.status = 'completed'
+UNION
+SELECT oi.order_id, oi.product_id FROM order_items_archive oi
+JOIN orders_archive o ON o.id = oi.order_id WHERE o.status = 'completed'
+"""
+BACKFILL_PAIRS = f"""
+INSERT INTO product_affinity (product_id, partner_id, order_count)
+SELECT a.product_id, b.product_id, COUNT(*)
+FROM ({LINES}) a JOIN ({LINES}) b ON b.order_id = a.order_id
+GROUP BY a.product_id, b.product_id
+"""
+BACKFILL_ALL_ORDERS = f"""
+INSERT INTO product_affinity (product_id, partner_id, order_count)
+SELECT 0, 0, COUNT(DISTINCT l.order_id) FROM ({LINES}) l
+"""
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'product_affinity' in sa.inspect(bind).get_table_names():
+        return
+
+    op.create_table(
+        'product_affinity',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('partner_id', sa.Integer(), nullable=False),
+        sa.Column('order_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('product_id', 'partner_id', name='uq_product_affinity_pair')
+    )
+    op.execute(BACKFILL_PAIRS)
+    op.execute(BACKFILL_ALL_ORDERS)
+
+
+def downgrade():
+    op.drop_table('product_affinity')
@@ -1,8 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
+from db_routing import RoutingSession
 from enum import Enum
 from datetime import datetime, timezone
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class Role(Enum):
     ADMIN = 'admin'
@@ -110,9 +111,13 @@ class Sale(db.Model):
     session_id = db.Column(db.Integer, db.ForeignKey('cash_register_sessions.id'), nullable=False)
     is_active = db.Column(db.Boolean, default=True, nullable=False)
     date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    business_day = db.Column(db.Date)  # Set from date when the sale is recorded, see rollups.business_day_for
     
     __table_args__ = (
         db.CheckConstraint('total > 0', name='check_total_positive'),
+        db.Index('ix_sales_date', 'date'),
+        db.Index('ix_sales_business_day', 'business_day'),
+        db.Index('ix_sales_user_id_date', 'user_id', 'date'),
     )
     
     user = db.relationship('User', back_populates='sales')
@@ -141,6 +146,8 @@ class SaleItem(db.Model):
     __table_args__ = (
         db.CheckConstraint('quantity > 0', name='check_quantity_positive'),
         db.CheckConstraint('unit_price > 0', name='check_unit_price_positive'),
+        db.Index('ix_sale_items_sale_id', 'sale_id'),
+        db.Index('ix_sale_items_product_id', 'product_id'),
     )
     
     sale = db.relationship('Sale', back_populates='items')
@@ -199,6 +206,54 @@ class ProductModifier(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+def order_fields(order):
+    """Columns shared by the order payloads, from an Order or an orders_archive row."""
+    return {
+        'id': order.id,
+        'user_id': order.user_id,
+        'session_id': order.session_id,
+        'customer_name': order.customer_name,
+        'customer_phone': order.customer_phone,
+        'order_type': order.order_type.value,
+        'status': order.status,
+        'subtotal': order.subtotal,
+        'tax_amount': order.tax_amount,
+        'total': order.total,
+        'notes': order.notes,
+        'created_at': order.created_at.isoformat(),
+        'completed_at': order.completed_at.isoformat() if order.completed_at else None
+    }
+
+def item_fields(item, product_name, size_name, modifiers):
+    """Item payload from an OrderItem or an order_items_archive row.
+
+    ``modifiers`` are ``(modifier_id, name, price_modifier)`` tuples.
+    """
+    return {
+        'id': item.id,
+        'product_id': item.product_id,
+        'product_name': product_name or 'Unknown Product',
+        'size_id': item.size_id,
+        'size_name': size_name,
+        'quantity': item.quantity,
+        'unit_price': item.unit_price,
+        'total_price': item.total_price,
+        'special_instructions': item.special_instructions,
+        'modifier_ids': [modifier_id for modifier_id, _, _ in modifiers],
+        'modifiers': [{'id': modifier_id, 'name': name, 'price_modifier': price_modifier}
+                      for modifier_id, name, price_modifier in modifiers]
+    }
+
+def payment_summary(payment):
+    """Payment method, amount and status of an order's payment, or None."""
+    if payment is None:
+        return None
+    return {
+        'payment_method': payment.payment_method.value,
+        'amount': payment.amount,
+        'status': payment.status
+    }
+
 class Order(db.Model):
     __tablename__ = 'orders'
     id = db.Column(db.Integer, primary_key=True)
@@ -215,12 +270,23 @@ class Order(db.Model):
     special_instructions = db.Column(db.Text, default='')
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     completed_at = db.Column(db.DateTime)
+    business_day = db.Column(db.Date)  # Set from completed_at at completion, see rollups.business_day_for
+    # to_compact_dict() frozen when the order is completed or cancelled (rewritten by a refund)
+    snapshot = db.Column(db.JSON(none_as_null=True))
     
     __table_args__ = (
         db.CheckConstraint("status IN ('pending', 'completed', 'cancelled')", name='check_order_status_valid'),
         db.CheckConstraint('subtotal >= 0', name='check_subtotal_non_negative'),
         db.CheckConstraint('tax_amount >= 0', name='check_tax_amount_non_negative'),
         db.CheckConstraint('total >= 0', name='check_total_non_negative'),
+        # Analytics, dashboard and reports: completed orders in a time range
+        db.Index('ix_orders_status_completed_at', 'status', 'completed_at'),
+        # Day-scoped reports, rollup rebuilds
+        db.Index('ix_orders_status_business_day', 'status', 'business_day'),
+        # Cashier lists: own orders by status, newest first
+        db.Index('ix_orders_user_id_status_created_at', 'user_id', 'status', 'created_at'),
+        # Admin order list and history ranges
+        db.Index('ix_orders_created_at', 'created_at'),
     )
     
     user = db.relationship('User')
@@ -229,22 +295,16 @@ class Order(db.Model):
     payment = db.relationship('Payment', back_populates='order', uselist=False)
 
     def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'session_id': self.session_id,
-            'customer_name': self.customer_name,
-            'customer_phone': self.customer_phone,
-            'order_type': self.order_type.value,
-            'status': self.status,
-            'subtotal': self.subtotal,
-            'tax_amount': self.tax_amount,
-            'total': self.total,
-            'notes': self.notes,
-            'created_at': self.created_at.isoformat(),
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-            'items': [item.to_dict() for item in self.items]
-        }
+        return dict(order_fields(self), items=[item.to_dict() for item in self.items])
+
+    def to_compact_dict(self):
+        """Order payload for the cashier screens: items without order_id, plus the payment summary.
+
+        Expects ``items`` (with product, size and modifiers) and ``payment`` to be
+        eager-loaded, see ``pos_routes._order_detail_options``.
+        """
+        return dict(order_fields(self), items=[item.to_compact_dict() for item in self.items],
+                    payment=payment_summary(self.payment))
 
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
@@ -261,6 +321,8 @@ class OrderItem(db.Model):
         db.CheckConstraint('quantity > 0', name='check_quantity_positive'),
         db.CheckConstraint('unit_price >= 0', name='check_unit_price_non_negative'),
         db.CheckConstraint('total_price >= 0', name='check_total_price_non_negative'),
+        db.Index('ix_order_items_order_id', 'order_id'),
+        db.Index('ix_order_items_product_id', 'product_id'),
     )
     
     order = db.relationship('Order', back_populates='items')
@@ -269,20 +331,16 @@ class OrderItem(db.Model):
     modifiers = db.relationship('OrderItemModifier', back_populates='order_item', cascade='all, delete-orphan')
 
     def to_dict(self):
-        return {
-            'id': self.id,
-            'order_id': self.order_id,
-            'product_id': self.product_id,
-            'size_id': self.size_id,
-            'quantity': self.quantity,
-            'unit_price': self.unit_price,
-            'total_price': self.total_price,
-            'special_instructions': self.special_instructions,
-            'product_name': self.product.name if self.product else 'Unknown Product',
-            'size_name': self.size.name if self.size else None,
-            'modifier_ids': [mod.modifier_id for mod in self.modifiers],
-            'modifiers': [{'id': mod.modifier_id, 'name': mod.modifier.name, 'price_modifier': mod.price_modifier} for mod in self.modifiers]
-        }
+        return dict(self.to_compact_dict(), order_id=self.order_id)
+
+    def to_compact_dict(self):
+        """Item payload without the redundant order_id, used by ``Order.to_compact_dict``."""
+        return item_fields(
+            self,
+            self.product.name if self.product else None,
+            self.size.name if self.size else None,
+            [(mod.modifier_id, mod.modifier.name, mod.price_modifier) for mod in self.modifiers]
+        )
 
 class OrderItemModifier(db.Model):
     __tablename__ = 'order_item_modifiers'
@@ -291,6 +349,10 @@ class OrderItemModifier(db.Model):
     modifier_id = db.Column(db.Integer, db.ForeignKey('product_modifiers.id'), nullable=False)
     price_modifier = db.Column(db.Integer, nullable=False)
     
+    __table_args__ = (
+        db.Index('ix_order_item_modifiers_order_item_id', 'order_item_id'),
+    )
+    
     order_item = db.relationship('OrderItem', back_populates='modifiers')
     modifier = db.relationship('ProductModifier', back_populates='order_item_modifiers')
 
@@ -315,6 +377,7 @@ class Payment(db.Model):
     __table_args__ = (
         db.CheckConstraint('amount > 0', name='check_amount_positive'),
         db.CheckConstraint("status IN ('pending', 'completed', 'failed', 'refunded')", name='check_payment_status_valid'),
+        db.Index('ix_payments_order_id', 'order_id'),
     )
     
     order = db.relationship('Order', back_populates='payment')
@@ -339,10 +402,20 @@ class CashRegisterSession(db.Model):
     status = db.Column(db.String(20), default='open', nullable=False)
     start_time = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     end_time = db.Column(db.DateTime)
+    # Running totals kept by session_totals in the payment's transaction
+    cash_sales = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    card_sales = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    mobile_sales = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    order_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    refund_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    refund_total = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    cash_refunds = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     
     __table_args__ = (
         db.CheckConstraint('starting_cash >= 0', name='check_starting_cash_non_negative'),
         db.CheckConstraint("status IN ('open', 'closed')", name='check_status_valid'),
+        # Open-session lookup done by every order and sale
+        db.Index('ix_cash_register_sessions_user_id_status', 'user_id', 'status'),
     )
     
     user = db.relationship('User', back_populates='sessions')
@@ -356,7 +429,14 @@ class CashRegisterSession(db.Model):
             'ending_cash': self.ending_cash,
             'status': self.status,
             'start_time': self.start_time.isoformat(),
-            'end_time': self.end_time.isoformat() if self.end_time else None
+            'end_time': self.end_time.isoformat() if self.end_time else None,
+            'cash_sales': self.cash_sales,
+            'card_sales': self.card_sales,
+            'mobile_sales': self.mobile_sales,
+            'order_count': self.order_count,
+            'refund_count': self.refund_count,
+            'refund_total': self.refund_total,
+            'expected_cash': self.starting_cash + (self.cash_sales or 0) - (self.cash_refunds or 0)
         }
 
 class Settings(db.Model):
@@ -377,4 +457,183 @@ class Settings(db.Model):
             'description': self.description,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+class DailySalesRollup(db.Model):
+    """Completed sales aggregated per business day, product, size, payment method and cashier.
+
+    Maintained in the same transaction as order completion (see rollups.py).
+    Rows with product_id ORDER_TOTALS hold whole-order figures: revenue is the
+    order total and order_count the number of orders.
+    """
+    __tablename__ = 'daily_sales_rollup'
+
+    ORDER_TOTALS = 0  # product_id/size_id sentinel for order total rows, and size_id for "no size"
+
+    id = db.Column(db.Integer, primary_key=True)
+    business_day = db.Column(db.Date, nullable=False)
+    product_id = db.Column(db.Integer, nullable=False)
+    size_id = db.Column(db.Integer, default=0, nullable=False)
+    payment_method = db.Column(db.Enum(PaymentMethod), nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, default=0, nullable=False)
+    revenue = db.Column(db.Integer, default=0, nullable=False)
+    order_count = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('business_day', 'product_id', 'size_id', 'payment_method', 'user_id',
+                            name='uq_daily_sales_rollup_key'),
+    )
+
+    def to_dict(self):
+        return {
+            'business_day': self.business_day.isoformat(),
+            'product_id': self.product_id,
+            'size_id': self.size_id,
+            'payment_method': self.payment_method.value,
+            'user_id': self.user_id,
+            'quantity': self.quantity,
+            'revenue': self.revenue,
+            'order_count': self.order_count
+        }
+
+class ProductAffinity(db.Model):
+    """Completed orders containing a product together with a partner product.
+
+    Kept in both directions, updated in the same transaction as order
+    completion (see affinity.py). Rows with partner_id == product_id count the
+    orders containing the product; the (ALL_ORDERS, ALL_ORDERS) row counts all
+    completed orders.
+    """
+    __tablename__ = 'product_affinity'
+
+    ALL_ORDERS = 0  # product_id/partner_id sentinel for the all-orders row
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False)
+    partner_id = db.Column(db.Integer, nullable=False)
+    order_count = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'partner_id', name='uq_product_affinity_pair'),
+    )
+
+class DemandForecast(db.Model):
+    """Latest demand forecast and reorder suggestion of a product.
+
+    Rewritten by the demand forecast job (see forecast.py). Demand is in units:
+    per day, and per hour of day (shop time) as a list of 24 values.
+    """
+    __tablename__ = 'demand_forecasts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, unique=True, nullable=False)
+    daily_demand = db.Column(db.Float, default=0, nullable=False)
+    daily_deviation = db.Column(db.Float, default=0, nullable=False)
+    hourly_demand = db.Column(db.JSON, nullable=False)
+    stock = db.Column(db.Integer, nullable=False)  # Stock when the forecast was computed
+    reorder_point = db.Column(db.Integer, nullable=False)
+    suggested_reorder = db.Column(db.Integer, default=0, nullable=False)
+    stockout_at = db.Column(db.DateTime)  # None when not expected within the horizon
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'daily_demand': round(self.daily_demand, 2),
+            'daily_deviation': round(self.daily_deviation, 2),
+            'hourly_demand': [round(value, 3) for value in self.hourly_demand],
+            'stock': self.stock,
+            'reorder_point': self.reorder_point,
+            'suggested_reorder': self.suggested_reorder,
+            'stockout_at': self.stockout_at.isoformat() if self.stockout_at else None,
+            'computed_at': self.computed_at.isoformat()
+        }
+
+class BusinessDayClose(db.Model):
+    """Figures of a closed business day, written by the close-of-day job.
+
+    Closing again refreshes the figures, so the job can safely run twice.
+    """
+    __tablename__ = 'business_day_closes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    business_day = db.Column(db.Date, unique=True, nullable=False)
+    total_sales = db.Column(db.Integer, default=0, nullable=False)
+    order_count = db.Column(db.Integer, default=0, nullable=False)
+    closed_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    closed_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+
+    def to_dict(self):
+        return {
+            'business_day': self.business_day.isoformat(),
+            'total_sales': self.total_sales,
+            'order_count': self.order_count,
+            'closed_at': self.closed_at.isoformat(),
+            'closed_by': self.closed_by
+        }
+
+class SchedulerLease(db.Model):
+    """Time-limited lock naming the process that runs background jobs."""
+    __tablename__ = 'scheduler_leases'
+
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+class ScheduledJobStatus(db.Model):
+    """Outcome of the latest runs of a background job."""
+    __tablename__ = 'scheduled_job_status'
+
+    name = db.Column(db.String(50), primary_key=True)
+    last_started_at = db.Column(db.DateTime)
+    last_success_at = db.Column(db.DateTime)
+    last_duration_ms = db.Column(db.Integer)
+    last_lag_ms = db.Column(db.Integer)  # How late the run started after its scheduled time
+    last_error = db.Column(db.Text)
+    last_holder = db.Column(db.String(100))
+    run_count = db.Column(db.Integer, default=0, nullable=False)
+    failure_count = db.Column(db.Integer, default=0, nullable=False)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'last_started_at': self.last_started_at.isoformat() if self.last_started_at else None,
+            'last_success_at': self.last_success_at.isoformat() if self.last_success_at else None,
+            'last_duration_ms': self.last_duration_ms,
+            'last_lag_ms': self.last_lag_ms,
+            'last_error': self.last_error,
+            'last_holder': self.last_holder,
+            'run_count': self.run_count,
+            'failure_count': self.failure_count
+        }
+
+def _archive_table(model, name, *indexes):
+    """Cold copy of ``model``'s table for archived rows: same columns, no constraints."""
+    return db.Table(
+        name,
+        *[db.Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable,
+                   autoincrement=False)
+          for column in model.__table__.columns],
+        *indexes
+    )
+
+# Completed and cancelled orders past the archive horizon are moved here (see archive.py)
+orders_archive = _archive_table(
+    Order, 'orders_archive',
+    db.Index('ix_orders_archive_completed_at', 'completed_at'),
+    db.Index('ix_orders_archive_business_day', 'business_day')
+)
+order_items_archive = _archive_table(
+    OrderItem, 'order_items_archive',
+    db.Index('ix_order_items_archive_order_id', 'order_id'),
+    db.Index('ix_order_items_archive_product_id', 'product_id')
+)
+order_item_modifiers_archive = _archive_table(
+    OrderItemModifier, 'order_item_modifiers_archive',
+    db.Index('ix_order_item_modifiers_archive_order_item_id', 'order_item_id')
+)
+payments_archive = _archive_table(
+    Payment, 'payments_archive',
+    db.Index('ix_payments_archive_order_id', 'order_id')
+)
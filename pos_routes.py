@@ -1,27 +1,36 @@
-from flask import Blueprint, jsonify, request, Response, send_from_directory
+from flask import Blueprint, jsonify, request, Response, send_from_directory, current_app
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import selectinload
-from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, or_, and_
+from sqlalchemy.orm import selectinload, joinedload
+from datetime import date, datetime, timedelta, timezone
 import os
 import uuid
-import threading
-import schedule
-import time
 from werkzeug.utils import secure_filename
 from models import (
     db, User, Category, Product, ProductSize, ProductModifier, 
-    Order, OrderItem, OrderItemModifier, Payment, Role, PaymentMethod, OrderType, CashRegisterSession, Settings
+    Order, OrderItem, OrderItemModifier, Payment, Role, PaymentMethod, OrderType, CashRegisterSession, Settings,
+    BusinessDayClose, DemandForecast, orders_archive
 )
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt as pyjwt
 import logging
 import re
-from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
 from config import Config
+from events import order_events
+from live_metrics import dashboard_events, dashboard_metrics
+from db_profiles import pool_status
+from db_routing import reads_from_replica
+import rollups
+import affinity
+import analytics
+import archive
+import forecast
+import stock
+import session_totals
+import dashboard
+from report_cache import analytics_cache
+from columnar import columnar_store
+from scheduler import register_job, SCHEDULER_KEY
 
 pos_api = Blueprint('pos_api', __name__)
 logger = logging.getLogger(__name__)
@@ -40,16 +49,23 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 SECRET_KEY = Config.SECRET_KEY
 TOKEN_EXPIRATION_MINUTES = Config.TOKEN_EXPIRATION_MINUTES
 
-def _require_auth(required_role=None):
-    """Decorator to require JWT authentication and optional role check."""
+def _require_auth(required_role=None, allow_query_token=False):
+    """Decorator to require JWT authentication and optional role check.
+
+    With ``allow_query_token`` the JWT may also come as a 'token' query param:
+    EventSource cannot send an Authorization header, so stream endpoints take
+    the token from the URL the same way the PDF download endpoint does.
+    """
     def decorator(f):
         def wrapper(*args, **kwargs):
+            token = request.args.get('token') if allow_query_token else None
             auth_header = request.headers.get('Authorization')
-            if not auth_header or not auth_header.startswith('Bearer '):
+            if not token and auth_header and auth_header.startswith('Bearer '):
+                token = auth_header.split(' ')[1]
+            if not token:
                 logger.error("Missing or invalid Authorization header")
                 return jsonify({'error': 'Authorization token required'}), 401
             try:
-                token = auth_header.split(' ')[1]
                 payload = pyjwt.decode(token, SECRET_KEY, algorithms=['HS256'])
                 user = db.session.get(User, payload['user_id'])
                 if not user or not user.is_active:
@@ -73,6 +89,59 @@ def _require_auth(required_role=None):
         return wrapper
     return decorator
 
+def _event_stream_response(broker, initial=None):
+    """Subscribe to ``broker`` and return a streaming SSE response.
+
+    ``initial`` is an optional callable returning the first ``(event_type, data)``.
+    Returns 404 when EVENT_STREAMS_ENABLED is off (multi-worker deployments).
+    """
+    if not current_app.config['EVENT_STREAMS_ENABLED']:
+        logger.error("Event stream requested while EVENT_STREAMS_ENABLED is off")
+        return jsonify({'error': 'Event streams are disabled on this server'}), 404
+    subscription = broker.subscribe(
+        request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    )
+    return Response(
+        broker.stream(subscription, heartbeat_seconds=Config.EVENT_HEARTBEAT_SECONDS,
+                      initial=initial() if initial else None),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Disable proxy buffering (nginx)
+        }
+    )
+
+def _claim_order(order_id, from_status, to_status):
+    """Move an order from ``from_status`` to ``to_status`` in one conditional UPDATE.
+
+    Returns False, after rolling back, when the order is no longer in
+    ``from_status``. Otherwise the change is part of the caller's transaction,
+    and the database makes concurrent claims of the same order wait for it.
+    """
+    orders = Order.__table__
+    claimed = db.session.execute(
+        update(orders).where(orders.c.id == order_id, orders.c.status == from_status).values(status=to_status)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+    return bool(claimed)
+
+def _publish_order_event(event_type, order):
+    """Publish an order event for the kitchen display once the change is committed."""
+    try:
+        order_events.publish(event_type, order.to_compact_dict())
+    except Exception as e:
+        # Never fail the checkout because of a display feed
+        logger.error(f"Error publishing {event_type} event: {str(e)}")
+
+def _record_stock_levels(levels):
+    """Feed ``(product_id, stock, threshold)`` tuples to the live dashboard and drop its cached payload."""
+    dashboard.invalidate()
+    try:
+        dashboard_metrics.record_stock(levels)
+    except Exception as e:
+        logger.error(f"Error updating dashboard metrics: {str(e)}")
+
 # ---------- ADMIN DASHBOARD ENDPOINTS ----------
 
 @pos_api.route('/admin/products', methods=['POST'])
@@ -128,6 +197,7 @@ def create_product():
 
         db.session.commit()
         logger.info(f"Product created: {product.name}")
+        _record_stock_levels([(product.id, product.stock, product.low_stock_threshold)])
         return jsonify(product.to_dict()), 201
     except IntegrityError:
         db.session.rollback()
@@ -180,6 +250,7 @@ def update_product(product_id):
         product.updated_at = datetime.now(timezone.utc)
         db.session.commit()
         logger.info(f"Product updated: {product.name}")
+        _record_stock_levels([(product.id, product.stock, product.low_stock_threshold)])
         return jsonify(product.to_dict()), 200
     except IntegrityError:
         db.session.rollback()
@@ -281,10 +352,43 @@ def get_inventory():
         'low_stock_count': len(low_stock_products)
     }), 200
 
+@pos_api.route('/admin/inventory/forecast', methods=['GET'])
+@_require_auth(Role.ADMIN)
+@reads_from_replica
+def get_inventory_forecast():
+    """Demand forecasts, reorder suggestions and projected stock-outs, soonest first (admin only).
+
+    Served from the table the demand forecast job refreshes every hour.
+    """
+    logger.info("Processing get inventory forecast request")
+    rows = db.session.query(DemandForecast, Product.name, Product.stock, Product.low_stock_threshold).join(
+        Product, Product.id == DemandForecast.product_id
+    ).filter(Product.is_active.is_(True)).all()
+
+    forecasts = []
+    for forecast_row, name, current_stock, low_stock_threshold in rows:
+        data = forecast_row.to_dict()
+        data['name'] = name
+        data['current_stock'] = current_stock
+        data['low_stock_threshold'] = low_stock_threshold
+        forecasts.append(data)
+    forecasts.sort(key=lambda data: (data['stockout_at'] is None, data['stockout_at'] or '', data['name']))
+
+    return jsonify({
+        'forecasts': forecasts,
+        'reorder_count': sum(1 for data in forecasts if data['suggested_reorder'] > 0),
+        'computed_at': max((data['computed_at'] for data in forecasts), default=None),
+        'forecasting_enabled': forecast.np is not None  # Needs NumPy
+    }), 200
+
 @pos_api.route('/admin/inventory/<int:product_id>/stock', methods=['PUT'])
 @_require_auth(Role.ADMIN)
 def update_stock(product_id):
-    """Update product stock (admin only)."""
+    """Update product stock (admin only).
+
+    ``{"stock": n}`` sets the level; ``{"adjust": n}`` adds (or, if negative,
+    removes) units atomically, so deliveries never overwrite concurrent sales.
+    """
     logger.info(f"Processing update stock request for product ID: {product_id}")
     product = db.session.get(Product, product_id)
     if not product:
@@ -292,20 +396,32 @@ def update_stock(product_id):
         return jsonify({'error': 'Product not found'}), 404
 
     data = request.get_json()
-    if not data or 'stock' not in data:
+    if not data or ('stock' not in data and 'adjust' not in data):
         logger.error("Missing stock in update stock request")
-        return jsonify({'error': 'Stock required'}), 400
+        return jsonify({'error': 'Stock or adjust required'}), 400
 
-    if not isinstance(data['stock'], int) or data['stock'] < 0:
+    if 'adjust' in data:
+        if not isinstance(data['adjust'], int):
+            logger.error(f"Invalid stock adjustment: {data['adjust']}")
+            return jsonify({'error': 'Adjust must be an integer'}), 400
+    elif not isinstance(data['stock'], int) or data['stock'] < 0:
         logger.error(f"Invalid stock value: {data['stock']}")
         return jsonify({'error': 'Stock must be a non-negative integer'}), 400
 
     try:
-        product.stock = data['stock']
+        if 'adjust' in data:
+            stock.adjust(product.id, data['adjust'])
+        else:
+            product.stock = data['stock']
         product.updated_at = datetime.now(timezone.utc)
         db.session.commit()
         logger.info(f"Stock updated for product {product.name}: {product.stock}")
+        _record_stock_levels([(product.id, product.stock, product.low_stock_threshold)])
         return jsonify(product.to_dict()), 200
+    except stock.InsufficientStock:
+        db.session.rollback()
+        logger.error(f"Stock adjustment below zero for product {product.name}: {data['adjust']}")
+        return jsonify({'error': 'Stock cannot go below zero'}), 400
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error updating stock: {str(e)}")
@@ -331,6 +447,7 @@ def delete_product(product_id):
             db.session.delete(product)
             db.session.commit()
             logger.info(f"Product hard-deleted: {product.name}")
+            _record_stock_levels([(product_id, None, None)])
             return jsonify({'message': 'Product deleted permanently'}), 200
         
         # If referenced, perform soft delete but free up unique name
@@ -341,6 +458,7 @@ def delete_product(product_id):
         product.updated_at = datetime.now(timezone.utc)
         db.session.commit()
         logger.info(f"Product soft-deleted and renamed from {original_name} to {product.name}")
+        _record_stock_levels([(product.id, None, None)])
         return jsonify({'message': 'Product archived (historical references preserved)'}), 200
     except Exception as e:
         db.session.rollback()
@@ -466,6 +584,7 @@ def create_order():
 
         db.session.commit()
         logger.info(f"Order created: ID={order.id}, Total={order.total}")
+        _publish_order_event('order.created', order)
         return jsonify(order.to_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -502,16 +621,23 @@ def complete_order(order_id):
         return jsonify({'error': 'Invalid payment method'}), 400
 
     try:
-        # Re-validate stock and decrement now
         for item in order.items:
             product = db.session.get(Product, item.product_id)
             if not product or not product.is_active:
                 return jsonify({'error': f'Product no longer available: {item.product_id}'}), 400
-            if product.stock < item.quantity:
-                return jsonify({'error': f'Insufficient stock for {product.name}'}), 400
-        for item in order.items:
-            product = db.session.get(Product, item.product_id)
-            product.stock -= item.quantity
+        # The status check above is only a fast path: of concurrent submits of this
+        # order, only the one whose UPDATE moves it out of 'pending' goes on
+        if not _claim_order(order.id, 'pending', 'completed'):
+            logger.error(f"Order completed or cancelled concurrently: ID={order_id}")
+            return jsonify({'error': 'Order already completed or cancelled'}), 409
+        # Decrement atomically; a concurrent checkout may have taken the last units
+        try:
+            stock_levels = stock.take((item.product_id, item.quantity) for item in order.items)
+        except stock.InsufficientStock as e:
+            db.session.rollback()
+            product = db.session.get(Product, e.product_id)
+            logger.error(f"Insufficient stock for product: {product.name}")
+            return jsonify({'error': f'Insufficient stock for {product.name}'}), 400
 
         # Create payment
         payment = Payment(
@@ -525,11 +651,28 @@ def complete_order(order_id):
 
         # Update order status
         order.status = 'completed'
-        order.completed_at = datetime.now(timezone.utc)
+        # Naive UTC, as read back from the database, so the snapshot matches the live payload
+        order.completed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        order.business_day = rollups.business_day_for(order.completed_at)
         order.payment = payment
+        order.snapshot = order.to_compact_dict()
+        rollups.apply_order(order, payment_method)
+        affinity.apply_order(order)
+        session_totals.record_payment(order.session_id, payment_method, payment.amount)
 
         db.session.commit()
         logger.info(f"Order completed: ID={order.id}, Payment={order.total}")
+        analytics_cache.invalidate_day(order.business_day)
+        _publish_order_event('order.completed', order)
+        _record_stock_levels(stock_levels)
+        try:
+            dashboard_metrics.record_order_completed(order.id, order.total, order.business_day)
+        except Exception as e:
+            logger.error(f"Error updating dashboard metrics: {str(e)}")
+        try:
+            columnar_store.record_completed(order, payment_method)
+        except Exception as e:
+            logger.error(f"Error updating columnar analytics: {str(e)}")
         return jsonify({
             'order': order.to_dict(),
             'payment': payment.to_dict()
@@ -542,49 +685,61 @@ def complete_order(order_id):
 @pos_api.route('/pos/orders', methods=['GET'])
 @_require_auth()
 def get_orders():
-    """Get orders with optional filters."""
+    """Get orders with optional status and date filters (plain dates are business days)."""
     logger.info("Processing get orders request")
     status = request.args.get('status')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
 
-    query = db.session.query(Order)
-    
-    if request.user.role != Role.ADMIN:
-        query = query.filter_by(user_id=request.user.id)
-    
-    if status:
-        query = query.filter_by(status=status)
-    
     try:
-        if start_date:
-            query = query.filter(Order.created_at >= datetime.fromisoformat(start_date))
-        if end_date:
-            query = query.filter(Order.created_at <= datetime.fromisoformat(end_date))
+        start = datetime.fromisoformat(start_date) if start_date else None
+        end = datetime.fromisoformat(end_date) if end_date else None
     except ValueError:
         logger.error("Invalid date format in get orders request")
         return jsonify({'error': 'Invalid date format (use ISO format)'}), 400
+    # Plain dates select whole business days, end day included: completed
+    # orders by their business day, the others (pending, cancelled, refunded)
+    # by when they were created
+    start_day = start.date() if start and len(start_date) == 10 else None
+    end_day = end.date() if end and len(end_date) == 10 else None
+
+    def conditions(orders):
+        """Filters on the columns of ``orders`` (the hot or the archive table)."""
+        found = []
+        if request.user.role != Role.ADMIN:
+            found.append(orders.c.user_id == request.user.id)
+        if status:
+            found.append(orders.c.status == status)
+        if start_day or end_day:
+            # Each side of the OR has its own index: (status, business_day) and created_at
+            by_day, by_creation = [orders.c.status == 'completed'], [orders.c.status != 'completed']
+            if start_day:
+                by_day.append(orders.c.business_day >= start_day)
+                by_creation.append(orders.c.created_at >= rollups.business_day_start(start_day))
+            if end_day:
+                by_day.append(orders.c.business_day <= end_day)
+                by_creation.append(orders.c.created_at < rollups.business_day_start(end_day + timedelta(days=1)))
+            found.append(or_(and_(*by_day), and_(*by_creation)))
+        if start and not start_day:
+            found.append(orders.c.created_at >= start)
+        if end and not end_day:
+            found.append(orders.c.created_at <= end)
+        return found
+
+    # Finished orders come straight from their snapshots; only the others
+    # (pending, or completed before snapshots existed) are rebuilt from their rows
+    query = db.session.query(Order).filter(*conditions(Order.__table__))
+    snapshots = query.filter(Order.snapshot.isnot(None)).with_entities(
+        Order.created_at, Order.snapshot
+    ).all()
+    live_orders = query.filter(Order.snapshot.is_(None)).options(*_order_detail_options()).all()
+    orders = snapshots + [(order.created_at, order.to_compact_dict()) for order in live_orders]
+    # Ranges reaching back past the newest archived order include the archive
+    if archive.needs_archive(rollups.business_day_start(start_day) if start_day else start):
+        orders += archive.order_history(conditions(orders_archive))
+    orders.sort(key=lambda entry: entry[0], reverse=True)
 
-    orders = query.options(
-        selectinload(Order.items).selectinload(OrderItem.product),
-        selectinload(Order.items).selectinload(OrderItem.size),
-        selectinload(Order.items).selectinload(OrderItem.modifiers).selectinload(OrderItemModifier.modifier),
-        selectinload(Order.payment)
-    ).order_by(Order.created_at.desc()).all()
-
-    return jsonify([{
-        **order.to_dict(),
-        'items': [{
-            **item.to_dict(),
-            'product_name': item.product.name,
-            'size_name': item.size.name if item.size else None,
-            'modifiers': [{
-                'name': mod.modifier.name,
-                'price_modifier': mod.price_modifier
-            } for mod in item.modifiers]
-        } for item in order.items],
-        'payment': order.payment.to_dict() if order.payment else None
-    } for order in orders]), 200
+    return jsonify([payload for _, payload in orders]), 200
 
 # ---------- CATEGORIES ENDPOINTS ----------
 
@@ -776,6 +931,22 @@ def delete_user(user_id):
         logger.error(f"Error deleting user: {str(e)}")
         return jsonify({'error': 'Failed to delete user'}), 400
 
+def _order_detail_options():
+    """Loader options for ``Order.to_compact_dict``.
+
+    Items come in one query with their product and size joined, modifiers in a
+    second one with their names joined, so the number of queries stays constant
+    whatever the number of orders or items.
+    """
+    return (
+        selectinload(Order.items).options(
+            joinedload(OrderItem.product),
+            joinedload(OrderItem.size),
+            selectinload(OrderItem.modifiers).joinedload(OrderItemModifier.modifier)
+        ),
+        selectinload(Order.payment)
+    )
+
 @pos_api.route('/pos/orders/pending', methods=['GET'])
 @_require_auth(Role.CASHIER)
 def get_pending_orders():
@@ -784,25 +955,35 @@ def get_pending_orders():
     orders = db.session.query(Order).filter_by(
         user_id=request.user.id,
         status='pending'
-    ).order_by(Order.created_at.desc()).all()
+    ).options(*_order_detail_options()).order_by(Order.created_at.desc()).all()
     
-    return jsonify([order.to_dict() for order in orders]), 200
+    return jsonify([order.to_compact_dict() for order in orders]), 200
 
 @pos_api.route('/pos/orders/<int:order_id>', methods=['GET'])
 @_require_auth(Role.CASHIER)
 def get_order(order_id):
     """Get a specific order by ID (cashier only)."""
     logger.info(f"Processing get order request for ID: {order_id}")
-    order = db.session.get(Order, order_id)
-    if not order:
+    # Completed and cancelled orders are served from their snapshot, without joins
+    row = db.session.query(Order.user_id, Order.snapshot).filter(Order.id == order_id).first()
+    archived = row is None
+    if archived:
+        row = db.session.execute(select(orders_archive).where(orders_archive.c.id == order_id)).first()
+    if not row:
         logger.error(f"Order not found: ID={order_id}")
         return jsonify({'error': 'Order not found'}), 404
 
-    if order.user_id != request.user.id:
+    if row.user_id != request.user.id:
         logger.error(f"Unauthorized attempt to access order: ID={order_id}")
         return jsonify({'error': 'Not authorized to access this order'}), 403
 
-    return jsonify(order.to_dict()), 200
+    if archived:
+        return jsonify(archive.order_payloads([row])[order_id]), 200
+    if row.snapshot is not None:
+        return jsonify(row.snapshot), 200
+
+    order = db.session.get(Order, order_id, options=_order_detail_options())
+    return jsonify(order.to_compact_dict()), 200
 
 @pos_api.route('/pos/orders/<int:order_id>/cancel', methods=['POST'])
 @_require_auth(Role.CASHIER)
@@ -823,59 +1004,114 @@ def cancel_order(order_id):
         return jsonify({'error': 'Order is not pending'}), 400
 
     try:
+        # Must not overwrite a checkout that completes the order meanwhile
+        if not _claim_order(order.id, 'pending', 'cancelled'):
+            logger.error(f"Order completed or cancelled concurrently: ID={order_id}")
+            return jsonify({'error': 'Order is not pending'}), 409
         order.status = 'cancelled'
         order.updated_at = datetime.now(timezone.utc)
+        order.snapshot = order.to_compact_dict()
         db.session.commit()
         logger.info(f"Order cancelled: ID={order.id}")
+        _publish_order_event('order.cancelled', order)
         return jsonify({'message': 'Order cancelled successfully'}), 200
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error cancelling order: {str(e)}")
         return jsonify({'error': 'Failed to cancel order'}), 400
 
+@pos_api.route('/pos/orders/<int:order_id>/refund', methods=['POST'])
+@_require_auth(Role.ADMIN)
+def refund_order(order_id):
+    """Refund a completed order and return its items to stock (admin only)."""
+    logger.info(f"Processing refund order request for ID: {order_id}")
+    order = db.session.get(Order, order_id)
+    if not order:
+        logger.error(f"Order not found: ID={order_id}")
+        return jsonify({'error': 'Order not found'}), 404
+
+    if order.status != 'completed' or not order.payment:
+        logger.error(f"Order not completed: ID={order_id}")
+        return jsonify({'error': 'Only completed orders can be refunded'}), 400
+
+    try:
+        # Only one of concurrent refunds of this order moves it out of 'completed'
+        if not _claim_order(order.id, 'completed', 'cancelled'):
+            logger.error(f"Order refunded concurrently: ID={order_id}")
+            return jsonify({'error': 'Only completed orders can be refunded'}), 409
+        stock_levels = stock.give_back((item.product_id, item.quantity) for item in order.items)
+
+        # Take the sale back out of the day it was counted in
+        rollups.apply_order(order, order.payment.payment_method, sign=-1)
+        affinity.apply_order(order, sign=-1)
+        session_totals.record_refund(order.session_id, order.payment.payment_method, order.payment.amount)
+        order.payment.status = 'refunded'
+        order.status = 'cancelled'
+        order.updated_at = datetime.now(timezone.utc)
+        order.snapshot = order.to_compact_dict()
+
+        db.session.commit()
+        logger.info(f"Order refunded: ID={order.id}, Amount={order.total}")
+        analytics_cache.invalidate_day(order.business_day)
+        _publish_order_event('order.refunded', order)
+        _record_stock_levels(stock_levels)
+        try:
+            dashboard_metrics.record_order_refunded(order.id, order.total, order.business_day)
+        except Exception as e:
+            logger.error(f"Error updating dashboard metrics: {str(e)}")
+        try:
+            columnar_store.record_refunded(order.id)
+        except Exception as e:
+            logger.error(f"Error updating columnar analytics: {str(e)}")
+        return jsonify({'message': 'Order refunded successfully', 'order': order.to_dict()}), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error refunding order: {str(e)}")
+        return jsonify({'error': 'Failed to refund order'}), 400
+
+# ---------- KITCHEN DISPLAY STREAM ----------
+
+@pos_api.route('/kitchen/stream', methods=['GET'])
+@_require_auth(allow_query_token=True)
+def kitchen_stream():
+    """Stream order created, completed and cancelled events (Server-Sent Events).
+
+    Clients reconnecting with Last-Event-ID (sent automatically by EventSource)
+    receive the events they missed from the broker history.
+    """
+    logger.info("Opening kitchen event stream")
+    return _event_stream_response(order_events)
+
+# ---------- LIVE DASHBOARD STREAM ----------
+
+@pos_api.route('/admin/dashboard/stream', methods=['GET'])
+@_require_auth(Role.ADMIN, allow_query_token=True)
+def dashboard_stream():
+    """Stream today's sales, order count and low-stock count (admin only).
+
+    The current figures are sent on connect, then a 'metrics' event whenever
+    an order is completed or a stock change moves the low-stock count.
+    """
+    logger.info("Opening dashboard metrics stream")
+    return _event_stream_response(dashboard_events, initial=lambda: ('metrics', dashboard_metrics.snapshot()))
+
 # ---------- ANALYTICS ENDPOINTS ----------
 
 @pos_api.route('/analytics/sales', methods=['GET'])
 @_require_auth(Role.ADMIN)
+@reads_from_replica
 def get_sales_analytics():
     """Get sales analytics (admin only)."""
     logger.info("Processing get sales analytics request")
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
-    # Base query for completed orders without filtering out daily reset
-    # We want ALL completed orders for the selected period
-    query = db.session.query(Order).filter(
-        Order.status == 'completed'
-    )
-    
     try:
-        if start_date:
-            query = query.filter(Order.completed_at >= datetime.fromisoformat(start_date))
-        if end_date:
-            query = query.filter(Order.completed_at <= datetime.fromisoformat(end_date))
+        total_sales, total_orders, product_sales = analytics.sales_summary(start_date, end_date)
     except ValueError:
         logger.error("Invalid date format in get sales analytics request")
         return jsonify({'error': 'Invalid date format (use ISO format)'}), 400
 
-    # Use eager loading to avoid N+1 queries
-    orders = query.options(
-        selectinload(Order.items).selectinload(OrderItem.product)
-    ).all()
-    
-    total_sales = sum(order.total for order in orders)
-    total_orders = len(orders)
-    
-    # Product sales analysis
-    product_sales = {}
-    for order in orders:
-        for item in order.items:
-            product_name = item.product.name
-            if product_name not in product_sales:
-                product_sales[product_name] = {'quantity': 0, 'revenue': 0}
-            product_sales[product_name]['quantity'] += item.quantity
-            product_sales[product_name]['revenue'] += item.total_price
-
     return jsonify({
         'total_sales': total_sales,
         'total_orders': total_orders,
@@ -886,128 +1122,134 @@ def get_sales_analytics():
         }
     }), 200
 
+@pos_api.route('/analytics/sales/series', methods=['GET'])
+@_require_auth(Role.ADMIN)
+@reads_from_replica
+def get_sales_series():
+    """Sales per hour, day, week or month, optionally split by category, payment method or cashier (admin only)."""
+    logger.info("Processing get sales series request")
+    bucket = request.args.get('bucket', 'day')
+    split = request.args.get('split') or None
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+
+    if bucket not in analytics.SERIES_BUCKETS:
+        logger.error(f"Invalid bucket in get sales series request: {bucket}")
+        return jsonify({'error': f"bucket must be one of: {', '.join(analytics.SERIES_BUCKETS)}"}), 400
+    if split is not None and split not in analytics.SERIES_SPLITS:
+        logger.error(f"Invalid split in get sales series request: {split}")
+        return jsonify({'error': f"split must be one of: {', '.join(analytics.SERIES_SPLITS)}"}), 400
+
+    try:
+        series = analytics.sales_series(bucket, start_date, end_date, split)
+    except ValueError as e:
+        logger.error(f"Invalid get sales series request: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'bucket': bucket,
+        'split': split,
+        'period': {
+            'start_date': start_date,
+            'end_date': end_date
+        },
+        'series': series
+    }), 200
+
+@pos_api.route('/analytics/sales/slice', methods=['GET'])
+@_require_auth(Role.ADMIN)
+@reads_from_replica
+def get_sales_slice():
+    """Sales grouped by any of product, size, cashier, payment method, day and hour (admin only).
+
+    ``by`` is a comma-separated list of dimensions; product_id, size_id,
+    user_id and payment_method narrow the items counted.
+    """
+    logger.info("Processing get sales slice request")
+    by = tuple(dimension.strip() for dimension in request.args.get('by', 'product').split(',') if dimension.strip())
+    if not by or len(set(by)) != len(by) or any(dimension not in analytics.SLICE_DIMENSIONS for dimension in by):
+        logger.error(f"Invalid dimensions in get sales slice request: {request.args.get('by')}")
+        return jsonify({'error': f"by must list distinct dimensions of: {', '.join(analytics.SLICE_DIMENSIONS)}"}), 400
+
+    filters = {}
+    try:
+        for name in ('product_id', 'size_id', 'user_id'):
+            if request.args.get(name):
+                filters[name] = int(request.args[name])
+        if request.args.get('payment_method'):
+            filters['payment_method'] = PaymentMethod[request.args['payment_method'].upper()]
+    except (ValueError, KeyError):
+        logger.error("Invalid filter in get sales slice request")
+        return jsonify({'error': 'Invalid filter value'}), 400
+
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    try:
+        rows, source = analytics.sales_slice(by, start_date, end_date, filters)
+    except ValueError:
+        logger.error("Invalid date format in get sales slice request")
+        return jsonify({'error': 'Invalid date format (use ISO format)'}), 400
+
+    return jsonify({
+        'by': list(by),
+        'rows': rows,
+        'source': source,
+        'period': {
+            'start_date': start_date,
+            'end_date': end_date
+        }
+    }), 200
+
+@pos_api.route('/analytics/affinity', methods=['GET'])
+@_require_auth()
+def get_product_affinity():
+    """Products frequently bought together with a product, for combos and upsell prompts."""
+    logger.info("Processing get product affinity request")
+    try:
+        product_id = int(request.args['product_id'])
+        limit = int(request.args.get('limit', 5))
+        min_orders = int(request.args.get('min_orders', 3))
+    except (KeyError, ValueError):
+        logger.error("Invalid parameters in get product affinity request")
+        return jsonify({'error': 'product_id (integer) required; limit and min_orders must be integers'}), 400
+    if limit < 1 or min_orders < 1:
+        logger.error(f"Invalid limit or min_orders in get product affinity request: {limit}, {min_orders}")
+        return jsonify({'error': 'limit and min_orders must be at least 1'}), 400
+    limit = min(limit, affinity.MAX_PARTNERS)
+
+    product = db.session.get(Product, product_id)
+    if not product:
+        logger.error(f"Product not found: ID={product_id}")
+        return jsonify({'error': 'Product not found'}), 404
+
+    product_orders, all_orders, partners = affinity.top_partners(product_id, limit, min_orders)
+    return jsonify({
+        'product_id': product_id,
+        'name': product.name,
+        'orders': product_orders,
+        'total_orders': all_orders,
+        'partners': partners
+    }), 200
+
 @pos_api.route('/analytics/sales/pdf', methods=['GET'])
 @_require_auth(Role.ADMIN)
+@reads_from_replica
 def generate_sales_report_pdf():
     """Generate sales report as PDF (admin only)."""
     logger.info("Processing generate sales report PDF request")
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
-    query = db.session.query(Order).filter_by(status='completed')
-    
     try:
-        if start_date:
-            query = query.filter(Order.completed_at >= datetime.fromisoformat(start_date))
-        if end_date:
-            query = query.filter(Order.completed_at <= datetime.fromisoformat(end_date))
+        total_sales, total_orders, product_sales = analytics.sales_summary(start_date, end_date)
     except ValueError:
         logger.error("Invalid date format in generate sales report PDF request")
         return jsonify({'error': 'Invalid date format (use ISO format)'}), 400
 
-    # Use eager loading to avoid N+1 queries
-    orders = query.options(
-        selectinload(Order.items).selectinload(OrderItem.product)
-    ).all()
-    
-    total_sales = sum(order.total for order in orders)
-    total_orders = len(orders)
-    
-    # Product sales analysis
-    product_sales = {}
-    for order in orders:
-        for item in order.items:
-            product_name = item.product.name
-            if product_name not in product_sales:
-                product_sales[product_name] = {'quantity': 0, 'revenue': 0}
-            product_sales[product_name]['quantity'] += item.quantity
-            product_sales[product_name]['revenue'] += item.total_price
-
-    # Create PDF
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    # Title
-    title = Paragraph("Sales Report", styles['Title'])
-    story.append(title)
-    story.append(Paragraph("<br/>", styles['Normal']))
-    
-    # Period
-    period_text = f"Period: {start_date or 'All time'} to {end_date or 'Present'}"
-    story.append(Paragraph(period_text, styles['Normal']))
-    story.append(Paragraph("<br/>", styles['Normal']))
-    
-    # Summary table
-    summary_data = [
-        ['Metric', 'Value'],
-        ['Total Sales', f'DZD {total_sales:.2f}'],
-        ['Total Orders', str(total_orders)]
-    ]
-    
-    summary_table = Table(summary_data)
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 14),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    story.append(summary_table)
-    story.append(Paragraph("<br/>", styles['Normal']))
-    
-    # Product sales table
-    if product_sales:
-        story.append(Paragraph("Product Sales", styles['Heading2']))
-        story.append(Paragraph("<br/>", styles['Normal']))
-
-        product_data = [['Product', 'Quantity Sold', 'Price Per Unit (DZD)', 'Revenue (DZD)']]
-        total_revenue = 0
-        
-        for product, data in sorted(product_sales.items(), key=lambda x: x[1]['revenue'], reverse=True):
-            price_per_unit = data['revenue'] / data['quantity'] if data['quantity'] > 0 else 0
-            product_data.append([
-                product, 
-                str(data['quantity']), 
-                f"{price_per_unit:.2f}",
-                f"{data['revenue']:.2f}"
-            ])
-            total_revenue += data['revenue']
-
-        # Add total row
-        product_data.append(['TOTAL', '', '', f"{total_revenue:.2f}"])
-
-        product_table = Table(product_data)
-        product_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            # Style the total row
-            ('BACKGROUND', (0, -1), (-1, -1), colors.lightblue),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, -1), (-1, -1), 12)
-        ]))
-
-        story.append(product_table)
-    
-    # Build PDF
-    doc.build(story)
-    buffer.seek(0)
-    
-    # Return PDF
+    pdf = analytics.sales_report_pdf(start_date, end_date, total_sales, total_orders, product_sales)
     filename = f'sales_report_{start_date or "all"}_{end_date or "present"}.pdf'
     return Response(
-        buffer.getvalue(),
+        pdf,
         mimetype='application/pdf',
         headers={
             'Content-Disposition': f'attachment; filename="{filename}"'
@@ -1016,125 +1258,23 @@ def generate_sales_report_pdf():
 
 @pos_api.route('/reports/sales/pdf', methods=['GET'])
 @_require_auth(Role.ADMIN)
+@reads_from_replica
 def generate_sales_report_pdf_alias():
     """Alias for PDF report to avoid client-side blockers on 'analytics' path."""
     logger.info("Processing generate sales report PDF (alias) request")
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
-    query = db.session.query(Order).filter_by(status='completed')
-    
     try:
-        if start_date:
-            query = query.filter(Order.completed_at >= datetime.fromisoformat(start_date))
-        if end_date:
-            query = query.filter(Order.completed_at <= datetime.fromisoformat(end_date))
+        total_sales, total_orders, product_sales = analytics.sales_summary(start_date, end_date)
     except ValueError:
         logger.error("Invalid date format in generate sales report PDF (alias) request")
         return jsonify({'error': 'Invalid date format (use ISO format)'}), 400
-    
-    # Use eager loading to avoid N+1 queries
-    orders = query.options(
-        selectinload(Order.items).selectinload(OrderItem.product)
-    ).all()
-    
-    total_sales = sum(order.total for order in orders)
-    total_orders = len(orders)
-    
-    # Product sales analysis
-    product_sales = {}
-    for order in orders:
-        for item in order.items:
-            product_name = item.product.name
-            if product_name not in product_sales:
-                product_sales[product_name] = {'quantity': 0, 'revenue': 0}
-            product_sales[product_name]['quantity'] += item.quantity
-            product_sales[product_name]['revenue'] += item.total_price
-    
-    # Create PDF
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    # Title
-    title = Paragraph("Sales Report", styles['Title'])
-    story.append(title)
-    story.append(Paragraph("<br/>", styles['Normal']))
-    
-    # Period
-    period_text = f"Period: {start_date or 'All time'} to {end_date or 'Present'}"
-    story.append(Paragraph(period_text, styles['Normal']))
-    story.append(Paragraph("<br/>", styles['Normal']))
-    
-    # Summary table
-    summary_data = [
-        ['Metric', 'Value'],
-        ['Total Sales', f'DZD {total_sales:.2f}'],
-        ['Total Orders', str(total_orders)]
-    ]
-    
-    summary_table = Table(summary_data)
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 14),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    story.append(summary_table)
-    story.append(Paragraph("<br/>", styles['Normal']))
-    
-    # Product sales table
-    if product_sales:
-        story.append(Paragraph("Product Sales", styles['Heading2']))
-        story.append(Paragraph("<br/>", styles['Normal']))
-        
-        product_data = [['Product', 'Quantity Sold', 'Price Per Unit (DZD)', 'Revenue (DZD)']]
-        total_revenue = 0
-        
-        for product, data in sorted(product_sales.items(), key=lambda x: x[1]['revenue'], reverse=True):
-            price_per_unit = data['revenue'] / data['quantity'] if data['quantity'] > 0 else 0
-            product_data.append([
-                product,
-                str(data['quantity']),
-                f"{price_per_unit:.2f}",
-                f"{data['revenue']:.2f}"
-            ])
-            total_revenue += data['revenue']
-        
-        # Add total row
-        product_data.append(['TOTAL', '', '', f"{total_revenue:.2f}"])
-        
-        product_table = Table(product_data)
-        product_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.lightblue),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, -1), (-1, -1), 12)
-        ]))
-        
-        story.append(product_table)
-    
-    # Build PDF
-    doc.build(story)
-    buffer.seek(0)
-    
-    # Return PDF
+
+    pdf = analytics.sales_report_pdf(start_date, end_date, total_sales, total_orders, product_sales)
     filename = f'sales_report_{start_date or "all"}_{end_date or "present"}.pdf'
     return Response(
-        buffer.getvalue(),
+        pdf,
         mimetype='application/pdf',
         headers={
             'Content-Disposition': f'attachment; filename="{filename}"'
@@ -1142,6 +1282,7 @@ def generate_sales_report_pdf_alias():
     )
 
 @pos_api.route('/reports/sales/pdf/download', methods=['GET'])
+@reads_from_replica
 def generate_sales_report_pdf_download():
     """PDF download endpoint that accepts JWT via query param 'token' for convenience.
     This avoids fetch() and lets browsers download directly even if extensions block XHR.
@@ -1177,95 +1318,15 @@ def generate_sales_report_pdf_download():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
 
-        query = db.session.query(Order).filter_by(status='completed')
         try:
-            if start_date:
-                query = query.filter(Order.completed_at >= datetime.fromisoformat(start_date))
-            if end_date:
-                query = query.filter(Order.completed_at <= datetime.fromisoformat(end_date))
+            total_sales, total_orders, product_sales = analytics.sales_summary(start_date, end_date)
         except ValueError:
             return jsonify({'error': 'Invalid date format (use ISO format)'}), 400
 
-        # Use eager loading to avoid N+1 queries
-        orders = query.options(
-            selectinload(Order.items).selectinload(OrderItem.product)
-        ).all()
-
-        total_sales = sum(order.total for order in orders)
-        total_orders = len(orders)
-
-        product_sales = {}
-        for order in orders:
-            for item in order.items:
-                product_name = item.product.name
-                if product_name not in product_sales:
-                    product_sales[product_name] = {'quantity': 0, 'revenue': 0}
-                product_sales[product_name]['quantity'] += item.quantity
-                product_sales[product_name]['revenue'] += item.total_price
-
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        styles = getSampleStyleSheet()
-        story = []
-
-        title = Paragraph("Sales Report", styles['Title'])
-        story.append(title)
-        story.append(Paragraph("<br/>", styles['Normal']))
-
-        period_text = f"Period: {start_date or 'All time'} to {end_date or 'Present'}"
-        story.append(Paragraph(period_text, styles['Normal']))
-        story.append(Paragraph("<br/>", styles['Normal']))
-
-        summary_data = [
-            ['Metric', 'Value'],
-            ['Total Sales', f'DZD {total_sales:.2f}'],
-            ['Total Orders', str(total_orders)]
-        ]
-        summary_table = Table(summary_data)
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 14),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(summary_table)
-        story.append(Paragraph("<br/>", styles['Normal']))
-
-        if product_sales:
-            story.append(Paragraph("Product Sales", styles['Heading2']))
-            story.append(Paragraph("<br/>", styles['Normal']))
-            product_data = [['Product', 'Quantity Sold', 'Price Per Unit (DZD)', 'Revenue (DZD)']]
-            total_revenue = 0
-            for product, data in sorted(product_sales.items(), key=lambda x: x[1]['revenue'], reverse=True):
-                price_per_unit = data['revenue'] / data['quantity'] if data['quantity'] > 0 else 0
-                product_data.append([product, str(data['quantity']), f"{price_per_unit:.2f}", f"{data['revenue']:.2f}"])
-                total_revenue += data['revenue']
-            product_data.append(['TOTAL', '', '', f"{total_revenue:.2f}"])
-            product_table = Table(product_data)
-            product_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.lightblue),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, -1), (-1, -1), 12)
-            ]))
-            story.append(product_table)
-
-        doc.build(story)
-        buffer.seek(0)
+        pdf = analytics.sales_report_pdf(start_date, end_date, total_sales, total_orders, product_sales)
         filename = f"sales_report_{start_date or 'all'}_{end_date or 'present'}.pdf"
         return Response(
-            buffer.getvalue(),
+            pdf,
             mimetype='application/pdf',
             headers={'Content-Disposition': f'attachment; filename="{filename}"'}
         )
@@ -1496,6 +1557,7 @@ def save_settings():
                 db.session.add(setting)
         
         db.session.commit()
+        dashboard.invalidate()
         
         return jsonify({
             'success': True,
@@ -1642,77 +1704,76 @@ def delete_product_modifier(modifier_id):
         db.session.rollback()
         return jsonify({'error': 'Failed to delete product modifier'}), 500
 
-# ---------- DAILY ANALYTICS RESET ----------
-def reset_daily_analytics():
-    """Reset daily analytics data (called every midnight)."""
-    logger.info("Starting daily analytics reset")
+# ---------- DATABASE MONITORING ----------
+
+@pos_api.route('/admin/db/pool', methods=['GET'])
+@_require_auth(Role.ADMIN)
+def get_pool_status():
+    """Get connection pool usage for this worker (admin only)."""
     try:
-        # Get today's date
-        today = datetime.now().date()
-        
-        # Mark all completed orders from today as 'archived' for analytics purposes
-        # This way they won't show in daily analytics but are still available for PDF reports
-        orders_today = Order.query.filter(
-            Order.status == 'completed',
-            db.func.date(Order.created_at) == today
-        ).all()
-        
-        for order in orders_today:
-            # Add a flag to indicate this order was processed in daily reset
-            # We'll use the special_instructions field to mark it
-            if not order.special_instructions:
-                order.special_instructions = f"DAILY_RESET_{today}"
-            elif "DAILY_RESET_" not in order.special_instructions:
-                order.special_instructions += f"|DAILY_RESET_{today}"
-        
-        db.session.commit()
-        logger.info(f"Daily analytics reset completed. Processed {len(orders_today)} orders.")
-        
+        return jsonify(pool_status(db.engine)), 200
     except Exception as e:
-        logger.error(f"Error during daily analytics reset: {str(e)}")
-        db.session.rollback()
+        logger.error(f"Error getting pool status: {str(e)}")
+        return jsonify({'error': 'Failed to get pool status'}), 500
 
-def run_scheduler():
-    """Run the scheduler in a separate thread."""
-    schedule.every().day.at("00:00").do(reset_daily_analytics)
-    logger.info("Daily reset scheduler configured for 00:00 every day")
-    
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Check every minute
+# ---------- DAILY ANALYTICS RESET ----------
+def close_previous_business_day():
+    """Close the business day that just ended, unless it was closed after it ended.
 
-def start_daily_reset_scheduler():
-    """Start the daily reset scheduler in a background thread."""
-    scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-    scheduler_thread.start()
-    logger.info("Daily analytics reset scheduler started")
+    Runs hourly so the close follows the shop's rollover hour whatever the
+    server's timezone.
+    """
+    day = rollups.business_day_for(datetime.now(timezone.utc)) - timedelta(days=1)
+    last_close = db.session.query(BusinessDayClose).filter_by(business_day=day).first()
+    if last_close and last_close.closed_at >= rollups.business_day_start(day + timedelta(days=1)):
+        return
+    logger.info(f"Starting close of business day {day}")
+    rollups.close_business_day(day)
+
+register_job('close_of_day', lambda s: s.every().hour.at(":05"), close_previous_business_day)
 
 @pos_api.route('/analytics/reset', methods=['POST'])
 @_require_auth(Role.ADMIN)
 def manual_reset_analytics():
-    """Manually reset daily analytics (admin only)."""
-    logger.info("Processing manual analytics reset request")
+    """Close a business day now, today by default (admin only)."""
+    logger.info("Processing manual close of day request")
+    data = request.get_json(silent=True) or {}
     try:
-        reset_daily_analytics()
-        return jsonify({'message': 'Daily analytics reset successfully'}), 200
+        day = date.fromisoformat(data['business_day']) if data.get('business_day') else \
+            rollups.business_day_for(datetime.now(timezone.utc))
+    except ValueError:
+        logger.error(f"Invalid business_day: {data.get('business_day')}")
+        return jsonify({'error': 'Invalid business day (use YYYY-MM-DD)'}), 400
+
+    try:
+        record = rollups.close_business_day(day, request.user.id)
+        return jsonify({
+            'message': f'Business day {day} closed successfully',
+            'close': record.to_dict()
+        }), 200
     except Exception as e:
-        logger.error(f"Error in manual analytics reset: {str(e)}")
-        return jsonify({'error': 'Failed to reset analytics'}), 500
+        db.session.rollback()
+        logger.error(f"Error in manual close of day: {str(e)}")
+        return jsonify({'error': 'Failed to close business day'}), 500
 
 @pos_api.route('/analytics/scheduler/status', methods=['GET'])
 @_require_auth(Role.ADMIN)
 def get_scheduler_status():
-    """Get scheduler status and next run time (admin only)."""
+    """Get scheduler status, leader and per-job run figures (admin only)."""
     try:
-        jobs = schedule.get_jobs()
-        next_run = None
-        if jobs:
-            next_run = jobs[0].next_run.isoformat() if jobs[0].next_run else None
+        status = current_app.extensions[SCHEDULER_KEY].status()
+        today = rollups.business_day_for(datetime.now(timezone.utc))
+        next_close = rollups.business_day_start(today + timedelta(days=1)).replace(tzinfo=timezone.utc)
+        last_close = db.session.query(BusinessDayClose).order_by(BusinessDayClose.business_day.desc()).first()
         
         return jsonify({
-            'scheduler_active': len(jobs) > 0,
-            'next_reset': next_run,
-            'message': 'Daily reset scheduled for 00:00 every day'
+            'scheduler_active': status['running'],
+            'next_reset': next_close.isoformat() if status['running'] else None,
+            'last_close': last_close.to_dict() if last_close else None,
+            'leader': status['leader'],
+            'is_leader': status['is_leader'],
+            'jobs': status['jobs'],
+            'message': 'Business days are closed automatically after the rollover hour'
         }), 200
     except Exception as e:
         logger.error(f"Error getting scheduler status: {str(e)}")
@@ -1721,5 +1782,3 @@ def get_scheduler_status():
 def init_pos_app(app):
     """Register the POS API blueprint with the Flask app."""
     app.register_blueprint(pos_api, url_prefix='/api/pos')
-    # Start the daily reset scheduler
-    start_daily_reset_scheduler()
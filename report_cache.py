@@ -0,0 +1,157 @@
+"""In-process cache of computed report results.
+
+Results are keyed by the report and its parameters and remember the business
+days they cover:
+
+- Completing or refunding an order drops every entry covering that order's
+  business day, so this process never serves a figure it knows is out of
+  date. Other server processes (gunicorn workers) and ``flask
+  rebuild-rollups`` cannot tell this one, so every entry also expires.
+- Ranges that include today are live and expire after
+  ANALYTICS_CACHE_LIVE_SECONDS. Until ANALYTICS_CACHE_STALE_SECONDS the old
+  result is served while one background thread recomputes it
+  (stale-while-revalidate).
+- Ranges that end before today are closed. They only change through a refund
+  of a past order or a rollup rebuild, so they are kept for
+  ANALYTICS_CACHE_CLOSED_SECONDS, then recomputed on the next request. That
+  bounds how long another process's refund stays invisible here.
+
+At most ANALYTICS_CACHE_SIZE entries are kept, least recently used first out.
+
+Concurrent requests for a missing entry are coalesced: the first computes,
+the others wait for its result.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from flask import current_app, g
+import rollups
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ('value', 'start_day', 'end_day', 'live', 'computed_at')
+
+    def __init__(self, value, start_day, end_day, live, computed_at):
+        self.value = value
+        self.start_day = start_day
+        self.end_day = end_day
+        self.live = live
+        self.computed_at = computed_at
+
+
+class _Flight:
+    """A computation in progress that other requests can wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._generation = 0  # Bumped by every invalidation
+
+    def get(self, key, start_day, end_day, compute, live_seconds=None):
+        """Cached result of ``compute()`` for ``key`` covering ``start_day``..``end_day``.
+
+        None days are unbounded. ``live_seconds`` overrides
+        ANALYTICS_CACHE_LIVE_SECONDS for this key. Must be called inside an
+        application context; ``compute`` runs in one too (in a background
+        thread when refreshing).
+        """
+        config = current_app.config
+        if not config['ANALYTICS_CACHE_ENABLED']:
+            return compute()
+        key = (config['SQLALCHEMY_DATABASE_URI'], key)  # Apps in one process may use different databases
+        today = rollups.business_day_for(datetime.now(timezone.utc))
+        live = end_day is None or end_day >= today
+        if live_seconds is None:
+            live_seconds = config['ANALYTICS_CACHE_LIVE_SECONDS']
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                age = now - entry.computed_at
+                if age < (live_seconds if entry.live else config['ANALYTICS_CACHE_CLOSED_SECONDS']):
+                    return entry.value
+                if entry.live and age < config['ANALYTICS_CACHE_STALE_SECONDS']:
+                    if key not in self._flights:
+                        self._refresh_in_background(key, start_day, end_day, live, compute)
+                    return entry.value
+            flight = self._flights.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._flights[key] = _Flight()
+
+        if owner:
+            self._compute(key, start_day, end_day, live, compute, flight)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _compute(self, key, start_day, end_day, live, compute, flight):
+        with self._lock:
+            generation = self._generation
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+        with self._lock:
+            del self._flights[key]
+            # An invalidation while computing may have been missed by this result
+            if flight.error is None and generation == self._generation:
+                self._entries[key] = _Entry(flight.value, start_day, end_day, live, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > current_app.config['ANALYTICS_CACHE_SIZE']:
+                    self._entries.popitem(last=False)
+        flight.done.set()
+
+    def _refresh_in_background(self, key, start_day, end_day, live, compute):
+        """Recompute ``key`` in a thread. Must be called with the lock held."""
+        flight = self._flights[key] = _Flight()
+        app = current_app._get_current_object()
+        use_read_engine = g.get('use_read_engine', False)
+
+        def refresh():
+            with app.app_context():
+                g.use_read_engine = use_read_engine
+                self._compute(key, start_day, end_day, live, compute, flight)
+                if flight.error is not None:
+                    logger.error(f"Error refreshing cached report {key}: {str(flight.error)}")
+
+        threading.Thread(target=refresh, name='report-cache-refresh', daemon=True).start()
+
+    def invalidate_day(self, day):
+        """Drop every entry whose range covers business day ``day``."""
+        with self._lock:
+            self._generation += 1
+            for key in [key for key, entry in self._entries.items()
+                        if (entry.start_day or date.min) <= day <= (entry.end_day or date.max)]:
+                del self._entries[key]
+
+    def discard(self, key):
+        """Drop ``key``'s entry, e.g. after a change its day range does not capture."""
+        key = (current_app.config['SQLALCHEMY_DATABASE_URI'], key)
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+analytics_cache = ResultCache()
@@ -0,0 +1,314 @@
+"""Maintenance of the daily_sales_rollup table.
+
+``apply_order`` runs inside the transaction that completes (or refunds) an
+order, so the rollup never disagrees with the orders it summarizes.
+``rebuild`` recomputes a range of days from the raw orders for backfills.
+Reports read ``day_totals``, ``product_sales`` and ``day_series``, which scan
+one row per day, product, size, payment method and cashier instead of every
+order.
+``close_business_day`` finalizes a day at close of business.
+
+A business day is a calendar day in SHOP_TIMEZONE that starts at
+BUSINESS_DAY_ROLLOVER_HOUR. ``business_day_for`` computes it once, when an
+order is completed or a sale is recorded, and day-scoped queries filter on
+the stored, indexed ``business_day`` column.
+"""
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+import click
+from flask import current_app
+from sqlalchemy import func, select, literal, delete, union_all
+from sqlalchemy.dialects import sqlite, postgresql
+from models import (
+    db, Order, OrderItem, Payment, Product, DailySalesRollup, BusinessDayClose,
+    orders_archive, order_items_archive, payments_archive
+)
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMNS = ('business_day', 'product_id', 'size_id', 'payment_method', 'user_id')
+SUM_COLUMNS = ('quantity', 'revenue', 'order_count')
+
+
+def _shop_time():
+    return ZoneInfo(current_app.config['SHOP_TIMEZONE']), current_app.config['BUSINESS_DAY_ROLLOVER_HOUR']
+
+
+def business_day_for(moment):
+    """Business day a timestamp falls in (naive timestamps are UTC)."""
+    zone, rollover_hour = _shop_time()
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment.astimezone(zone) - timedelta(hours=rollover_hour)).date()
+
+
+def business_day_start(day):
+    """Naive UTC timestamp at which business day ``day`` starts."""
+    zone, rollover_hour = _shop_time()
+    start = datetime.combine(day, time(rollover_hour), tzinfo=zone)
+    return start.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def to_shop_time(moment):
+    """Naive shop-local time of a naive UTC timestamp."""
+    zone, _ = _shop_time()
+    return moment.replace(tzinfo=timezone.utc).astimezone(zone).replace(tzinfo=None)
+
+
+def hour_key(column):
+    """SQL expression truncating a timestamp column to the (UTC) hour, as 'YYYY-MM-DD HH'."""
+    if db.session.get_bind(mapper=Order).dialect.name == 'postgresql':
+        return func.to_char(func.date_trunc('hour', column), 'YYYY-MM-DD HH24')
+    return func.strftime('%Y-%m-%d %H', column)
+
+
+def _rows_for_order(order, payment_method, sign):
+    """Rollup deltas for one order: one row per (product, size) plus the order totals row."""
+    day = order.business_day
+    rows = {}
+    total_quantity = 0
+    for item in order.items:
+        key = (day, item.product_id, item.size_id or DailySalesRollup.ORDER_TOTALS, payment_method, order.user_id)
+        row = rows.setdefault(key, {'quantity': 0, 'revenue': 0, 'order_count': sign})
+        row['quantity'] += sign * item.quantity
+        row['revenue'] += sign * item.total_price
+        total_quantity += item.quantity
+    totals_key = (day, DailySalesRollup.ORDER_TOTALS, DailySalesRollup.ORDER_TOTALS, payment_method, order.user_id)
+    rows[totals_key] = {'quantity': sign * total_quantity, 'revenue': sign * order.total, 'order_count': sign}
+    return [dict(zip(KEY_COLUMNS, key), **values) for key, values in rows.items()]
+
+
+def _upsert(rows):
+    """Add ``rows`` to the rollup, creating missing keys (INSERT ... ON CONFLICT)."""
+    table = DailySalesRollup.__table__
+    dialect = db.session.get_bind(mapper=DailySalesRollup).dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(KEY_COLUMNS),
+            set_={name: table.c[name] + stmt.excluded[name] for name in SUM_COLUMNS}
+        )
+        db.session.execute(stmt)
+        return
+
+    # Portable fallback for other databases
+    for row in rows:
+        existing = db.session.query(DailySalesRollup).filter_by(
+            **{name: row[name] for name in KEY_COLUMNS}
+        ).with_for_update().first()
+        if existing:
+            for name in SUM_COLUMNS:
+                setattr(existing, name, getattr(existing, name) + row[name])
+        else:
+            db.session.add(DailySalesRollup(**row))
+
+
+def apply_order(order, payment_method, sign=1):
+    """Add a completed order to the rollup (``sign=-1`` reverses it for a refund).
+
+    Runs in the caller's transaction; the caller commits.
+    """
+    _upsert(_rows_for_order(order, payment_method, sign))
+
+
+def rebuild(start_day=None, end_day=None):
+    """Recompute the rollup for ``start_day``..``end_day`` (inclusive, None = unbounded).
+
+    Reads hot and archived orders. Two set-based INSERT ... SELECT statements;
+    commits when done. Returns the number of rollup rows written.
+    """
+    sources = [
+        (Order.__table__, OrderItem.__table__, Payment.__table__),
+        (orders_archive, order_items_archive, payments_archive),
+    ]
+
+    def completed(orders, query):
+        query = query.where(orders.c.status == 'completed', orders.c.business_day.isnot(None))
+        if start_day:
+            query = query.where(orders.c.business_day >= start_day)
+        if end_day:
+            query = query.where(orders.c.business_day <= end_day)
+        return query
+
+    cleanup = delete(DailySalesRollup)
+    if start_day:
+        cleanup = cleanup.where(DailySalesRollup.business_day >= start_day)
+    if end_day:
+        cleanup = cleanup.where(DailySalesRollup.business_day <= end_day)
+    db.session.execute(cleanup)
+
+    # One row per order item / per order, from both the hot and archive tables
+    items = union_all(*[
+        completed(orders, select(
+            orders.c.business_day,
+            order_items.c.product_id,
+            func.coalesce(order_items.c.size_id, DailySalesRollup.ORDER_TOTALS).label('size_id'),
+            payments.c.payment_method, orders.c.user_id, orders.c.id.label('order_id'),
+            order_items.c.quantity, order_items.c.total_price
+        ).select_from(orders.join(order_items, order_items.c.order_id == orders.c.id)
+                      .join(payments, payments.c.order_id == orders.c.id)))
+        for orders, order_items, payments in sources
+    ]).subquery()
+    totals = union_all(*[
+        completed(orders, select(
+            orders.c.business_day,
+            payments.c.payment_method, orders.c.user_id, orders.c.total,
+            select(func.coalesce(func.sum(order_items.c.quantity), 0))
+            .where(order_items.c.order_id == orders.c.id).scalar_subquery().label('quantity')
+        ).select_from(orders.join(payments, payments.c.order_id == orders.c.id)))
+        for orders, order_items, payments in sources
+    ]).subquery()
+
+    item_rows = select(
+        items.c.business_day, items.c.product_id, items.c.size_id, items.c.payment_method, items.c.user_id,
+        func.sum(items.c.quantity), func.sum(items.c.total_price), func.count(func.distinct(items.c.order_id))
+    ).group_by(items.c.business_day, items.c.product_id, items.c.size_id, items.c.payment_method, items.c.user_id)
+    total_rows = select(
+        totals.c.business_day, literal(DailySalesRollup.ORDER_TOTALS), literal(DailySalesRollup.ORDER_TOTALS),
+        totals.c.payment_method, totals.c.user_id,
+        func.sum(totals.c.quantity), func.sum(totals.c.total), func.count()
+    ).group_by(totals.c.business_day, totals.c.payment_method, totals.c.user_id)
+
+    columns = list(KEY_COLUMNS + SUM_COLUMNS)
+    written = 0
+    for rows in (item_rows, total_rows):
+        result = db.session.execute(DailySalesRollup.__table__.insert().from_select(columns, rows))
+        written += result.rowcount
+    db.session.commit()
+    logger.info(f"Rollup rebuilt for {start_day or 'start'}..{end_day or 'end'}: {written} rows")
+    return written
+
+
+def _in_days(query, start_day, end_day):
+    if start_day:
+        query = query.filter(DailySalesRollup.business_day >= start_day)
+    if end_day:
+        query = query.filter(DailySalesRollup.business_day <= end_day)
+    return query
+
+
+def day_totals(start_day=None, end_day=None):
+    """``(total_sales, total_orders)`` for the business days ``start_day``..``end_day``."""
+    total_sales, total_orders = _in_days(db.session.query(
+        func.coalesce(func.sum(DailySalesRollup.revenue), 0),
+        func.coalesce(func.sum(DailySalesRollup.order_count), 0)
+    ).filter(DailySalesRollup.product_id == DailySalesRollup.ORDER_TOTALS), start_day, end_day).one()
+    return int(total_sales), int(total_orders)
+
+
+def product_sales(start_day=None, end_day=None):
+    """``{product name: {'quantity', 'revenue'}}`` for the business days ``start_day``..``end_day``."""
+    rows = _in_days(db.session.query(
+        Product.name,
+        func.sum(DailySalesRollup.quantity),
+        func.sum(DailySalesRollup.revenue)
+    ).join(Product, Product.id == DailySalesRollup.product_id).filter(
+        DailySalesRollup.product_id != DailySalesRollup.ORDER_TOTALS
+    ), start_day, end_day).group_by(Product.name).all()
+    return {
+        name: {'quantity': int(quantity), 'revenue': int(revenue)}
+        for name, quantity, revenue in rows
+        if quantity
+    }
+
+
+def _category_order_counts(start_day, end_day):
+    """``{(business_day, category_id): distinct completed orders}`` from hot and archived orders."""
+    lines = union_all(*[
+        select(orders.c.business_day, Product.category_id, orders.c.id.label('order_id'))
+        .select_from(orders.join(order_items, order_items.c.order_id == orders.c.id)
+                     .outerjoin(Product, Product.id == order_items.c.product_id))
+        .where(orders.c.status == 'completed',
+               *([orders.c.business_day >= start_day] if start_day else []),
+               *([orders.c.business_day <= end_day] if end_day else []))
+        for orders, order_items in ((Order.__table__, OrderItem.__table__), (orders_archive, order_items_archive))
+    ]).subquery()
+    rows = db.session.execute(
+        select(lines.c.business_day, lines.c.category_id, func.count(func.distinct(lines.c.order_id)))
+        .group_by(lines.c.business_day, lines.c.category_id)
+    ).all()
+    return {(day, category_id): count for day, category_id, count in rows}
+
+
+def day_series(start_day=None, end_day=None, split=None):
+    """``[(business_day, group, revenue, order_count, items_sold)]`` per business day.
+
+    ``split`` is None (group is None), 'payment_method', 'cashier' (user id)
+    or 'category' (category id). Category revenue and items come from the
+    per-product rollup rows; an order with two products of one category is
+    one order of that category, so those counts are taken from the orders.
+    """
+    if split == 'category':
+        groups = [Product.category_id]
+        query = db.session.query(DailySalesRollup.business_day, *groups).outerjoin(
+            Product, Product.id == DailySalesRollup.product_id
+        ).filter(DailySalesRollup.product_id != DailySalesRollup.ORDER_TOTALS)
+    else:
+        groups = {
+            'payment_method': [DailySalesRollup.payment_method],
+            'cashier': [DailySalesRollup.user_id],
+        }.get(split, [])
+        query = db.session.query(DailySalesRollup.business_day, *groups).filter(
+            DailySalesRollup.product_id == DailySalesRollup.ORDER_TOTALS
+        )
+    query = _in_days(query.add_columns(
+        func.sum(DailySalesRollup.revenue),
+        func.sum(DailySalesRollup.order_count),
+        func.sum(DailySalesRollup.quantity)
+    ), start_day, end_day).group_by(DailySalesRollup.business_day, *groups)
+    rows = [
+        (row[0], row[1] if groups else None, int(row[-3]), int(row[-2]), int(row[-1]))
+        for row in query.all()
+    ]
+    if split == 'category':
+        counts = _category_order_counts(start_day, end_day)
+        rows = [(day, group, revenue, counts.get((day, group), 0), items_sold)
+                for day, group, revenue, _, items_sold in rows]
+    return rows
+
+
+def close_business_day(day, user_id=None):
+    """Finalize ``day``: drop rollup rows emptied by refunds and record the day's figures.
+
+    A handful of statements over the day's rollup rows, whatever the order
+    volume. Closing a day again refreshes its record. Commits when done.
+    """
+    db.session.execute(delete(DailySalesRollup).where(
+        DailySalesRollup.business_day == day,
+        DailySalesRollup.quantity == 0,
+        DailySalesRollup.revenue == 0,
+        DailySalesRollup.order_count == 0
+    ))
+    total_sales, order_count = day_totals(day, day)
+    figures = {
+        'total_sales': total_sales,
+        'order_count': order_count,
+        'closed_at': datetime.now(timezone.utc),
+        'closed_by': user_id
+    }
+
+    record = db.session.query(BusinessDayClose).filter_by(business_day=day).first()
+    if record:
+        for name, value in figures.items():
+            setattr(record, name, value)
+    else:
+        record = BusinessDayClose(business_day=day, **figures)
+        db.session.add(record)
+    db.session.commit()
+    logger.info(f"Business day {day} closed: {order_count} orders, {total_sales} sales")
+    return record
+
+
+def register_commands(app):
+    """Add the ``flask rebuild-rollups`` command."""
+    @app.cli.command('rebuild-rollups')
+    @click.option('--start', 'start', default=None, help='First business day (YYYY-MM-DD)')
+    @click.option('--end', 'end', default=None, help='Last business day (YYYY-MM-DD)')
+    def rebuild_rollups_command(start, end):
+        """Backfill daily_sales_rollup from the orders table."""
+        start_day = date.fromisoformat(start) if start else None
+        end_day = date.fromisoformat(end) if end else None
+        written = rebuild(start_day, end_day)
+        click.echo(f"Rebuilt daily_sales_rollup: {written} rows")
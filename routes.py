@@ -2,7 +2,7 @@ from flask import Blueprint, jsonify, request, Response
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 from datetime import datetime, timedelta, timezone
-from models import db, User, Category, Product, Sale, SaleItem, Role, PaymentMethod, CashRegisterSession, Order
+from models import db, User, Category, Product, Sale, SaleItem, Role, PaymentMethod, CashRegisterSession
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt as pyjwt
 import logging
@@ -13,6 +13,12 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 from config import Config
+from live_metrics import dashboard_metrics
+from db_routing import reads_from_replica
+import rollups
+import stock
+import session_totals
+import dashboard
 
 api = Blueprint('api', __name__)
 logger = logging.getLogger(__name__)
@@ -233,6 +239,11 @@ def create_product():
         db.session.add(product)
         db.session.commit()
         logger.info(f"Product created: {product.name}")
+        dashboard.invalidate()
+        try:
+            dashboard_metrics.record_stock([(product.id, product.stock, product.low_stock_threshold)])
+        except Exception as e:
+            logger.error(f"Error updating dashboard metrics: {str(e)}")
         return jsonify(product.to_dict()), 201
     except IntegrityError:
         db.session.rollback()
@@ -290,19 +301,36 @@ def create_sale():
             quantity=item['quantity'],
             unit_price=product.price
         ))
-        product.stock -= item['quantity']
 
+    # The check above is only a fast path; the decrement itself is atomic
+    try:
+        stock_levels = stock.take((item.product_id, item.quantity) for item in sale_items)
+    except stock.InsufficientStock as e:
+        db.session.rollback()
+        product = db.session.get(Product, e.product_id)
+        logger.error(f"Insufficient stock for product: {product.name}")
+        return jsonify({'error': f'Insufficient stock for {product.name}'}), 400
+
+    sold_at = datetime.now(timezone.utc)
     sale = Sale(
         total=total,
         payment_method=payment_method,
         user_id=request.user.id,
-        session_id=session.id
+        session_id=session.id,
+        date=sold_at,
+        business_day=rollups.business_day_for(sold_at)
     )
     sale.items = sale_items
     db.session.add(sale)
     try:
+        session_totals.record_payment(session.id, payment_method, total)
         db.session.commit()
         logger.info(f"Sale created: ID={sale.id}, Total={total}")
+        dashboard.invalidate()
+        try:
+            dashboard_metrics.record_stock(stock_levels)
+        except Exception as e:
+            logger.error(f"Error updating dashboard metrics: {str(e)}")
         return jsonify(sale.to_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -311,6 +339,7 @@ def create_sale():
 
 @api.route('/sales', methods=['GET'])
 @_require_auth()
+@reads_from_replica
 def get_sales():
     """Retrieve sales with optional filters."""
     logger.info("Processing get sales request")
@@ -338,10 +367,13 @@ def get_sales():
     if user_id:
         query = query.filter_by(user_id=user_id)
     try:
+        # Plain dates select whole business days, end day included
         if start_date:
-            query = query.filter(Sale.date >= datetime.fromisoformat(start_date))
+            start = datetime.fromisoformat(start_date)
+            query = query.filter(Sale.business_day >= start.date() if len(start_date) == 10 else Sale.date >= start)
         if end_date:
-            query = query.filter(Sale.date <= datetime.fromisoformat(end_date))
+            end = datetime.fromisoformat(end_date)
+            query = query.filter(Sale.business_day <= end.date() if len(end_date) == 10 else Sale.date <= end)
     except ValueError:
         logger.error("Invalid date format in get sales request")
         return jsonify({'error': 'Invalid date format (use ISO format)'}), 400
@@ -389,43 +421,29 @@ def get_dashboard_stats():
     logger.info("Processing get dashboard stats request")
     
     try:
-        # Get today's date range
-        today = datetime.now(timezone.utc).date()
-        start_of_day = datetime.combine(today, datetime.min.time()).replace(tzinfo=timezone.utc)
-        end_of_day = datetime.combine(today, datetime.max.time()).replace(tzinfo=timezone.utc)
-        
-        # Get today's completed orders
-        today_orders = db.session.query(Order).filter(
-            Order.status == 'completed',
-            Order.completed_at >= start_of_day,
-            Order.completed_at <= end_of_day
-        ).all()
-        
-        # Calculate today's statistics
-        today_sales = sum(order.total for order in today_orders)
-        today_orders_count = len(today_orders)
+        # Today's totals come from the daily rollup, product counts from one aggregate query
+        today = rollups.business_day_for(datetime.now(timezone.utc))
+        stats = dashboard.stats(today)
         
-        # Get total products count
-        total_products = db.session.query(Product).count()
+        logger.info(f"Dashboard stats - Today's sales: {stats['today_sales']}, Orders: {stats['today_orders']}")
         
-        # Get low stock products count
-        low_stock_products = db.session.query(Product).filter(
-            Product.stock <= Product.low_stock_threshold
-        ).count()
-        
-        logger.info(f"Dashboard stats - Today's sales: {today_sales}, Orders: {today_orders_count}")
-        
-        return jsonify({
-            'today_sales': today_sales,
-            'today_orders': today_orders_count,
-            'total_products': total_products,
-            'low_stock_count': low_stock_products
-        }), 200
+        return jsonify(stats), 200
         
     except Exception as e:
         logger.error(f"Error getting dashboard stats: {str(e)}")
         return jsonify({'error': 'Failed to get dashboard statistics'}), 500
 
+@api.route('/dashboard/bootstrap', methods=['GET'])
+@_require_auth(Role.ADMIN)
+def get_dashboard_bootstrap():
+    """Stats, low-stock products, recent orders and settings for the admin dashboard (admin only)."""
+    logger.info("Processing get dashboard bootstrap request")
+    try:
+        return jsonify(dashboard.bootstrap()), 200
+    except Exception as e:
+        logger.error(f"Error getting dashboard bootstrap: {str(e)}")
+        return jsonify({'error': 'Failed to get dashboard data'}), 500
+
 # ---------- CASH REGISTER SESSIONS ----------
 @api.route('/cash-register-sessions', methods=['GET'])
 @_require_auth(Role.CASHIER)
@@ -495,6 +513,20 @@ def close_cash_register_session(session_id):
     logger.info(f"Cash register session closed: ID={session.id}")
     return jsonify(session.to_dict()), 200
 
+@api.route('/cash-register-sessions/<int:session_id>/z-report', methods=['GET'])
+@_require_auth()
+def get_z_report(session_id):
+    """Sales, refunds and expected versus counted cash of a session (its cashier or an admin)."""
+    logger.info(f"Processing Z-report request for session ID: {session_id}")
+    session = db.session.get(CashRegisterSession, session_id)
+    if not session:
+        logger.error(f"Session not found: ID={session_id}")
+        return jsonify({'error': 'Session not found'}), 404
+    if request.user.role != Role.ADMIN and session.user_id != request.user.id:
+        logger.error(f"Unauthorized attempt to read Z-report: ID={session_id}")
+        return jsonify({'error': 'Not authorized to view this session'}), 403
+    return jsonify(session_totals.z_report(session)), 200
+
 # ---------- UTILS ----------
 def _generate_pdf(title, data):
     """Generate a PDF report."""
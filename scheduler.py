@@ -0,0 +1,208 @@
+"""Background jobs run by exactly one process.
+
+Every server process (each gunicorn worker, or ``python app.py``) runs a
+scheduler thread, but only the holder of the database lease executes jobs.
+The leader renews the lease on every tick. If it dies, another process takes
+over once the lease expires. Jobs run inside an application context, and
+each run's duration, lag and outcome are stored in ``scheduled_job_status``.
+
+Jobs are declared with ``register_job`` at import time. A server starts its
+thread with ``start_scheduler(app)``, so scripts that only import the app do
+not compete for the lease.
+"""
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+import schedule
+from sqlalchemy import update, or_
+from sqlalchemy.exc import IntegrityError
+from models import db, SchedulerLease, ScheduledJobStatus
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_KEY = 'pos_scheduler'
+LEASE_NAME = 'scheduler'
+
+_registry = {}
+
+
+def register_job(name, when, func):
+    """Declare a background job.
+
+    ``when`` receives a ``schedule.Scheduler`` and returns the unfinished job,
+    e.g. ``lambda s: s.every().day.at("00:00")``. ``func`` takes no arguments
+    and runs inside an application context; exceptions mark the run failed.
+    """
+    _registry[name] = (when, func)
+
+
+class JobScheduler:
+    """A ``schedule.Scheduler`` whose jobs only run while this process holds the lease."""
+
+    def __init__(self, app, jobs):
+        self.app = app
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = app.config['SCHEDULER_LEASE_SECONDS']
+        self.poll_seconds = app.config['SCHEDULER_POLL_SECONDS']
+        self.is_leader = False
+        self.running = False
+        self._scheduler = schedule.Scheduler()
+        self._jobs = {}
+        self._stop = threading.Event()
+        for name, (when, func) in jobs.items():
+            self._jobs[name] = when(self._scheduler).do(self._run_job, name, func)
+
+    def _renew_lease(self):
+        """Take or extend the lease. Returns True while this process is the leader."""
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        result = db.session.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == LEASE_NAME,
+                   or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now))
+            .values(holder=self.holder, expires_at=expires_at)
+        )
+        if result.rowcount:
+            db.session.commit()
+            return True
+        if db.session.get(SchedulerLease, LEASE_NAME) is not None:
+            db.session.rollback()
+            return False
+        try:
+            db.session.add(SchedulerLease(name=LEASE_NAME, holder=self.holder, expires_at=expires_at))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            # Another process created the lease first
+            db.session.rollback()
+            return False
+
+    def _release_lease(self):
+        with self.app.app_context():
+            try:
+                db.session.execute(
+                    update(SchedulerLease)
+                    .where(SchedulerLease.name == LEASE_NAME, SchedulerLease.holder == self.holder)
+                    .values(expires_at=datetime.now(timezone.utc))
+                )
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error releasing scheduler lease: {str(e)}")
+
+    def _run_job(self, name, func):
+        # Followers tick too, so their schedules stay current; they just skip the work
+        if not self.is_leader:
+            return
+        scheduled_at = self._jobs[name].next_run  # schedule uses naive local time
+        lag_ms = max(0, int((datetime.now() - scheduled_at).total_seconds() * 1000))
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        error = None
+        with self.app.app_context():
+            try:
+                func()
+            except Exception as e:
+                db.session.rollback()
+                error = str(e)
+                logger.error(f"Scheduled job {name} failed: {error}")
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            self._record_run(name, started_at, duration_ms, lag_ms, error)
+        logger.info(f"Scheduled job {name} finished in {duration_ms}ms (lag {lag_ms}ms)")
+
+    def _record_run(self, name, started_at, duration_ms, lag_ms, error):
+        try:
+            status = db.session.get(ScheduledJobStatus, name)
+            if not status:
+                status = ScheduledJobStatus(name=name, run_count=0, failure_count=0)
+                db.session.add(status)
+            status.last_started_at = started_at
+            status.last_duration_ms = duration_ms
+            status.last_lag_ms = lag_ms
+            status.last_error = error
+            status.last_holder = self.holder
+            status.run_count += 1
+            if error:
+                status.failure_count += 1
+            else:
+                status.last_success_at = started_at
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error recording run of job {name}: {str(e)}")
+
+    def tick(self):
+        """Renew the lease and run due jobs."""
+        with self.app.app_context():
+            try:
+                leader = self._renew_lease()
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"Scheduler lease unavailable: {str(e)}")
+                leader = False
+        if leader != self.is_leader:
+            logger.info(f"Scheduler {self.holder} {'is now' if leader else 'is no longer'} the leader")
+        self.is_leader = leader
+        self._scheduler.run_pending()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.tick()
+            self._stop.wait(self.poll_seconds)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        threading.Thread(target=self._loop, name='pos-scheduler', daemon=True).start()
+        atexit.register(self.stop)
+        logger.info(f"Scheduler {self.holder} started with jobs: {', '.join(self._jobs) or 'none'}")
+
+    def stop(self):
+        """Stop ticking and hand the lease over right away."""
+        if not self.running:
+            return
+        self._stop.set()
+        self.running = False
+        if self.is_leader:
+            self._release_lease()
+            self.is_leader = False
+
+    def status(self):
+        """Lease holder and per-job figures (requires an application context)."""
+        lease = db.session.get(SchedulerLease, LEASE_NAME)
+        lease_active = lease is not None and lease.expires_at > datetime.now(timezone.utc).replace(tzinfo=None)
+        recorded = {
+            status.name: status
+            for status in db.session.query(ScheduledJobStatus).filter(ScheduledJobStatus.name.in_(list(self._jobs)))
+        }
+        jobs = []
+        for name, job in self._jobs.items():
+            entry = recorded[name].to_dict() if name in recorded else {'name': name}
+            entry['next_run'] = job.next_run.isoformat() if job.next_run else None
+            jobs.append(entry)
+        return {
+            'running': self.running,
+            'holder': self.holder,
+            'is_leader': self.is_leader,
+            'leader': lease.holder if lease_active else None,
+            'jobs': jobs
+        }
+
+
+def init_scheduler(app):
+    """Build the application's scheduler from the registered jobs (not started)."""
+    app.extensions[SCHEDULER_KEY] = JobScheduler(app, dict(_registry))
+
+
+def start_scheduler(app):
+    """Start the scheduler thread of a serving process, unless SCHEDULER_ENABLED is off."""
+    if not app.config.get('SCHEDULER_ENABLED'):
+        logger.info("Background scheduler disabled")
+        return
+    app.extensions[SCHEDULER_KEY].start()
@@ -0,0 +1,129 @@
+"""Running totals of each cash register session, for Z-reports.
+
+Every completed order and direct sale adds its amount to the session it was
+rung up in, per payment method, and a refund adds to the session's refund
+totals. The update happens in the transaction that takes the payment, as one
+``UPDATE ... SET column = column + :amount``, so concurrent payments never
+overwrite each other. A Z-report then reads a single row:
+
+    expected cash = starting cash + cash sales - cash refunds
+
+Refunds count against the session of the refunded order, even if it is
+already closed. ``rebuild`` recomputes the totals from orders, payments and
+sales for backfills (``flask rebuild-session-totals``).
+"""
+import logging
+import click
+from sqlalchemy import update, select, func
+from models import (
+    db, CashRegisterSession, Order, Payment, PaymentMethod, Sale, orders_archive, payments_archive
+)
+
+logger = logging.getLogger(__name__)
+
+SALES_COLUMNS = {
+    PaymentMethod.CASH: 'cash_sales',
+    PaymentMethod.CREDIT_CARD: 'card_sales',
+    PaymentMethod.MOBILE: 'mobile_sales',
+}
+TOTAL_COLUMNS = ('cash_sales', 'card_sales', 'mobile_sales', 'order_count', 'refund_count', 'refund_total',
+                 'cash_refunds')
+
+
+def _add(session_id, **amounts):
+    sessions = CashRegisterSession.__table__
+    db.session.execute(update(sessions).where(sessions.c.id == session_id).values(
+        **{name: sessions.c[name] + amount for name, amount in amounts.items()}
+    ))
+
+
+def record_payment(session_id, payment_method, amount):
+    """Add a completed order or sale to its session. Runs in the caller's transaction."""
+    _add(session_id, order_count=1, **{SALES_COLUMNS[payment_method]: amount})
+
+
+def record_refund(session_id, payment_method, amount):
+    """Add a refund to the refunded order's session. Runs in the caller's transaction."""
+    refund = {'refund_count': 1, 'refund_total': amount}
+    if payment_method == PaymentMethod.CASH:
+        refund['cash_refunds'] = amount
+    _add(session_id, **refund)
+
+
+def z_report(session):
+    """End-of-shift figures of a session, from its running totals."""
+    expected_cash = session.starting_cash + session.cash_sales - session.cash_refunds
+    return {
+        'session': session.to_dict(),
+        'sales': {
+            method.value: getattr(session, column) for method, column in SALES_COLUMNS.items()
+        },
+        'total_sales': session.cash_sales + session.card_sales + session.mobile_sales,
+        'order_count': session.order_count,
+        'refund_count': session.refund_count,
+        'refund_total': session.refund_total,
+        'cash_refunds': session.cash_refunds,
+        'expected_cash': expected_cash,
+        'counted_cash': session.ending_cash,
+        'difference': session.ending_cash - expected_cash if session.ending_cash is not None else None
+    }
+
+
+def rebuild():
+    """Recompute every session's totals from hot and archived orders and from sales.
+
+    A few grouped queries, then one executemany UPDATE; commits when done.
+    Returns the number of sessions updated.
+    """
+    totals = {}
+
+    def add(session_id, name, amount):
+        row = totals.setdefault(session_id, dict.fromkeys(TOTAL_COLUMNS, 0))
+        row[name] += int(amount)
+
+    for orders, payments in ((Order.__table__, Payment.__table__), (orders_archive, payments_archive)):
+        rows = db.session.execute(
+            select(orders.c.session_id, payments.c.payment_method, payments.c.status,
+                   func.sum(payments.c.amount), func.count())
+            .select_from(orders.join(payments, payments.c.order_id == orders.c.id))
+            .where(payments.c.status.in_(['completed', 'refunded']))
+            .group_by(orders.c.session_id, payments.c.payment_method, payments.c.status)
+        ).all()
+        for session_id, method, status, amount, count in rows:
+            # A refunded order was a sale first
+            add(session_id, SALES_COLUMNS[method], amount)
+            add(session_id, 'order_count', count)
+            if status == 'refunded':
+                add(session_id, 'refund_total', amount)
+                add(session_id, 'refund_count', count)
+                if method == PaymentMethod.CASH:
+                    add(session_id, 'cash_refunds', amount)
+
+    rows = db.session.execute(
+        select(Sale.session_id, Sale.payment_method, func.sum(Sale.total), func.count())
+        .where(Sale.is_active.is_(True))
+        .group_by(Sale.session_id, Sale.payment_method)
+    ).all()
+    for session_id, method, amount, count in rows:
+        add(session_id, SALES_COLUMNS[method], amount)
+        add(session_id, 'order_count', count)
+
+    session_ids = db.session.execute(select(CashRegisterSession.id)).scalars().all()
+    empty = dict.fromkeys(TOTAL_COLUMNS, 0)
+    if session_ids:
+        db.session.execute(
+            update(CashRegisterSession.__table__).where(CashRegisterSession.__table__.c.id == db.bindparam('session_id')),
+            [dict(totals.get(session_id, empty), session_id=session_id) for session_id in session_ids]
+        )
+    db.session.commit()
+    logger.info(f"Session totals rebuilt for {len(session_ids)} sessions")
+    return len(session_ids)
+
+
+def register_commands(app):
+    """Add the ``flask rebuild-session-totals`` command."""
+    @app.cli.command('rebuild-session-totals')
+    def rebuild_session_totals_command():
+        """Recompute every cash register session's running totals."""
+        count = rebuild()
+        click.echo(f"Rebuilt running totals of {count} sessions")
@@ -11,7 +11,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from app import app, db
+    from app import app, db, apply_migrations
     from models import User, Role, Category, Product, ProductSize, ProductModifier
     from werkzeug.security import generate_password_hash
     
@@ -19,9 +19,9 @@ try:
     
     with app.app_context():
         try:
-            # Create all tables
+            # Create all tables (or migrate an existing database)
             print("Creating database tables...")
-            db.create_all()
+            apply_migrations(app)
             print("[OK] Database tables created")
             
             # Ensure admin user exists
@@ -33,6 +33,7 @@ document.addEventListener("DOMContentLoaded", function () {
 
   loadUserInfo();
   loadDashboard();
+  startDashboardStream();
 
   // Reset product modal when it's hidden (only if not in edit mode)
   const productModal = document.getElementById("addProductModal");
@@ -193,9 +194,10 @@ function showSection(sectionName) {
 async function loadDashboard() {
   try {
     console.log("Loading dashboard...");
-    // Load dashboard statistics
-    const stats = await apiCallDirect("/api/dashboard/stats");
-    console.log("Dashboard stats received:", stats);
+    // Stats, low stock, recent orders and settings in one request
+    const data = await apiCallDirect("/api/dashboard/bootstrap");
+    const stats = data.stats;
+    console.log("Dashboard data received:", data);
 
     // Update stats
     const totalProductsEl = document.getElementById("total-products");
@@ -205,35 +207,25 @@ async function loadDashboard() {
 
     if (totalProductsEl) {
       totalProductsEl.textContent = stats.total_products;
-      console.log("Updated total products:", stats.total_products);
     }
     if (lowStockEl) {
       lowStockEl.textContent = stats.low_stock_count;
-      console.log("Updated low stock:", stats.low_stock_count);
     }
     if (todaySalesEl) {
       todaySalesEl.textContent = `DZD ${stats.today_sales.toFixed(2)}`;
-      console.log("Updated today sales:", stats.today_sales);
     }
     if (totalOrdersEl) {
       totalOrdersEl.textContent = stats.today_orders;
-      console.log("Updated total orders:", stats.today_orders);
     }
 
-    // Load inventory for low stock products
-    try {
-      const inventory = await apiCall("/admin/inventory");
-      console.log("Inventory received:", inventory);
-
-      // Load low stock products
-      const lowStockList = document.getElementById("low-stock-list");
-      if (inventory.low_stock_products.length === 0) {
-        lowStockList.innerHTML =
-          '<p class="text-muted">No low stock products</p>';
-      } else {
-        lowStockList.innerHTML = inventory.low_stock_products
-          .map(
-            (product) => `
+    // Low stock products
+    const lowStockList = document.getElementById("low-stock-list");
+    if (data.low_stock.products.length === 0) {
+      lowStockList.innerHTML = '<p class="text-muted">No low stock products</p>';
+    } else {
+      lowStockList.innerHTML = data.low_stock.products
+        .map(
+          (product) => `
                     <div class="alert alert-warning d-flex justify-content-between align-items-center">
                         <div>
                             <strong>${product.name}</strong> - ${product.stock} remaining
@@ -244,14 +236,38 @@ async function loadDashboard() {
                         </button>
                     </div>
                 `,
-          )
-          .join("");
+        )
+        .join("");
+      if (data.low_stock.count > data.low_stock.products.length) {
+        lowStockList.innerHTML += `<p class="text-muted">${data.low_stock.count - data.low_stock.products.length} more in Inventory</p>`;
+      }
+    }
+
+    // Recent orders
+    const recentOrdersList = document.getElementById("recent-orders-list");
+    if (recentOrdersList) {
+      recentOrdersList.innerHTML =
+        data.recent_orders.length === 0
+          ? '<p class="text-muted">No orders yet</p>'
+          : data.recent_orders
+              .map(
+                (order) => `
+                    <div class="d-flex justify-content-between border-bottom py-1">
+                        <span>#${order.id} <small class="text-muted">${new Date(order.created_at + "Z").toLocaleTimeString()}</small></span>
+                        <span>DZD ${order.total.toFixed(2)} <small class="text-muted">${order.status}</small></span>
+                    </div>
+                `,
+              )
+              .join("");
+    }
+
+    // Saved shop name
+    if (data.settings["shop-name"]) {
+      document.title = data.settings["shop-name"] + " - POS System";
+      const titleElement = document.querySelector(".navbar-brand");
+      if (titleElement) {
+        titleElement.textContent = data.settings["shop-name"];
       }
-    } catch (inventoryError) {
-      console.error("Error loading inventory:", inventoryError);
-      const lowStockList = document.getElementById("low-stock-list");
-      lowStockList.innerHTML =
-        '<p class="text-danger">Error loading inventory</p>';
     }
   } catch (error) {
     console.error("Error loading dashboard:", error);
@@ -273,6 +289,35 @@ async function loadDashboard() {
   }
 }
 
+// Live dashboard figures pushed by the server (Server-Sent Events)
+let dashboardStream = null;
+
+function startDashboardStream() {
+  if (dashboardStream || typeof EventSource === "undefined") {
+    return;
+  }
+
+  // EventSource cannot send headers, so the token goes in the query string.
+  // It reconnects on its own and resumes with Last-Event-ID.
+  dashboardStream = new EventSource(
+    `/api/pos/admin/dashboard/stream?token=${encodeURIComponent(authToken)}`,
+  );
+  dashboardStream.addEventListener("metrics", function (event) {
+    const stats = JSON.parse(event.data);
+    const lowStockEl = document.getElementById("low-stock-count");
+    const todaySalesEl = document.getElementById("today-sales");
+    const totalOrdersEl = document.getElementById("total-orders");
+
+    if (lowStockEl) lowStockEl.textContent = stats.low_stock_count;
+    if (todaySalesEl)
+      todaySalesEl.textContent = `DZD ${stats.today_sales.toFixed(2)}`;
+    if (totalOrdersEl) totalOrdersEl.textContent = stats.today_orders;
+  });
+  dashboardStream.onerror = function () {
+    console.warn("Dashboard stream interrupted, reconnecting...");
+  };
+}
+
 // Inventory functions
 async function loadInventory() {
   try {
@@ -834,11 +879,11 @@ async function generateSalesReportPDF() {
   }
 }
 
-// Reset daily analytics function
+// Close today's business day
 async function resetDailyAnalytics() {
   if (
     !confirm(
-      "Are you sure you want to reset daily analytics? This will clear today's data from the analytics view but preserve it for PDF reports.",
+      "Close today's business day? This records today's sales totals. Orders completed afterwards are added when the day is closed again or when the business day ends.",
     )
   ) {
     return;
@@ -856,17 +901,17 @@ async function resetDailyAnalytics() {
     const result = await response.json();
 
     if (response.ok) {
-      alert("Daily analytics reset successfully!");
+      alert(result.message);
       // Reload the analytics to show the reset state
       loadSalesAnalytics();
       // Update scheduler status
       checkSchedulerStatus();
     } else {
-      throw new Error(result.error || "Reset failed");
+      throw new Error(result.error || "Close of day failed");
     }
   } catch (error) {
-    console.error("Error resetting daily analytics:", error);
-    alert("Error resetting daily analytics: " + error.message);
+    console.error("Error closing business day:", error);
+    alert("Error closing business day: " + error.message);
   }
 }
 
@@ -896,14 +941,17 @@ async function checkSchedulerStatus() {
           );
 
           if (timeDiff > 0) {
-            messageElement.textContent = `Next automatic reset: ${nextReset.toLocaleString()} (in ${hours}h ${minutes}m)`;
+            messageElement.textContent = `Next automatic close of day: ${nextReset.toLocaleString()} (in ${hours}h ${minutes}m)`;
           } else {
             messageElement.textContent =
-              "Next automatic reset: Tonight at 00:00";
+              "Next automatic close of day: When the business day ends";
           }
         } else {
           messageElement.textContent =
-            "Automatic reset scheduled for 00:00 every day";
+            "Automatic close of day runs when each business day ends";
+        }
+        if (result.last_close) {
+          messageElement.textContent += ` - Last closed day: ${result.last_close.business_day}`;
         }
       } else {
         messageElement.textContent = "Scheduler not active";
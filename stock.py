@@ -0,0 +1,81 @@
+"""Atomic stock changes.
+
+Stock is never read, changed in Python and written back: two checkouts of the
+same product would both read the old level and one decrement would be lost.
+Each change is a single ``UPDATE products SET stock = stock - :n WHERE id = :id
+AND stock >= :n``, so the database serializes concurrent changes to a product
+and refuses the one that would take it below zero. Products are updated in id
+order so two transactions never wait on each other's rows in opposite orders.
+
+All functions run in the caller's transaction; the caller commits, or rolls
+back on InsufficientStock.
+"""
+from sqlalchemy import update
+from sqlalchemy.orm.attributes import set_committed_value
+from models import db, Product
+
+
+class InsufficientStock(Exception):
+    """A product does not have the requested quantity left."""
+
+    def __init__(self, product_id):
+        super().__init__(f"Insufficient stock for product {product_id}")
+        self.product_id = product_id
+
+
+def _change(product_id, delta, condition):
+    products = Product.__table__
+    row = db.session.execute(
+        update(products).where(products.c.id == product_id, *condition)
+        .values(stock=products.c.stock + delta)
+        .returning(products.c.id, products.c.stock, products.c.low_stock_threshold)
+    ).first()
+    # Keep an already loaded Product in step without marking it dirty
+    product = db.session.identity_map.get(db.session.identity_key(Product, product_id))
+    if row is not None and product is not None:
+        set_committed_value(product, 'stock', row.stock)
+    return row
+
+
+def _totals(quantities):
+    totals = {}
+    for product_id, quantity in quantities:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    return totals
+
+
+def take(quantities):
+    """Remove ``(product_id, quantity)`` pairs from stock, all or nothing.
+
+    Returns the new ``(product_id, stock, threshold)`` levels. Raises
+    InsufficientStock, with the first short product, if any product is missing
+    or short; the caller must then roll back the units already taken.
+    """
+    levels = []
+    for product_id, quantity in sorted(_totals(quantities).items()):
+        row = _change(product_id, -quantity, [Product.__table__.c.stock >= quantity])
+        if row is None:
+            raise InsufficientStock(product_id)
+        levels.append(tuple(row))
+    return levels
+
+
+def give_back(quantities):
+    """Return ``(product_id, quantity)`` pairs to stock. Returns the new levels."""
+    levels = []
+    for product_id, quantity in sorted(_totals(quantities).items()):
+        row = _change(product_id, quantity, [])
+        if row is not None:
+            levels.append(tuple(row))
+    return levels
+
+
+def adjust(product_id, delta):
+    """Add ``delta`` (negative to remove) to one product's stock.
+
+    Returns the new level, or raises InsufficientStock if it would go below zero.
+    """
+    row = _change(product_id, delta, [Product.__table__.c.stock + delta >= 0])
+    if row is None:
+        raise InsufficientStock(product_id)
+    return tuple(row)
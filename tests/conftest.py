@@ -0,0 +1,93 @@
+"""Shared fixtures: an app on a temporary SQLite file with a small menu, an admin and a cashier."""
+import os
+import sys
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from config import TestConfig  # noqa: E402
+from models import (  # noqa: E402
+    db, User, Role, Category, Product, ProductSize, ProductModifier, CashRegisterSession
+)
+
+
+@pytest.fixture
+def app(tmp_path):
+    config = type('FileTestConfig', (TestConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'ANALYTICS_CACHE_ENABLED': False,  # Requests must run their queries
+        'COLUMNAR_ANALYTICS_ENABLED': False,
+    })
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        cashier = User(username='cashier', password_hash=generate_password_hash('cashier'), role=Role.CASHIER)
+        db.session.add_all([
+            User(username='admin', password_hash=generate_password_hash('admin'), role=Role.ADMIN), cashier
+        ])
+        category = Category(name='Coffee')
+        db.session.add(category)
+        db.session.flush()
+        for n in range(3):
+            product = Product(name=f'Product {n}', price=100 + n, stock=10_000, category_id=category.id)
+            db.session.add(product)
+            db.session.flush()
+            db.session.add(ProductSize(product_id=product.id, name='Large', price_modifier=20))
+            db.session.add(ProductModifier(product_id=product.id, name='Extra Shot', price_modifier=10))
+        db.session.add(CashRegisterSession(user_id=cashier.id, starting_cash=0))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _login(client, username):
+    response = client.post('/api/login', json={'username': username, 'password': username})
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+
+@pytest.fixture
+def cashier(client):
+    return _login(client, 'cashier')
+
+
+@pytest.fixture
+def admin(client):
+    return _login(client, 'admin')
+
+
+def order_payload(items):
+    """An order of ``items`` lines cycling through the products, each with a size and a modifier."""
+    return {'items': [{'product_id': 1 + n % 3, 'quantity': 1, 'size_id': 1 + n % 3, 'modifier_ids': [1 + n % 3]}
+                      for n in range(items)]}
+
+
+class QueryRecorder:
+    """Records the SQL statements (and their parameters) run by any engine while active."""
+
+    def __init__(self):
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(Engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Engine, 'before_cursor_execute', self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
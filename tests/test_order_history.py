@@ -0,0 +1,60 @@
+"""Order history filters: plain dates are business days, archived orders stay listed."""
+from datetime import datetime, timedelta, timezone
+
+from conftest import order_payload
+import archive
+from models import db, Order, orders_archive
+
+
+def _create(client, cashier, complete=True):
+    order_id = client.post('/api/pos/pos/orders', json=order_payload(2), headers=cashier).get_json()['id']
+    if complete:
+        response = client.post(f'/api/pos/pos/orders/{order_id}/complete', json={'payment_method': 'cash'},
+                               headers=cashier)
+        assert response.status_code == 200
+    return order_id
+
+
+def _listed(client, headers, query):
+    response = client.get(f'/api/pos/pos/orders?{query}', headers=headers)
+    assert response.status_code == 200
+    return {order['id'] for order in response.get_json()}
+
+
+def test_plain_dates_select_business_days(client, cashier):
+    today = datetime.now(timezone.utc).date()
+    yesterday = today - timedelta(days=1)
+    late = _create(client, cashier)  # Completed after midnight, before the rollover hour
+    db.session.query(Order).filter_by(id=late).update({'business_day': yesterday})
+    db.session.commit()
+    completed = _create(client, cashier)
+    pending = _create(client, cashier, complete=False)
+
+    assert _listed(client, cashier, f'start_date={today}&end_date={today}') == {completed, pending}
+    assert _listed(client, cashier, f'start_date={yesterday}&end_date={yesterday}') == {late}
+    assert _listed(client, cashier, f'start_date={yesterday}') == {late, completed, pending}
+
+
+def test_archived_orders_stay_listed(client, cashier):
+    order_ids = [_create(client, cashier) for _ in range(3)]
+    cancelled = _create(client, cashier, complete=False)
+    client.post(f'/api/pos/pos/orders/{cancelled}/cancel', headers=cashier)
+    order_ids.append(cancelled)
+    before = {order_id: client.get(f'/api/pos/pos/orders/{order_id}', headers=cashier).get_json()
+              for order_id in order_ids}
+
+    # All but the newest orders move; one is archived as if before snapshots existed
+    assert archive.archive_orders(datetime.now(timezone.utc) + timedelta(days=1), 10) == 2
+    assert set(db.session.execute(orders_archive.select().with_only_columns(orders_archive.c.id)).scalars()) == \
+        set(order_ids[:2])
+    db.session.execute(orders_archive.update().where(orders_archive.c.id == order_ids[0]).values(snapshot=None))
+    db.session.commit()
+
+    for order_id in order_ids:
+        response = client.get(f'/api/pos/pos/orders/{order_id}', headers=cashier)
+        assert response.status_code == 200
+        assert response.get_json() == before[order_id]
+    today = datetime.now(timezone.utc).date()
+    assert _listed(client, cashier, '') == set(order_ids)
+    assert _listed(client, cashier, f'start_date={today}&end_date={today}') == set(order_ids)
+    assert _listed(client, cashier, 'status=completed') == set(order_ids[:3])
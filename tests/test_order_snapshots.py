@@ -0,0 +1,20 @@
+"""A finished order serializes the same from its snapshot as from its rows."""
+from datetime import datetime
+
+from conftest import order_payload
+from models import db, Order
+
+
+def test_snapshot_matches_live_payload(client, cashier):
+    order_id = client.post('/api/pos/pos/orders', json=order_payload(2), headers=cashier).get_json()['id']
+    response = client.post(f'/api/pos/pos/orders/{order_id}/complete', json={'payment_method': 'cash'},
+                           headers=cashier)
+    assert response.status_code == 200
+
+    snapshot = client.get(f'/api/pos/pos/orders/{order_id}', headers=cashier).get_json()
+    db.session.query(Order).filter_by(id=order_id).update({'snapshot': None})
+    db.session.commit()
+    live = client.get(f'/api/pos/pos/orders/{order_id}', headers=cashier).get_json()
+
+    assert datetime.fromisoformat(snapshot['completed_at']).tzinfo is None
+    assert snapshot == live
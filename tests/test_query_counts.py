@@ -0,0 +1,46 @@
+"""The order endpoints run a fixed number of queries whatever the number of orders or items."""
+import pytest
+
+from conftest import QueryRecorder, order_payload
+
+
+def _create_orders(client, cashier, count, items=3):
+    ids = []
+    for _ in range(count):
+        response = client.post('/api/pos/pos/orders', json=order_payload(items), headers=cashier)
+        assert response.status_code == 201
+        ids.append(response.get_json()['id'])
+    return ids
+
+
+def _queries(client, path, headers):
+    with QueryRecorder() as recorder:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    return recorder.count
+
+
+def test_pending_orders_query_count_does_not_grow(client, cashier):
+    _create_orders(client, cashier, 1)
+    one = _queries(client, '/api/pos/pos/orders/pending', cashier)
+    _create_orders(client, cashier, 19)
+    twenty = _queries(client, '/api/pos/pos/orders/pending', cashier)
+
+    assert len(client.get('/api/pos/pos/orders/pending', headers=cashier).get_json()) == 20
+    assert twenty == one
+    assert one <= 5  # Auth, orders, items with product and size, modifiers with names
+
+
+@pytest.mark.parametrize('complete', [False, True], ids=['pending', 'completed'])
+def test_get_order_query_count_does_not_grow(client, cashier, complete):
+    counts = []
+    for items in (1, 20):
+        order_id = _create_orders(client, cashier, 1, items)[0]
+        if complete:
+            response = client.post(f'/api/pos/pos/orders/{order_id}/complete', json={'payment_method': 'cash'},
+                                   headers=cashier)
+            assert response.status_code == 200
+        counts.append(_queries(client, f'/api/pos/pos/orders/{order_id}', cashier))
+
+    assert counts[1] == counts[0]
+    assert counts[0] <= 6
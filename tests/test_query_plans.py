@@ -0,0 +1,75 @@
+"""The main read endpoints reach orders and order items by index searches, never by a full scan."""
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import QueryRecorder, order_payload
+from models import db
+
+# A SCAN step reads a whole table, or a whole index unless it is a covering index
+# of a bounded query; every other access to orders and order items must be a SEARCH
+FULL_SCAN = re.compile(r'\bSCAN (orders|order_items)(_\d+)?\b(?! USING COVERING INDEX\b)')
+
+
+@pytest.fixture
+def orders(client, cashier, admin):
+    """A few completed, refunded, pending and cancelled orders."""
+    for n in range(8):
+        order_id = client.post('/api/pos/pos/orders', json=order_payload(2), headers=cashier).get_json()['id']
+        if n % 4 == 3:
+            continue  # Pending
+        if n % 4 == 2:
+            client.post(f'/api/pos/pos/orders/{order_id}/cancel', headers=cashier)
+            continue
+        client.post(f'/api/pos/pos/orders/{order_id}/complete', json={'payment_method': 'cash'}, headers=cashier)
+        if n == 0:
+            client.post(f'/api/pos/pos/orders/{order_id}/refund', headers=admin)
+
+
+def _full_scans(client, path, headers):
+    """Plan steps that scan orders or order_items, for every SELECT ``path`` runs."""
+    with QueryRecorder() as recorder:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+    scans = []
+    with db.engine.connect() as connection:
+        for statement, parameters in recorder.statements:
+            if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                continue
+            for step in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters):
+                if FULL_SCAN.search(step.detail):
+                    scans.append(f'{step.detail}  <-  {" ".join(statement.split())[:200]}')
+    return scans
+
+
+def _day_range():
+    today = datetime.now(timezone.utc).date()
+    return f'start_date={(today - timedelta(days=30)).isoformat()}&end_date={today.isoformat()}'
+
+
+def _time_range():
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return (f'start_date={(now - timedelta(days=2)).isoformat(timespec="seconds")}'
+            f'&end_date={(now + timedelta(hours=1)).isoformat(timespec="seconds")}')
+
+
+@pytest.mark.parametrize('path, role', [
+    ('/api/pos/pos/orders/pending', 'cashier'),
+    ('/api/pos/pos/orders?status=completed', 'cashier'),
+    ('/api/pos/pos/orders?{days}', 'cashier'),
+    ('/api/pos/pos/orders?{days}', 'admin'),
+    ('/api/pos/pos/orders/2', 'cashier'),
+    ('/api/dashboard/stats', 'admin'),
+    ('/api/pos/analytics/sales?{days}', 'admin'),
+    ('/api/pos/analytics/sales?{times}', 'admin'),
+    ('/api/pos/analytics/sales/series?bucket=hour&{days}', 'admin'),
+    ('/api/pos/analytics/sales/series?bucket=day&split=category&{days}', 'admin'),
+    ('/api/pos/analytics/sales/series?bucket=hour&split=category&{days}', 'admin'),
+    ('/api/pos/analytics/sales/slice?by=product,hour&{days}', 'admin'),
+    ('/api/dashboard/bootstrap', 'admin'),
+])
+def test_endpoint_does_not_full_scan(client, cashier, admin, orders, path, role):
+    path = path.format(days=_day_range(), times=_time_range())
+    assert _full_scans(client, path, cashier if role == 'cashier' else admin) == []
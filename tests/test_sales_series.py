@@ -0,0 +1,28 @@
+"""Sales series figures agree between the rollup (day) and order (hour) paths."""
+import pytest
+
+from conftest import order_payload
+
+
+@pytest.mark.parametrize('bucket', ['day', 'hour'])
+def test_category_split_counts_each_order_once(client, cashier, admin, bucket):
+    for _ in range(2):
+        response = client.post('/api/pos/pos/orders', json=order_payload(2), headers=cashier)  # Two products, one category
+        order_id = response.get_json()['id']
+        response = client.post(f'/api/pos/pos/orders/{order_id}/complete', json={'payment_method': 'cash'},
+                               headers=cashier)
+        assert response.status_code == 200
+    total = client.get('/api/pos/analytics/sales', headers=admin).get_json()
+
+    response = client.get(f'/api/pos/analytics/sales/series?bucket={bucket}&split=category', headers=admin)
+    assert response.status_code == 200
+    [series] = response.get_json()['series']
+    points = [point for point in series['points'] if point['order_count']]
+
+    assert series['label'] == 'Coffee'
+    assert sum(point['order_count'] for point in points) == 2
+    assert sum(point['items_sold'] for point in points) == 4
+    if bucket == 'day':
+        [point] = points
+        assert point['average_ticket'] == round(point['revenue'] / 2, 2)
+    assert total['total_orders'] == 2